@@ -0,0 +1,364 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from brewery_app import OVERDUE_DAYS, ExportJob
+from database import ReaderPool, WriteQueue, benchmark_group_commit, connect
+from planner import plan_fermenters
+from reports import AgingCache, AgingJob
+from repositories import (
+    REPOSITORIES, Barrel, BarrelMovementRepository, BarrelRepository, Batch, BatchRepository, ChangeLogRepository,
+    Client, ClientRepository, DashboardRepository, Fermenter, FermenterRepository, Invoice, InvoiceRepository, Payment,
+    PaymentRepository,
+)
+from schema import SORT_COLUMNS, create_schema, search_filter
+
+DEFAULT_SIZES = {
+    "clients": 20000,
+    "barrels": 100000,
+    "invoices": 1000000,
+    "payments": 1000000,
+    "batches": 5000,
+    "fermenters": 500,
+}
+GENERATE_CHUNK_ROWS = 50000
+VIEW_WINDOW = 30
+DEEP_PAGE = 500
+INSERT_ROWS = 1000
+SEARCH_TERMS = {
+    "barrels": ("B000123", "Li"),
+    "clients": ("García", "C0"),
+    "invoices": ("C000042", "F0"),
+    "batches": ("Lager", "L0"),
+    "fermenters": ("L00012", "Oc"),
+}
+FIRST_NAMES = ("Ana", "Luis", "María", "Pedro", "Sofía", "Diego", "Valentina", "Jorge", "Camila", "Tomás")
+LAST_NAMES = ("García", "Muñoz", "Rojas", "Díaz", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda", "Morales")
+PRODUCTS = ("Lager", "Pilsner", "Märzen", "Bock", "Dunkel", "Helles", "Schwarzbier", "Kellerbier")
+
+def scaled_sizes(scale, overrides):
+    sizes = {table: max(1, int(count * scale)) for table, count in DEFAULT_SIZES.items()}
+    sizes.update({table: count for table, count in overrides.items() if count is not None})
+    return sizes
+
+def timestamp(rng, start, days):
+    return int((start + timedelta(seconds=rng.randrange(days * 86400))).timestamp())
+
+def insert_chunked(conn, repository, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= GENERATE_CHUNK_ROWS:
+            with conn:
+                repository.insert_many(chunk)
+            chunk.clear()
+    if chunk:
+        with conn:
+            repository.insert_many(chunk)
+
+def generate(conn, sizes, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    timings = {}
+
+    def timed(table, repository, rows):
+        started = time.perf_counter()
+        insert_chunked(conn, repository, rows)
+        timings[table] = time.perf_counter() - started
+
+    client_ids = [f"C{i:06d}" for i in range(sizes["clients"])]
+    timed("clients", ClientRepository(conn), (
+        Client(client_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+               f"+56 9 {rng.randrange(10000000, 99999999)}", f"Calle {rng.randrange(1, 9999)}")
+        for client_id in client_ids
+    ))
+
+    def barrels():
+        for i in range(sizes["barrels"]):
+            status = rng.choices(("Ocupado", "Libre", "En Limpieza"), (6, 3, 1))[0]
+            occupied = status == "Ocupado"
+            yield Barrel(f"B{i:07d}", rng.choice((20.0, 30.0, 50.0)), status,
+                         rng.choice(client_ids) if occupied else None,
+                         timestamp(rng, start, 730) if occupied else None)
+
+    timed("barrels", BarrelRepository(conn), barrels())
+    timed("invoices", InvoiceRepository(conn), (
+        Invoice(f"F{i:08d}", rng.choice(client_ids), round(rng.uniform(50, 5000), 2),
+                rng.choices(("Pendiente", "Vencida"), (4, 1))[0], timestamp(rng, start, 730))
+        for i in range(sizes["invoices"])
+    ))
+    timed("payments", PaymentRepository(conn), (
+        Payment(f"P{i:08d}", f"F{rng.randrange(sizes['invoices']):08d}", round(rng.uniform(10, 1500), 2),
+                timestamp(rng, start, 730))
+        for i in range(sizes["payments"])
+    ))
+    batch_ids = [f"L{i:05d}" for i in range(sizes["batches"])]
+    timed("batches", BatchRepository(conn), (
+        Batch(batch_id, rng.choice(PRODUCTS), rng.choice((500.0, 1000.0, 2000.0)),
+              rng.choices(("En curso", "Finalizado", "En espera"), (2, 6, 1))[0], timestamp(rng, start, 730))
+        for batch_id in batch_ids
+    ))
+
+    def fermenters():
+        for i in range(sizes["fermenters"]):
+            status = rng.choices(("Ocupado", "Libre", "En Limpieza"), (5, 4, 1))[0]
+            occupied = status == "Ocupado"
+            yield Fermenter(f"T{i:04d}", rng.choice((1000.0, 2000.0, 4000.0)), status,
+                            rng.choice(batch_ids) if occupied else None,
+                            timestamp(rng, start, 730) if occupied else None)
+
+    timed("fermenters", FermenterRepository(conn), fermenters())
+    conn.execute("PRAGMA optimize")
+    return timings
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": samples[0] * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+def bench_views(conn, fts_enabled, repeat, window=VIEW_WINDOW):
+    results = {}
+    for table, terms in SEARCH_TERMS.items():
+        repository = REPOSITORIES[table](conn)
+        results[f"update_{table}_table"] = measure(lambda: (repository.count(), repository.page(limit=window)), repeat)
+        results[f"scroll_{table}_end"] = measure(lambda: repository.page(last=True, limit=window), repeat)
+        for column in (None,) + SORT_COLUMNS[table][:1]:
+            order = repository.order(column)
+            name = f"{table}_by_{column or 'rowid'}"
+            results[f"sort_{name}"] = measure(lambda: repository.page(order=order, limit=window), repeat)
+            anchors = repository.anchors(order=order, stride=window)
+            results[f"anchors_{name}"] = measure(lambda: repository.anchors(order=order, stride=window), repeat)
+            if anchors:
+                anchor = anchors[min(len(anchors), DEEP_PAGE) - 1]
+                results[f"page_{DEEP_PAGE}_{name}"] = measure(
+                    lambda: repository.page(order=order, after=anchor, limit=window), repeat
+                )
+        for term in terms:
+            def search(term=term):
+                where, params = search_filter(table, term, fts_enabled)
+                return repository.count(where, params), repository.page(where, params, limit=window)
+            results[f"search_{table}[{term}]"] = measure(search, repeat)
+    movements = BarrelMovementRepository(conn)
+    sample_barrels = [barrel.id for barrel in BarrelRepository(conn).fetch(limit=repeat)]
+    samples = itertools.cycle(sample_barrels or [""])
+    results["barrel_position_at"] = measure(lambda: movements.at(next(samples), int(time.time())), repeat)
+    barrels = BarrelRepository(conn)
+    order = barrels.held_order
+    where, params = barrels.held_filter(int(time.time()) - OVERDUE_DAYS * 86400)
+    results["overdue_barrels"] = measure(
+        lambda: (barrels.count(where, params), barrels.page(where, params, order, limit=window)), repeat
+    )
+    changes = ChangeLogRepository(conn)
+    results["change_poll_idle"] = measure(changes.version, repeat)
+    dashboard = DashboardRepository(conn)
+    results["dashboard_refresh"] = measure(lambda: (
+        dashboard.counters("barrels"), dashboard.counters("fermenters"),
+        dashboard.counters("receivables_total"), dashboard.top("receivables", 20),
+    ), repeat)
+    results["plan_fermenters"] = measure(lambda: plan_fermenters(conn), repeat)
+    return results
+
+def bench_exports(database, directory, repeat):
+    results = {}
+    pool = ReaderPool(database)
+    try:
+        for table, repository in REPOSITORIES.items():
+            filename = os.path.join(directory, f"{table}.csv")
+            job = ExportJob(pool, table, repository.columns, repository.columns, filename)
+            stats = measure(job.run, repeat)
+            events = []
+            while not job.events.empty():
+                events.append(job.events.get())
+            if events[-1][0] != "done":
+                raise RuntimeError(f"export {table} failed: {events[-1]}")
+            stats["rows"] = events[-1][1]
+            stats["rows_per_second"] = stats["rows"] / (stats["median_ms"] / 1000) if stats["median_ms"] else 0
+            results[f"export_{table}"] = stats
+            os.remove(filename)
+    finally:
+        pool.close()
+    return results
+
+def bench_inserts(conn, repeat, rows=INSERT_ROWS):
+    results = {}
+    for table, repository in REPOSITORIES.items():
+        repository = repository(conn)
+        template = repository.fetch(limit=rows)
+        if not template:
+            continue
+        batch = [repository.row_type(f"INS-{row.id}", *tuple(row)[1:]) for row in template]
+
+        def insert():
+            conn.execute("SAVEPOINT bench_insert")
+            try:
+                repository.insert_many(batch)
+            finally:
+                conn.execute("ROLLBACK TO bench_insert")
+                conn.execute("RELEASE bench_insert")
+
+        stats = measure(insert, repeat)
+        stats["rows"] = len(batch)
+        stats["rows_per_second"] = len(batch) / (stats["median_ms"] / 1000) if stats["median_ms"] else 0
+        results[f"insert_{table}"] = stats
+    return results
+
+def bench_reports(database, repeat):
+    results = {}
+    pool = ReaderPool(database, 1)
+    try:
+        results["aging_report"] = measure(lambda: AgingJob(pool, AgingCache()).run(), repeat)
+        cache = AgingCache()
+        AgingJob(pool, cache).run()
+        results["aging_report_cached"] = measure(lambda: AgingJob(pool, cache).run(), repeat)
+    finally:
+        pool.close()
+    return results
+
+def bench_writes(conn, database, repeat):
+    tag = datetime.now().strftime("%Y%m%d%H%M%S")
+    barrels, clients = BarrelRepository(conn), ClientRepository(conn)
+    invoices, payments = InvoiceRepository(conn), PaymentRepository(conn)
+    sample_clients = clients.fetch(limit=repeat)
+    sample_invoices = invoices.fetch(limit=repeat)
+    counter = itertools.count()
+    writer = WriteQueue(database)
+    done = threading.Event()
+    errors = []
+
+    def finished(error):
+        if error:
+            errors.append(error)
+        done.set()
+
+    def write(statements):
+        done.clear()
+        writer.submit(statements, finished)
+        done.wait()
+
+    def add_payment():
+        n = next(counter)
+        invoice_id = sample_invoices[n % len(sample_invoices)].id
+        if not invoices.exists(invoice_id):
+            raise RuntimeError(invoice_id)
+        write([payments.insert_statement(Payment(f"BENCH-{tag}-P{n}", invoice_id, 1.0, int(time.time())))])
+        invoices.get(invoice_id)
+
+    def add_barrel():
+        n = next(counter)
+        client_id = sample_clients[n % len(sample_clients)].id
+        if not clients.exists(client_id):
+            raise RuntimeError(client_id)
+        barrel_id = f"BENCH-{tag}-B{n}"
+        write([barrels.insert_statement(Barrel(barrel_id, 30.0, "Ocupado", client_id, int(time.time())))])
+        barrels.get(barrel_id)
+
+    try:
+        results = {"add_payment": measure(add_payment, repeat), "add_barrel": measure(add_barrel, repeat)}
+    finally:
+        writer.close()
+    if errors:
+        raise errors[0]
+    return results
+
+def run(database, sizes, repeat, seed=0, exports=True, group_commit=True):
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "repeat": repeat,
+    }
+    conn = connect(database)
+    try:
+        started = time.perf_counter()
+        fts_enabled = create_schema(conn)
+        report["fts_enabled"] = fts_enabled
+        if not ClientRepository(conn).count():
+            report["generate"] = generate(conn, sizes, seed)
+        report["setup_seconds"] = time.perf_counter() - started
+        report["sizes"] = {table: repository(conn).count() for table, repository in REPOSITORIES.items()}
+        results = bench_views(conn, fts_enabled, repeat)
+        results.update(bench_reports(database, max(1, repeat // 10)))
+        results.update(bench_inserts(conn, max(1, repeat // 10)))
+        if exports:
+            results.update(bench_exports(database, os.path.dirname(os.path.abspath(database)), max(1, repeat // 10)))
+        results.update(bench_writes(conn, database, repeat))
+    finally:
+        conn.close()
+    if group_commit:
+        report["group_commit"] = benchmark_group_commit()
+    report["results"] = results
+    return report
+
+def compare(report, baseline, out=sys.stdout):
+    print(f"{'benchmark':<40}{'baseline ms':>14}{'current ms':>14}{'ratio':>9}", file=out)
+    for name, stats in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            print(f"{name:<40}{'-':>14}{stats['median_ms']:>14.2f}{'new':>9}", file=out)
+            continue
+        ratio = stats["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        print(f"{name:<40}{before['median_ms']:>14.2f}{stats['median_ms']:>14.2f}{ratio:>9.2f}", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the brewery data paths on a synthetic database.")
+    parser.add_argument("--database", help="database to benchmark; generated if empty, temporary if omitted")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to the default sizes")
+    for table in DEFAULT_SIZES:
+        parser.add_argument(f"--{table}", type=int, help=f"number of {table} (default {DEFAULT_SIZES[table]} x scale)")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per timed operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-export", action="store_true", help="skip the CSV export benchmarks")
+    parser.add_argument("--no-group-commit", action="store_true", help="skip the write queue benchmark")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = scaled_sizes(args.scale, {table: getattr(args, table) for table in DEFAULT_SIZES})
+    directory = None
+    database = args.database
+    if not database:
+        directory = tempfile.mkdtemp(dir=".")
+        database = os.path.join(directory, "benchmark.db")
+    try:
+        report = run(database, sizes, args.repeat, args.seed, not args.no_export, not args.no_group_commit)
+    finally:
+        if directory:
+            shutil.rmtree(directory)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(report, json.load(file), sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,947 @@
 import customtkinter as ctk
-from tkinter import ttk, messagebox
-from PIL import Image
+from tkinter import ttk, messagebox, filedialog
 import sqlite3
 from datetime import datetime
-import pandas as pd
 import os
-import qrcode
+import queue
+import threading
+import time
+import re
+import sys
+import atexit
+import csv
+import hashlib
+import shutil
+import zipfile
+import collections
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from database import DB_PATH, ReaderPool, WriteConflict, WriteQueue, connect, connect_readonly, trace_queries
+from schema import DATE_COLUMNS, RECORD_SPECS, SORT_COLUMNS, create_schema, search_filter
+from repositories import (
+    ANCHOR_STRIDE, REPOSITORIES, Barrel, BarrelRepository, Batch, BatchRepository, ChangeLogRepository, Client,
+    ClientRepository, BarrelMovementRepository, DashboardRepository, Fermenter, FermenterRepository, Invoice, InvoiceRepository, Payment, PaymentRepository,
+)
+
+STARTED = time.perf_counter()
+IMPORT_SECONDS = time.process_time()
+
+SEARCH_DELAY_MS = 250
+DASHBOARD_TOP_CLIENTS = 20
+OVERDUE_DAYS = 30
+AUDIT_MIN_ROWS = 1000
+HISTORY_LIMIT = 500
+CHANGE_POLL_MS = 500
+CHANGE_BATCH_ROWS = 1000
+CHANGE_RECOUNT_ROWS = 100
+CHANGE_WAIT_SECONDS = 20
+AGING_REPORT_ROWS = 500
+PLAN_ROWS = 500
+EQUIPMENT_STATUSES = ("Ocupado", "Libre", "En Limpieza")
+EXPORT_CHUNK_ROWS = 5000
+IMPORT_BATCH_ROWS = 50000
+
+QR_CACHE_DIR = "qr_cache"
+QR_OPTIONS = {"version": 1, "box_size": 10, "border": 5}
+LABEL_SHEET_GRID = (4, 6)
+LABEL_SHEET_SIZE = (1240, 1754)
+
+SCAN_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+SCAN_LOOKUP_CHUNK = 500
+
+IMPORT_HEADERS = {
+    "barrels": {
+        "id": "ID", "capacity": "Capacidad (L)", "status": "Estado", "client_id": "ID del Cliente",
+        "start_date": "Fecha de Inicio",
+    },
+    "clients": {"id": "ID", "name": "Nombre", "contact": "Contacto", "address": "Dirección"},
+    "invoices": {
+        "id": "ID", "client_id": "ID del Cliente", "amount": "Monto", "status": "Estado", "issue_date": "Fecha de Emisión",
+    },
+    "batches": {
+        "id": "ID", "product_name": "Nombre del Producto", "volume": "Volumen (L)", "status": "Estado",
+        "start_date": "Fecha de Inicio",
+    },
+}
+IMPORT_SPECS = {
+    table: dict(RECORD_SPECS[table], columns=tuple(headers), headers=tuple(headers.values()))
+    for table, headers in IMPORT_HEADERS.items()
+}
+
+class VirtualTreeview:
+    def __init__(self, tree, scrollbar, repository, buffer=10):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.repository = repository
+        self.buffer = buffer
+        self.where = ""
+        self.params = ()
+        self.sort = None
+        self.orders = {}
+        self.descending = False
+        self.anchor = None
+        self.anchors = None
+        self.keys = []
+        self.offset = 0
+        self.total = 0
+        self.row_height = None
+        self.scrollbar.configure(command=self.yview)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+        self.tree.bind("<Configure>", lambda event: self.render())
+        sortable = ("id",) + SORT_COLUMNS.get(repository.table, ())
+        for name, column in zip(self.tree["columns"], repository.columns):
+            if column in sortable:
+                self.tree.heading(name, command=lambda column=column: self.sort_by(column))
+        self.date_indexes = [index for index, column in enumerate(repository.columns) if column in repository.date_columns]
+
+    def display(self, row):
+        values = list(row)
+        for index in self.date_indexes:
+            values[index] = format_ts(values[index])
+        return tuple(values)
+
+    def page_size(self):
+        if self.row_height is None:
+            self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        return max(int(self.tree.cget("height")), self.tree.winfo_height() // self.row_height)
+
+    def window_size(self):
+        return self.page_size() + self.buffer
+
+    def order(self, repository):
+        return self.orders.get(self.sort) or repository.order(self.sort)
+
+    def page(self, **bounds):
+        return self.repository.page(self.where, self.params, self.order(self.repository), self.descending, **bounds)
+
+    def fetch_one(self, key):
+        return self.repository.get(key, self.where, self.params)
+
+    def load(self, conn, where, params, limit):
+        repository = self.repository.bind(conn)
+        order = self.order(repository)
+        return repository.count(where, params), repository.page(where, params, order, self.descending, limit=limit)
+
+    def set_filter(self, where="", params=()):
+        self.where = where
+        self.params = tuple(params)
+        self.anchor = None
+        self.offset = 0
+        self.refresh()
+
+    def sort_by(self, column):
+        self.descending = column == self.sort and not self.descending
+        self.sort = column
+        for name, other in zip(self.tree["columns"], self.repository.columns):
+            text = self.tree.heading(name, "text").rstrip(" ▲▼")
+            if other == column:
+                text += " ▼" if self.descending else " ▲"
+            self.tree.heading(name, text=text)
+        self.anchor = None
+        self.anchors = None
+        self.offset = 0
+        self.render()
+
+    def apply(self, where, params, total, rows):
+        self.where = where
+        self.params = tuple(params)
+        self.anchor = None
+        self.anchors = None
+        self.offset = 0
+        self.total = total
+        self.show(rows)
+
+    def refresh(self):
+        self.anchors = None
+        self.total = self.repository.count(self.where, self.params)
+        self.render()
+
+    def render(self):
+        rows = self.page(after=self.anchor, limit=self.window_size())
+        if self.offset and len(rows) < self.page_size():
+            self.show_end()
+        else:
+            self.show(rows)
+
+    def show_end(self):
+        rows = self.page(last=True, limit=self.page_size() + 1)
+        self.anchor = rows.pop(0)[1] if len(rows) > self.page_size() else None
+        self.offset = max(0, self.total - len(rows)) if self.anchor else 0
+        self.show(rows)
+
+    def show(self, rows):
+        self.keys = [key for _, key in rows]
+        rows = [row for row, _ in rows]
+        keys = [str(row.id) for row in rows]
+        wanted = set(keys)
+        stale = [item for item in self.tree.get_children() if item not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+        for index, (key, row) in enumerate(zip(keys, rows)):
+            row = self.display(row)
+            if self.tree.exists(key):
+                self.tree.item(key, values=row)
+                self.tree.move(key, "", index)
+            else:
+                self.tree.insert("", index, iid=key, values=row)
+        self.tree.yview_moveto(0)
+        self.update_scrollbar()
+
+    def seek(self, amount):
+        if amount > 0:
+            rows = self.page(after=self.anchor, limit=amount)
+            return rows[-1][1] if rows else self.anchor
+        rows = self.page(before=self.anchor, limit=-amount)
+        return rows[0][1] if rows else None
+
+    def scroll(self, amount):
+        amount = max(-self.offset, min(amount, self.total - self.page_size() - self.offset))
+        if amount > 0:
+            self.anchor = self.keys[amount - 1] if amount <= len(self.keys) else self.seek(amount)
+        elif amount < 0:
+            self.anchor = self.seek(amount) if self.offset + amount else None
+        else:
+            return
+        self.offset += amount
+        self.render()
+
+    def jump(self, target):
+        target = max(0, min(target, self.total - self.page_size()))
+        if abs(target - self.offset) <= ANCHOR_STRIDE:
+            self.scroll(target - self.offset)
+            return
+        if self.anchors is None:
+            self.anchors = self.repository.anchors(self.where, self.params, self.order(self.repository), self.descending)
+        index = min(target // ANCHOR_STRIDE, len(self.anchors))
+        self.anchor = self.anchors[index - 1] if index else None
+        skip = target - index * ANCHOR_STRIDE
+        if skip:
+            rows = self.page(after=self.anchor, limit=skip)
+            self.anchor = rows[-1][1] if rows else self.anchor
+        self.offset = target if self.anchor else 0
+        self.render()
+
+    def changed(self, changes, total=None):
+        self.anchors = None
+        if total is not None:
+            self.total = total
+            self.render()
+            return
+        if len(changes) > self.window_size():
+            self.refresh()
+            return
+        render = recount = False
+        for key, op in changes.items():
+            visible = self.tree.exists(str(key))
+            if op == "delete":
+                if visible or not self.where:
+                    self.total -= 1
+                else:
+                    recount = True
+                render = render or visible
+                continue
+            row = self.fetch_one(key)
+            if op == "insert":
+                if row:
+                    self.total += 1
+                    render = True
+            elif not visible:
+                recount = recount or bool(self.where)
+                render = render or bool(row and self.sort)
+            elif not row:
+                self.total -= 1
+                render = True
+            elif self.sort:
+                render = True
+            else:
+                self.tree.item(str(key), values=self.display(row))
+        if recount:
+            self.refresh()
+        elif render:
+            self.render()
+        else:
+            self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if not self.total:
+            self.scrollbar.set(0, 1)
+            return
+        first = self.offset / self.total
+        last = min(1, (self.offset + self.page_size()) / self.total)
+        self.scrollbar.set(first, last)
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.jump(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.page_size()
+            self.scroll(amount)
+
+    def on_mousewheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
+        return "break"
+
+class SearchWorker:
+    def __init__(self, root, pool, delay=SEARCH_DELAY_MS):
+        self.root = root
+        self.pool = pool
+        self.delay = delay
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = {}
+        self.latest = {}
+        self.running = None
+        self.lock = threading.Lock()
+        self.conn = None
+        threading.Thread(target=self.run, daemon=True).start()
+        self.poll()
+
+    def submit(self, view, where, params, delay=None, callback=None):
+        generation = self.cancel(view)
+        self.pending[view] = self.root.after(
+            self.delay if delay is None else delay, self.enqueue, view, generation, where, params, callback
+        )
+
+    def cancel(self, view):
+        job = self.pending.pop(view, None)
+        if job:
+            self.root.after_cancel(job)
+        generation = self.latest.get(view, 0) + 1
+        self.latest[view] = generation
+        with self.lock:
+            if self.running is view:
+                self.conn.interrupt()
+        return generation
+
+    def enqueue(self, view, generation, where, params, callback):
+        self.pending.pop(view, None)
+        self.requests.put((view, generation, where, params, view.window_size(), callback))
+
+    def run(self):
+        while True:
+            view, generation, where, params, limit, callback = self.requests.get()
+            if generation != self.latest.get(view):
+                continue
+            with self.pool.connection() as conn:
+                with self.lock:
+                    if generation != self.latest.get(view):
+                        continue
+                    self.running = view
+                    self.conn = conn
+                try:
+                    total, rows = view.load(conn, where, params, limit)
+                except sqlite3.OperationalError:
+                    continue
+                finally:
+                    with self.lock:
+                        self.running = None
+                        self.conn = None
+            self.results.put((view, generation, where, params, total, rows, callback))
+
+    def poll(self):
+        while True:
+            try:
+                view, generation, where, params, total, rows, callback = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.latest.get(view):
+                view.apply(where, params, total, rows)
+                if callback:
+                    callback()
+        self.root.after(50, self.poll)
+
+class ChangeWatcher:
+    def __init__(self, root, changes, pool, views, callback, interval=CHANGE_POLL_MS, wait=0):
+        self.root = root
+        self.changes = changes
+        self.pool = pool
+        self.views = views
+        self.callback = callback
+        self.interval = interval / 1000
+        self.wait = wait
+        self.seq = changes.last()
+        self.woken = threading.Event()
+        self.results = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+        self.poll()
+
+    def wake(self):
+        self.woken.set()
+
+    def run(self):
+        version = None
+        while True:
+            self.woken.wait(self.interval)
+            self.woken.clear()
+            try:
+                current = self.changes.version()
+                if current is not None and current == version:
+                    continue
+                if self.wait:
+                    changes = self.changes.since(self.seq, CHANGE_BATCH_ROWS + 1, self.wait)
+                else:
+                    changes = self.changes.since(self.seq, CHANGE_BATCH_ROWS + 1)
+                version = current
+                if not changes:
+                    continue
+                if len(changes) > CHANGE_BATCH_ROWS or changes[0].seq != self.seq + 1:
+                    self.seq = self.changes.last()
+                    tables = None
+                else:
+                    self.seq = changes[-1].seq
+                    tables = {}
+                    for change in changes:
+                        keys = tables.setdefault(change.table_name, {})
+                        keys[change.row_id] = collapse_change(keys.get(change.row_id), change.op)
+                    tables = {table: {key: op for key, op in keys.items() if op} for table, keys in tables.items()}
+                self.results.put((tables, self.recount(tables)))
+            except sqlite3.Error:
+                continue
+
+    def recount(self, tables):
+        stale = [
+            view for table, views in list(self.views.items()) for view in list(views)
+            if tables is None or table in tables and (
+                len(tables[table]) > CHANGE_RECOUNT_ROWS
+                or view.where and not {"update", "delete"}.isdisjoint(tables[table].values())
+            )
+        ]
+        if not stale:
+            return {}
+        counts = {}
+        with self.pool.connection() as conn:
+            for view in stale:
+                where, params = view.where, view.params
+                counts[view] = (where, params, view.repository.bind(conn).count(where, params))
+        return counts
+
+    def poll(self):
+        while True:
+            try:
+                tables, counts = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.callback(tables, counts)
+        self.root.after(50, self.poll)
+
+class ExportJob:
+    def __init__(self, pool, table, columns, headers, filename, chunk_size=EXPORT_CHUNK_ROWS):
+        self.pool = pool
+        self.table = table
+        self.columns = columns
+        self.headers = headers
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM {self.table}")
+                total = cursor.fetchone()[0]
+                done = 0
+                with open(self.filename, "w", newline="", encoding="utf-8") as file:
+                    writer = csv.writer(file)
+                    writer.writerow(self.headers)
+                    dates = DATE_COLUMNS.get(self.table, ())
+                    columns = [
+                        f"datetime({column}, 'unixepoch', 'localtime')" if column in dates else column
+                        for column in self.columns
+                    ]
+                    cursor.execute(f"SELECT {', '.join(columns)} FROM {self.table}")
+                    while not self.cancelled.is_set():
+                        rows = cursor.fetchmany(self.chunk_size)
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        done += len(rows)
+                        self.events.put(("progress", done, total))
+                cursor.close()
+            if self.cancelled.is_set():
+                os.remove(self.filename)
+                self.events.put(("cancelled", done))
+            else:
+                self.events.put(("done", done))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+
+def read_import_file(filename):
+    import pandas as pd
+    if filename.lower().endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(filename, dtype=str)
+    else:
+        frame = pd.read_csv(filename, dtype=str, keep_default_na=False)
+    frame.columns = [str(column).strip() for column in frame.columns]
+    return frame
+
+def validate_import(conn, table, frame):
+    import numpy as np
+    import pandas as pd
+    spec = IMPORT_SPECS[table]
+    frame = frame.rename(columns=dict(zip(spec["headers"], spec["columns"])))
+    missing = [column for column in spec["required"] if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+    for column in spec["columns"]:
+        if column not in frame.columns:
+            frame[column] = ""
+    frame = frame[list(spec["columns"])].fillna("").astype(str).apply(lambda column: column.str.strip())
+    raw = frame.copy()
+    reasons = pd.Series("", index=frame.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons.loc[mask & (reasons == "")] = reason
+
+    for column in spec["required"]:
+        reject(frame[column] == "", f"{column} es obligatorio")
+    for column in spec.get("numeric", ()):
+        values = pd.to_numeric(frame[column], errors="coerce")
+        reject(~((values > 0) & np.isfinite(values)), f"{column} debe ser un número positivo")
+        frame[column] = values
+    if "statuses" in spec:
+        frame["status"] = frame["status"].mask(frame["status"] == "", spec["default_status"])
+        reject(~frame["status"].isin(spec["statuses"]), "estado inválido")
+        for status, reason in spec.get("reserved_statuses", {}).items():
+            reject(frame["status"] == status, reason)
+    reject(frame["id"].duplicated(keep="first"), "ID repetido en el archivo")
+    reject(frame["id"].isin(REPOSITORIES[table](conn).existing(frame["id"].unique())), "el ID ya existe")
+    for column, target in spec.get("references", {}).items():
+        referenced = frame[column][frame[column] != ""].unique()
+        known = REPOSITORIES[target](conn).existing(referenced)
+        reject((frame[column] != "") & ~frame[column].isin(known), f"{column} no existe")
+    if "date" in spec:
+        column, status = spec["date"]
+        needs_date = frame[column] == ""
+        if status:
+            needs_date &= frame["status"] == status
+        provided = frame[column] != ""
+        dates = {text: parse_date(text) for text in frame[column][provided].unique()}
+        parsed = pd.Series([dates.get(text) for text in frame[column]], index=frame.index, dtype=object)
+        reject(provided & parsed.isna(), f"{column} no es una fecha válida")
+        frame[column] = parsed.mask(needs_date, int(time.time())).where(provided | needs_date, "")
+    accepted = frame[reasons == ""].astype(object)
+    accepted = accepted.where(accepted != "", None)
+    rejected = raw[reasons != ""].assign(motivo=reasons[reasons != ""])
+    return accepted, rejected
+
+class ImportJob:
+    def __init__(self, database, table, filename, batch_size=IMPORT_BATCH_ROWS):
+        self.database = database
+        self.table = table
+        self.filename = filename
+        self.batch_size = batch_size
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        conn = connect(self.database)
+        try:
+            started = time.perf_counter()
+            accepted, rejected = validate_import(conn, self.table, read_import_file(self.filename))
+            rejected_file = None
+            if len(rejected):
+                rejected_file = f"{os.path.splitext(self.filename)[0]}_rechazados.csv"
+                rejected.to_csv(rejected_file, index=False)
+            repository = REPOSITORIES[self.table](conn)
+            rows = list(accepted.itertuples(index=False, name=None))
+            inserted = 0
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    if self.cancelled.is_set():
+                        break
+                    repository.insert_many(rows[start:start + self.batch_size])
+                    inserted += len(rows[start:start + self.batch_size])
+                    self.events.put(("progress", inserted, len(rows)))
+                if self.cancelled.is_set():
+                    conn.rollback()
+                    inserted = 0
+                else:
+                    conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            elapsed = time.perf_counter() - started
+            summary = {
+                "inserted": inserted,
+                "rejected": len(rejected),
+                "rejected_file": rejected_file,
+                "rate": inserted / elapsed if elapsed else 0,
+            }
+            self.events.put(("cancelled" if self.cancelled.is_set() else "done", summary))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+        finally:
+            conn.close()
+
+def qr_cache_path(barrel_id, cache_dir=QR_CACHE_DIR):
+    digest = hashlib.sha256(repr((sorted(QR_OPTIONS.items()), barrel_id)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, digest[:2], f"{digest}.png")
+
+def render_qr(barrel_id, cache_dir=QR_CACHE_DIR):
+    path = qr_cache_path(barrel_id, cache_dir)
+    if not os.path.exists(path):
+        import qrcode
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        qr = qrcode.QRCode(**QR_OPTIONS)
+        qr.add_data(barrel_id)
+        qr.make(fit=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        qr.make_image(fill="black", back_color="white").save(temp, format="PNG")
+        os.replace(temp, path)
+    return path
+
+def build_label_sheet(labels, filename, grid=LABEL_SHEET_GRID, page_size=LABEL_SHEET_SIZE):
+    if not labels:
+        raise ValueError("no hay etiquetas para imprimir")
+    from PIL import Image, ImageDraw
+    columns, rows = grid
+    cell_width, cell_height = page_size[0] // columns, page_size[1] // rows
+    side = min(cell_width, cell_height - 30)
+    pages = []
+    for start in range(0, len(labels), columns * rows):
+        page = Image.new("1", page_size, 1)
+        draw = ImageDraw.Draw(page)
+        for index, (barrel_id, path) in enumerate(labels[start:start + columns * rows]):
+            x, y = (index % columns) * cell_width, (index // columns) * cell_height
+            with Image.open(path) as qr:
+                page.paste(qr.convert("1").resize((side, side), Image.NEAREST), (x + (cell_width - side) // 2, y))
+            draw.text((x + cell_width // 2, y + side + 5), barrel_id, fill=0, anchor="ma")
+        pages.append(page)
+    pages[0].save(filename, "PDF", resolution=150, save_all=True, append_images=pages[1:])
+
+class QrLabelJob:
+    def __init__(self, pool, barrel_ids, prefix, cache_dir=QR_CACHE_DIR):
+        self.pool = pool
+        self.barrel_ids = list(barrel_ids)
+        self.sheet_file = f"{prefix}.pdf"
+        self.zip_file = f"{prefix}.zip"
+        self.cache_dir = cache_dir
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            started = time.perf_counter()
+            barrel_ids = self.barrel_ids
+            if not barrel_ids:
+                with self.pool.connection() as conn:
+                    barrel_ids = BarrelRepository(conn).ids()
+            if not barrel_ids:
+                self.events.put(("empty",))
+                return
+            paths = {barrel_id: qr_cache_path(barrel_id, self.cache_dir) for barrel_id in barrel_ids}
+            missing = [barrel_id for barrel_id, path in paths.items() if not os.path.exists(path)]
+            done = len(paths) - len(missing)
+            self.events.put(("progress", done, len(paths)))
+            render_started = time.perf_counter()
+            if missing:
+                with ProcessPoolExecutor() as pool:
+                    chunksize = max(1, len(missing) // ((os.cpu_count() or 1) * 8))
+                    for path in pool.map(render_qr, missing, [self.cache_dir] * len(missing), chunksize=chunksize):
+                        done += 1
+                        if done % 50 == 0:
+                            self.events.put(("progress", done, len(paths)))
+                        if self.cancelled.is_set():
+                            pool.shutdown(cancel_futures=True)
+                            self.events.put(("cancelled", done))
+                            return
+            rendered_time = time.perf_counter() - render_started
+            labels = list(paths.items())
+            build_label_sheet(labels, self.sheet_file)
+            with zipfile.ZipFile(self.zip_file, "w", zipfile.ZIP_STORED) as archive:
+                for barrel_id, path in labels:
+                    safe_id = re.sub(r"[^\w.-]", "_", barrel_id)
+                    archive.write(path, f"barrel_qr_{safe_id}.png")
+            elapsed = time.perf_counter() - started
+            self.events.put(("done", {
+                "labels": len(labels),
+                "rendered": len(missing),
+                "cached": len(labels) - len(missing),
+                "per_thousand": rendered_time / len(missing) * 1000 if missing else 0,
+                "elapsed": elapsed,
+            }))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+
+def open_scan_source(source):
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("Se necesita opencv-python para leer códigos QR")
+    if os.path.isdir(source):
+        files = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(SCAN_IMAGE_EXTENSIONS)
+        )
+        return cv2, len(files), (cv2.imread(path) for path in files)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"No se pudo abrir {source}")
+
+    def frames():
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    return
+                yield frame
+        finally:
+            capture.release()
+
+    return cv2, int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), frames()
+
+class ScanIngestJob:
+    def __init__(self, database, source, status, client_id=None):
+        self.database = database
+        self.source = source
+        self.status = status
+        self.client_id = client_id if status == "Ocupado" else None
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+        self.detectors = threading.local()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def decode(self, frame):
+        if frame is None:
+            return ()
+        if not hasattr(self.detectors, "detector"):
+            self.detectors.detector = self.cv2.QRCodeDetector()
+        ok, texts, _, _ = self.detectors.detector.detectAndDecodeMulti(frame)
+        return [text for text in texts if text] if ok else ()
+
+    def resolve(self, conn, lookup, known, unknown):
+        found = BarrelRepository(conn).existing(lookup)
+        known.extend(barrel_id for barrel_id in lookup if barrel_id in found)
+        unknown.extend(barrel_id for barrel_id in lookup if barrel_id not in found)
+        lookup.clear()
+
+    def run(self):
+        conn = connect(self.database)
+        try:
+            started = time.perf_counter()
+            self.cv2, total, frames = open_scan_source(self.source)
+            seen = set()
+            lookup, known, unknown = [], [], []
+            scans = frames_read = 0
+            workers = os.cpu_count() or 1
+            pending = collections.deque()
+
+            def collect():
+                nonlocal scans, frames_read
+                frames_read += 1
+                for barrel_id in pending.popleft().result():
+                    scans += 1
+                    if barrel_id not in seen:
+                        seen.add(barrel_id)
+                        lookup.append(barrel_id)
+                if len(lookup) >= SCAN_LOOKUP_CHUNK:
+                    self.resolve(conn, lookup, known, unknown)
+                if frames_read % 25 == 0:
+                    self.events.put(("progress", frames_read, max(total, frames_read)))
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for frame in frames:
+                    if self.cancelled.is_set():
+                        break
+                    pending.append(pool.submit(self.decode, frame))
+                    while pending and (len(pending) > workers * 2 or pending[0].done()):
+                        collect()
+                while pending:
+                    collect()
+            if self.cancelled.is_set():
+                self.events.put(("cancelled", frames_read))
+                return
+            self.resolve(conn, lookup, known, unknown)
+            start_date = int(time.time()) if self.status == "Ocupado" else None
+            with conn:
+                BarrelRepository(conn).assign_many(known, self.status, self.client_id, start_date)
+            elapsed = time.perf_counter() - started
+            self.events.put(("done", {
+                "frames": frames_read,
+                "scans": scans,
+                "duplicates": scans - len(seen),
+                "updated": known,
+                "unknown": unknown,
+                "rate": scans / elapsed if elapsed else 0,
+                "frame_rate": frames_read / elapsed if elapsed else 0,
+            }))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+        finally:
+            conn.close()
+
+def collapse_change(previous, op):
+    if previous == "insert":
+        return None if op == "delete" else "insert"
+    if previous == "delete" and op == "insert":
+        return "update"
+    return op
+
+def server_url():
+    if "--server" in sys.argv[:-1]:
+        return sys.argv[sys.argv.index("--server") + 1]
+    return os.environ.get("BREWERY_SERVER")
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts is not None else ""
+
+def parse_date(text):
+    try:
+        return int(datetime.fromisoformat(text).timestamp())
+    except ValueError:
+        return None
+
+def previous_quarter(now=None):
+    now = now or datetime.now()
+    month = (now.month - 1) // 3 * 3 + 1
+    end = datetime(now.year, month, 1)
+    start = datetime(end.year - 1, 10, 1) if month == 1 else datetime(end.year, month - 3, 1)
+    return start, end
+
+def since_start():
+    return IMPORT_SECONDS + time.perf_counter() - STARTED
+
+class StartupTrace:
+    def __init__(self, enabled, budget_ms=None):
+        self.enabled = enabled
+        self.budget_ms = budget_ms
+        self.phases = []
+        self.reported = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        self.phases.append((name, seconds))
+        if self.reported:
+            print(f"[startup] {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        for name, seconds in self.phases:
+            print(f"[startup] {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+        total = since_start() * 1000
+        line = f"[startup] total: {total:.1f} ms"
+        if self.budget_ms:
+            line += f" (budget {self.budget_ms:.0f} ms, {'OK' if total <= self.budget_ms else 'EXCEEDED'})"
+        print(line, file=sys.stderr)
+
+class QueryPlanAuditor:
+    LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    WHOLE_TABLE = re.compile(r"\bNOT INDEXED\b|\bLIKE \? ESCAPE\b|\brow_number\(\) OVER\b")
+    NESTED = re.compile(r"\([^()]*\)")
+
+    def __init__(self, database, min_rows=AUDIT_MIN_ROWS):
+        self.database = database
+        self.min_rows = min_rows
+        self.statements = {}
+
+    def record(self, statement):
+        if statement.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")):
+            self.statements.setdefault(self.LITERALS.sub("?", statement), statement)
+
+    def plan(self, conn, statement):
+        nested = set()
+        plan = []
+        for node, parent, _, detail in conn.execute("EXPLAIN QUERY PLAN " + statement):
+            if parent in nested or "SUBQUERY" in detail:
+                nested.add(node)
+            plan.append((detail, parent in nested))
+        return plan
+
+    def full_scans(self, plan):
+        scans = []
+        for detail, nested in plan:
+            if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail and \
+               not detail.startswith(("SCAN CONSTANT ROW", "SCAN sqlite_", "SCAN (")):
+                scans.append((detail, nested))
+        return scans
+
+    def scanned_table(self, statement, detail):
+        name = detail.split()[1]
+        alias = re.search(rf"\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?{name}\b", statement, re.IGNORECASE)
+        if alias:
+            return alias.group(1)
+        if re.search(rf"\b{name}\s*(?:\([^)]*\))?\s+AS\s*\(", statement, re.IGNORECASE):
+            return None
+        return name
+
+    def expected(self, shape, plan):
+        if self.WHOLE_TABLE.search(shape):
+            return True
+        outer = shape
+        while self.NESTED.search(outer):
+            outer = self.NESTED.sub("", outer)
+        return not re.search(r"\bWHERE\b", outer, re.IGNORECASE) and \
+            not any("TEMP B-TREE FOR ORDER BY" in detail for detail in plan)
+
+    def regressions(self, conn):
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sizes = {}
+        found = []
+        for shape, statement in sorted(self.statements.items()):
+            plan = self.plan(conn, statement)
+            whole = self.expected(shape, [detail for detail, _ in plan])
+            scans = []
+            for detail, nested in self.full_scans(plan):
+                if whole and not nested:
+                    continue
+                table = self.scanned_table(statement, detail)
+                if table is None or table.endswith(("_fts_config", "_fts_data", "_fts_idx", "_fts_docsize")):
+                    continue
+                if table in tables and table not in sizes:
+                    sizes[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                if sizes.get(table, self.min_rows) >= self.min_rows:
+                    scans.append(detail)
+            if scans:
+                found.append((shape, scans))
+        return found
+
+    def report(self, out=sys.stderr):
+        conn = sqlite3.connect(self.database)
+        try:
+            for shape, scans in self.regressions(conn):
+                print(f"[query plan] {'; '.join(scans)}: {shape}", file=out)
+        finally:
+            conn.close()
 
 class BreweryApp:
     def __init__(self, root):
@@ -17,74 +953,114 @@ class BreweryApp:
         self.accent_color = "#8B6F47"
         ctk.set_appearance_mode("dark")
         self.root.configure(bg=self.bg_color)
-        self.conn = sqlite3.connect("brewery.db")
-        self.create_tables()
-        self.setup_ui()
-
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS barrels (
-                id TEXT PRIMARY KEY,
-                capacity REAL,
-                status TEXT,
-                client_id TEXT,
-                start_date TEXT,
-                FOREIGN KEY (client_id) REFERENCES clients(id)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS clients (
-                id TEXT PRIMARY KEY,
-                name TEXT,
-                contact TEXT,
-                address TEXT
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS invoices (
-                id TEXT PRIMARY KEY,
-                client_id TEXT,
-                amount REAL,
-                status TEXT,
-                issue_date TEXT,
-                FOREIGN KEY (client_id) REFERENCES clients(id)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS payments (
-                id TEXT PRIMARY KEY,
-                invoice_id TEXT,
-                amount REAL,
-                payment_date TEXT,
-                FOREIGN KEY (invoice_id) REFERENCES invoices(id)
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS batches (
-                id TEXT PRIMARY KEY,
-                product_name TEXT,
-                volume REAL,
-                start_date TEXT,
-                status TEXT
-            )
-        """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS fermenters (
-                id TEXT PRIMARY KEY,
-                capacity REAL,
-                status TEXT,
-                batch_id TEXT,
-                start_date TEXT,
-                FOREIGN KEY (batch_id) REFERENCES batches(id)
-            )
-        """)
-        self.conn.commit()
+        budget = os.environ.get("BREWERY_STARTUP_BUDGET_MS")
+        self.trace = StartupTrace(
+            bool(os.environ.get("BREWERY_STARTUP_TRACE")) or "--trace-startup" in sys.argv,
+            float(budget) if budget else None
+        )
+        self.trace.record("imports", IMPORT_SECONDS)
+        self.server_url = server_url()
+        if self.server_url:
+            import remote
+            self.conn = remote.ApiClient(self.server_url)
+            self.readers = remote.RemotePool(self.server_url)
+            self.barrels = remote.RemoteBarrelRepository(self.conn)
+            self.clients = remote.RemoteClientRepository(self.conn)
+            self.invoices = remote.RemoteInvoiceRepository(self.conn)
+            self.payments = remote.RemotePaymentRepository(self.conn)
+            self.batches = remote.RemoteBatchRepository(self.conn)
+            self.fermenters = remote.RemoteFermenterRepository(self.conn)
+            self.dashboard = remote.RemoteDashboardRepository(self.conn)
+            self.movements = remote.RemoteBarrelMovementRepository(self.conn)
+            self.changes = remote.RemoteChangeLogRepository(remote.ApiClient(self.server_url))
+            self.writer = remote.RemoteWriter(self.server_url)
+        else:
+            if os.environ.get("BREWERY_QUERY_PLAN"):
+                self.query_auditor = QueryPlanAuditor(DB_PATH)
+                trace_queries(self.query_auditor.record)
+                atexit.register(self.query_auditor.report)
+            self.conn = connect(DB_PATH)
+            self.readers = ReaderPool(DB_PATH)
+            self.barrels = BarrelRepository(self.conn)
+            self.clients = ClientRepository(self.conn)
+            self.invoices = InvoiceRepository(self.conn)
+            self.payments = PaymentRepository(self.conn)
+            self.batches = BatchRepository(self.conn)
+            self.fermenters = FermenterRepository(self.conn)
+            self.dashboard = DashboardRepository(self.conn)
+            self.movements = BarrelMovementRepository(self.conn)
+            with self.trace.phase("create_tables"):
+                self.fts_enabled = create_schema(self.conn)
+            self.changes = ChangeLogRepository(connect_readonly(DB_PATH))
+            self.writer = WriteQueue(DB_PATH)
+        self.search_worker = SearchWorker(self.root, self.readers)
+        self.write_results = queue.Queue()
+        self.views = {}
+        self.aging_cache = None
+        self.change_watcher = ChangeWatcher(
+            self.root, self.changes, self.readers, self.views, self.apply_changes,
+            wait=CHANGE_WAIT_SECONDS if self.server_url else 0
+        )
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.poll_writes()
+        with self.trace.phase("setup_ui"):
+            self.setup_ui()
+        self.root.after(0, lambda: self.trace.record("first paint", since_start()))
+
+    def write(self, statements, on_done):
+        self.writer.submit(statements, lambda error: self.write_results.put((on_done, error)))
+
+    def poll_writes(self):
+        while True:
+            try:
+                on_done, error = self.write_results.get_nowait()
+            except queue.Empty:
+                break
+            on_done(error)
+        self.root.after(50, self.poll_writes)
+
+    def watch(self, view):
+        self.views.setdefault(view.repository.table, []).append(view)
+
+    def sync_changes(self):
+        self.change_watcher.wake()
+
+    def apply_changes(self, tables, counts):
+        for table, views in self.views.items():
+            if tables is not None and table not in tables:
+                continue
+            for view in views:
+                where, params, total = counts.get(view, (None, None, None))
+                if (where, params) != (view.where, view.params):
+                    total = None
+                if tables is None and total is None:
+                    view.refresh()
+                else:
+                    view.changed(tables[table] if tables is not None else {}, total)
+        if "Panel" in self.built_tabs and (tables is None or not {"barrels", "fermenters", "invoices"}.isdisjoint(tables)):
+            self.refresh_dashboard_counters()
+
+    def on_close(self):
+        self.writer.close()
+        self.readers.close()
+        self.root.destroy()
+
+    def search_filter(self, table, term):
+        if self.server_url:
+            import remote
+            return remote.search_filter(table, term)
+        return search_filter(table, term, self.fts_enabled)
+
+    def local_only(self):
+        if self.server_url:
+            messagebox.showerror("Error", f"Disponible solo con acceso directo a la base de datos, no a través de {self.server_url}")
+        return not self.server_url
 
     def setup_ui(self):
         self.main_frame = ctk.CTkFrame(self.root, fg_color=self.bg_color)
         self.main_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
+        from PIL import Image
         try:
             logo_image = Image.open("logo.png").resize((100, 100))
         except FileNotFoundError:
@@ -107,7 +1083,8 @@ class BreweryApp:
             text_color=self.text_color, 
             segmented_button_fg_color="#8B6F47",
             segmented_button_selected_color="#A68A64",
-            segmented_button_selected_hover_color="#B89B7A"
+            segmented_button_selected_hover_color="#B89B7A",
+            command=self.on_tab_change
         )
         self.tab_view.grid(row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew")
         self.main_frame.grid_rowconfigure(1, weight=1)
@@ -118,12 +1095,38 @@ class BreweryApp:
         self.tab_view.add("Facturas")
         self.tab_view.add("Lotes")
         self.tab_view.add("Fermentadores")
-        
-        self.setup_barrels_tab()
-        self.setup_clients_tab()
-        self.setup_invoices_tab()
-        self.setup_batches_tab()
-        self.setup_fermenters_tab()
+        self.tab_view.add("Panel")
+        
+        self.tab_builders = {
+            "Barriles": self.setup_barrels_tab,
+            "Clientes": self.setup_clients_tab,
+            "Facturas": self.setup_invoices_tab,
+            "Lotes": self.setup_batches_tab,
+            "Fermentadores": self.setup_fermenters_tab,
+            "Panel": self.setup_dashboard_tab,
+        }
+        self.built_tabs = set()
+        self.on_tab_change()
+
+    def on_tab_change(self):
+        name = self.tab_view.get()
+        if name in self.built_tabs:
+            if name == "Panel":
+                self.refresh_dashboard()
+            return
+        self.built_tabs.add(name)
+        with self.trace.phase(self.tab_builders[name].__name__):
+            self.tab_builders[name]()
+
+    def load_view(self, view):
+        self.watch(view)
+        started = time.perf_counter()
+
+        def loaded():
+            self.trace.record(f"first load {view.repository.table}", time.perf_counter() - started)
+            self.trace.report()
+
+        self.search_worker.submit(view, "", (), delay=0, callback=loaded)
 
     def smooth_scroll(self, widget, event, horizontal=False):
         delta = -1 if event.delta > 0 else 1
@@ -165,6 +1168,9 @@ class BreweryApp:
         ctk.CTkButton(input_frame, text="Eliminar Barril", command=self.delete_barrel, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=3, column=2, columnspan=2, pady=15)
         ctk.CTkButton(input_frame, text="Procesar QR", command=self.process_qr_code, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=4, column=0, columnspan=2, pady=10)
         ctk.CTkButton(input_frame, text="Generar QR", command=self.generate_barrel_qr, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=4, column=2, columnspan=2, pady=10)
+        ctk.CTkButton(input_frame, text="QR en Lote", command=self.generate_qr_labels, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=5, column=0, columnspan=2, pady=10)
+        ctk.CTkButton(input_frame, text="Escanear Lote", command=self.open_scan_ingest, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=5, column=2, columnspan=2, pady=10)
+        ctk.CTkButton(input_frame, text="Historial", command=self.show_barrel_history, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=6, column=0, columnspan=2, pady=10)
         
         search_frame = ctk.CTkFrame(tab, fg_color=self.bg_color)
         search_frame.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
@@ -173,6 +1179,7 @@ class BreweryApp:
         self.barrel_search_entry.grid(row=0, column=1, padx=10, pady=5)
         self.barrel_search_entry.bind("<KeyRelease>", self.search_barrels)
         ctk.CTkButton(search_frame, text="Exportar a CSV", command=self.export_barrels, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Importar", command=lambda: self.import_table("barrels", self.update_barrel_table), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
         
         self.barrel_tree = ttk.Treeview(
             tab, columns=("ID", "Capacity", "Status", "Client ID", "Start Date"), show="headings", 
@@ -192,25 +1199,24 @@ class BreweryApp:
         tab.grid_rowconfigure(2, weight=1)
         tab.grid_columnconfigure(0, weight=1)
         
-        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", command=self.barrel_tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         v_scrollbar.grid(row=2, column=1, sticky="ns")
-        self.barrel_tree.configure(yscrollcommand=v_scrollbar.set)
         h_scrollbar = ctk.CTkScrollbar(tab, orientation="horizontal", command=self.barrel_tree.xview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         h_scrollbar.grid(row=3, column=0, sticky="ew")
         self.barrel_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.barrel_tree.bind("<MouseWheel>", lambda event: self.smooth_scroll(self.barrel_tree, event))
+        self.barrel_view = VirtualTreeview(self.barrel_tree, v_scrollbar, self.barrels)
         self.barrel_tree.bind("<Shift-MouseWheel>", lambda event: self.smooth_scroll(self.barrel_tree, event, horizontal=True))
         self.barrel_tree.bind("<<TreeviewSelect>>", self.select_barrel)
         
-        self.update_barrel_table()
+        self.load_view(self.barrel_view)
 
     def load_barrels(self):
         barrel_id = self.barrel_id_entry.get()
         capacity = self.barrel_capacity_entry.get()
         status = self.barrel_status_var.get()
         client_id = self.barrel_client_id_entry.get() or None
-        start_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if status == "Ocupado" else None
+        start_date = int(time.time()) if status == "Ocupado" else None
         
         if not barrel_id or not capacity:
             messagebox.showerror("Error", "ID y Capacidad son obligatorios")
@@ -224,24 +1230,21 @@ class BreweryApp:
             return
             
         if client_id:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id FROM clients WHERE id=?", (client_id,))
-            if not cursor.fetchone():
+            if not self.clients.exists(client_id):
                 messagebox.showerror("Error", "El ID del cliente no existe")
                 return
                 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO barrels (id, capacity, status, client_id, start_date) VALUES (?, ?, ?, ?, ?)",
-                (barrel_id, capacity, status, client_id, start_date)
-            )
-            self.conn.commit()
-            self.update_barrel_table()
-            messagebox.showinfo("Éxito", "Barril agregado correctamente")
-            self.clear_barrel_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID del barril ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID del barril ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Barril agregado correctamente")
+                self.clear_barrel_entries()
+
+        self.write([self.barrels.insert_statement(Barrel(barrel_id, capacity, status, client_id, start_date))], done)
 
     def delete_barrel(self):
         barrel_id = self.barrel_id_entry.get()
@@ -249,17 +1252,19 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del barril para eliminar")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM barrels WHERE id=?", (barrel_id,))
-        if not cursor.fetchone():
+        if not self.barrels.exists(barrel_id):
             messagebox.showerror("Error", "El ID del barril no existe")
             return
-            
-        cursor.execute("DELETE FROM barrels WHERE id=?", (barrel_id,))
-        self.conn.commit()
-        self.update_barrel_table()
-        messagebox.showinfo("Éxito", "Barril eliminado correctamente")
-        self.clear_barrel_entries()
+
+        def done(error):
+            if error:
+                messagebox.showerror("Error", str(error))
+                return
+            self.sync_changes()
+            messagebox.showinfo("Éxito", "Barril eliminado correctamente")
+            self.clear_barrel_entries()
+
+        self.write([self.barrels.delete_statement(barrel_id)], done)
 
     def select_barrel(self, event):
         selected = self.barrel_tree.selection()
@@ -276,43 +1281,101 @@ class BreweryApp:
         self.barrel_client_id_entry.insert(0, values[3] or "")
 
     def search_barrels(self, event=None):
-        search_term = self.barrel_search_entry.get().lower()
-        for item in self.barrel_tree.get_children():
-            self.barrel_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, capacity, status, client_id, start_date FROM barrels")
-        for row in cursor.fetchall():
-            if search_term in str(row[0]).lower() or search_term in str(row[2]).lower() or \
-               search_term in str(row[3]).lower():
-                self.barrel_tree.insert("", "end", values=row)
+        where, params = self.search_filter("barrels", self.barrel_search_entry.get())
+        self.search_worker.submit(self.barrel_view, where, params)
 
     def export_barrels(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, capacity, status, client_id, start_date FROM barrels")
-            barrels = cursor.fetchall()
-            df = pd.DataFrame(barrels, columns=["ID", "Capacidad (L)", "Estado", "ID del Cliente", "Fecha de Inicio"])
-            filename = f"barrels_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Éxito", f"Datos exportados a {filename}")
-            os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
+        self.export_table("barrels", ("id", "capacity", "status", "client_id", "start_date"), ["ID", "Capacidad (L)", "Estado", "ID del Cliente", "Fecha de Inicio"], "barrels")
+
+    def export_table(self, table, columns, headers, prefix):
+        if not self.local_only():
+            return
+        filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        job = ExportJob(self.readers, table, columns, headers, filename)
+        self.run_with_progress(job, "Exportando", f"Exportando {filename}...", self.finish_export)
+
+    def finish_export(self, job, event):
+        if event[0] == "done":
+            try:
+                messagebox.showinfo("Éxito", f"Datos exportados a {job.filename}")
+                os.startfile(job.filename)
+            except Exception as e:
+                messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
+        elif event[0] == "cancelled":
+            messagebox.showinfo("Exportación", "Exportación cancelada")
+        else:
+            messagebox.showerror("Error", f"No se pudo exportar: {event[1]}")
+
+    def import_table(self, table, refresh):
+        if not self.local_only():
+            return
+        filename = filedialog.askopenfilename(
+            title="Importar datos", filetypes=[("CSV o Excel", "*.csv *.xlsx *.xls"), ("Todos los archivos", "*.*")]
+        )
+        if not filename:
+            return
+        job = ImportJob(DB_PATH, table, filename)
+        self.run_with_progress(
+            job, "Importando", f"Importando {os.path.basename(filename)}...",
+            lambda job, event: self.finish_import(job, event, refresh)
+        )
+
+    def finish_import(self, job, event, refresh):
+        if event[0] == "error":
+            messagebox.showerror("Error", f"No se pudo importar, no se guardó ninguna fila: {event[1]}")
+            return
+        refresh()
+        summary = event[1]
+        message = f"{summary['inserted']} filas importadas ({summary['rate']:.0f} filas/s)"
+        if summary["rejected"]:
+            message += f"\n{summary['rejected']} filas rechazadas, detalle en {summary['rejected_file']}"
+        if event[0] == "cancelled":
+            messagebox.showinfo("Importación", "Importación cancelada, no se guardó ninguna fila")
+        else:
+            messagebox.showinfo("Éxito", message)
+
+    def run_with_progress(self, job, title, text, on_finish):
+        dialog = ctk.CTkToplevel(self.root, fg_color=self.bg_color)
+        dialog.title(title)
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        label = ctk.CTkLabel(dialog, text=text, text_color=self.text_color)
+        label.grid(row=0, column=0, padx=20, pady=(20, 5))
+        bar = ctk.CTkProgressBar(dialog, width=300, progress_color=self.accent_color)
+        bar.set(0)
+        bar.grid(row=1, column=0, padx=20, pady=5)
+        ctk.CTkButton(dialog, text="Cancelar", command=job.cancel, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=2, column=0, pady=(5, 20))
+        dialog.protocol("WM_DELETE_WINDOW", job.cancel)
+        job.start()
+        self.poll_job(job, dialog, label, bar, on_finish)
+
+    def poll_job(self, job, dialog, label, bar, on_finish):
+        while True:
+            try:
+                event = job.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "progress":
+                bar.set(event[1] / event[2] if event[2] else 1)
+                label.configure(text=f"{event[1]} de {event[2]} filas")
+                continue
+            dialog.destroy()
+            on_finish(job, event)
+            return
+        self.root.after(100, self.poll_job, job, dialog, label, bar, on_finish)
 
     def update_barrel_table(self):
-        for item in self.barrel_tree.get_children():
-            self.barrel_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, capacity, status, client_id, start_date FROM barrels")
-        for row in cursor.fetchall():
-            self.barrel_tree.insert("", "end", values=row)
+        self.search_worker.cancel(self.barrel_view)
+        self.barrel_view.set_filter()
 
     def clear_barrel_entries(self):
         self.barrel_id_entry.delete(0, "end")
         self.barrel_capacity_entry.delete(0, "end")
         self.barrel_status_combobox.set("Libre")
         self.barrel_client_id_entry.delete(0, "end")
-        self.barrel_search_entry.delete(0, "end")
+        if self.barrel_search_entry.get():
+            self.barrel_search_entry.delete(0, "end")
+            self.update_barrel_table()
 
     def process_qr_code(self):
         barrel_id = self.barrel_id_entry.get()
@@ -320,14 +1383,12 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del barril para procesar el QR")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, capacity, status, client_id, start_date FROM barrels WHERE id=?", (barrel_id,))
-        barrel = cursor.fetchone()
+        barrel = self.barrels.get(barrel_id)
         if not barrel:
             messagebox.showerror("Error", "Barril no encontrado")
             return
             
-        messagebox.showinfo("Información del Barril", f"ID: {barrel[0]}\nCapacidad: {barrel[1]} L\nEstado: {barrel[2]}\nCliente: {barrel[3] or 'N/A'}\nFecha: {barrel[4] or 'N/A'}")
+        messagebox.showinfo("Información del Barril", f"ID: {barrel.id}\nCapacidad: {barrel.capacity} L\nEstado: {barrel.status}\nCliente: {barrel.client_id or 'N/A'}\nFecha: {format_ts(barrel.start_date) or 'N/A'}")
 
     def generate_barrel_qr(self):
         barrel_id = self.barrel_id_entry.get()
@@ -335,15 +1396,165 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del barril para generar el QR")
             return
             
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(barrel_id)
-        qr.make(fit=True)
-        img = qr.make_image(fill="black", back_color="white")
         filename = f"barrel_qr_{barrel_id}.png"
-        img.save(filename)
+        shutil.copyfile(render_qr(barrel_id), filename)
         messagebox.showinfo("Éxito", f"Código QR generado: {filename}")
         os.startfile(filename)
 
+    def open_scan_ingest(self):
+        if not self.local_only():
+            return
+        dialog = ctk.CTkToplevel(self.root, fg_color=self.bg_color)
+        dialog.title("Escanear Lote")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        ctk.CTkLabel(dialog, text="Nuevo Estado:", text_color=self.text_color).grid(row=0, column=0, padx=10, pady=5, sticky="e")
+        status_var = ctk.StringVar(value="Libre")
+        ctk.CTkComboBox(
+            dialog, values=["Ocupado", "Libre", "En Limpieza"], variable=status_var,
+            width=200, fg_color="#2B2B2B", text_color=self.text_color, button_color=self.accent_color,
+            button_hover_color="#A68A64"
+        ).grid(row=0, column=1, padx=10, pady=5)
+        ctk.CTkLabel(dialog, text="ID del Cliente:", text_color=self.text_color).grid(row=1, column=0, padx=10, pady=5, sticky="e")
+        client_entry = ctk.CTkEntry(dialog, width=200, fg_color="#2B2B2B", text_color=self.text_color)
+        client_entry.grid(row=1, column=1, padx=10, pady=5)
+
+        def start(ask_source):
+            source = ask_source()
+            if not source:
+                return
+            status = status_var.get()
+            client_id = client_entry.get().strip() or None
+            if status == "Ocupado":
+                if not client_id:
+                    messagebox.showerror("Error", "Ingresa el ID del cliente para registrar la salida")
+                    return
+                if not self.clients.exists(client_id):
+                    messagebox.showerror("Error", "El ID del cliente no existe")
+                    return
+            dialog.destroy()
+            job = ScanIngestJob(DB_PATH, source, status, client_id)
+            self.run_with_progress(job, "Escaneo", f"Leyendo {os.path.basename(source)}...", self.finish_scan_ingest)
+
+        ctk.CTkButton(
+            dialog, text="Carpeta de Imágenes", command=lambda: start(lambda: filedialog.askdirectory(title="Carpeta de imágenes")),
+            fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color
+        ).grid(row=2, column=0, padx=10, pady=15)
+        ctk.CTkButton(
+            dialog, text="Archivo de Video",
+            command=lambda: start(lambda: filedialog.askopenfilename(title="Archivo de video", filetypes=[("Video", "*.mp4 *.avi *.mkv *.mov"), ("Todos los archivos", "*.*")])),
+            fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color
+        ).grid(row=2, column=1, padx=10, pady=15)
+
+    def movement_dialog(self, title, columns, headings):
+        dialog = ctk.CTkToplevel(self.root, fg_color=self.bg_color)
+        dialog.title(title)
+        dialog.transient(self.root)
+        tree = ttk.Treeview(dialog, columns=columns, show="headings", style="Treeview", height=15)
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=150)
+        tree.grid(row=1, column=0, columnspan=3, padx=10, pady=10, sticky="nsew")
+        dialog.grid_rowconfigure(1, weight=1)
+        dialog.grid_columnconfigure(2, weight=1)
+        return dialog, tree
+
+    def show_barrel_history(self):
+        barrel_id = self.barrel_id_entry.get().strip()
+        if not barrel_id:
+            messagebox.showerror("Error", "Ingresa el ID del barril para ver su historial")
+            return
+        history = self.movements.history(barrel_id, HISTORY_LIMIT)
+        if not history:
+            messagebox.showerror("Error", "El barril no tiene movimientos registrados")
+            return
+        dialog, tree = self.movement_dialog(f"Historial del Barril {barrel_id}", ("Date", "Status", "Client ID"), ("Fecha", "Estado", "ID del Cliente"))
+        for movement in history:
+            tree.insert("", "end", values=(format_ts(movement.ts), movement.status, movement.client_id or ""))
+        date_entry = ctk.CTkEntry(dialog, width=200, fg_color="#2B2B2B", text_color=self.text_color, placeholder_text="AAAA-MM-DD HH:MM")
+        date_entry.grid(row=0, column=0, padx=10, pady=5)
+        result_label = ctk.CTkLabel(dialog, text="", text_color=self.text_color)
+        result_label.grid(row=0, column=2, padx=10, pady=5, sticky="w")
+
+        def lookup():
+            text = date_entry.get().strip()
+            try:
+                when = datetime.strptime(text, "%Y-%m-%d %H:%M") if " " in text else datetime.strptime(text, "%Y-%m-%d").replace(hour=23, minute=59)
+            except ValueError:
+                messagebox.showerror("Error", "La fecha debe tener el formato AAAA-MM-DD o AAAA-MM-DD HH:MM", parent=dialog)
+                return
+            movement = self.movements.at(barrel_id, int(when.timestamp()))
+            if not movement:
+                result_label.configure(text="Sin registro a esa fecha")
+            else:
+                result_label.configure(text=f"{movement.status}{' - ' + movement.client_id if movement.client_id else ''} (desde {format_ts(movement.ts)})")
+
+        ctk.CTkButton(dialog, text="Consultar", command=lookup, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=1, padx=10, pady=5)
+
+    def show_client_quarter(self):
+        client_id = self.client_id_entry.get().strip()
+        if not client_id:
+            messagebox.showerror("Error", "Ingresa el ID del cliente para ver sus barriles")
+            return
+        start, end = previous_quarter()
+        held = {}
+        for movement in self.movements.held_by(client_id, int(start.timestamp()), int(end.timestamp())):
+            held.setdefault(movement.barrel_id, movement)
+        dialog, tree = self.movement_dialog(
+            f"Barriles de {client_id}: {start:%Y-%m-%d} a {end:%Y-%m-%d}", ("Barrel ID", "Since"), ("ID del Barril", "Asignado desde")
+        )
+        ctk.CTkLabel(dialog, text=f"{len(held)} barriles en el trimestre anterior", text_color=self.text_color).grid(row=0, column=0, columnspan=3, padx=10, pady=5, sticky="w")
+        for barrel_id, movement in held.items():
+            tree.insert("", "end", values=(barrel_id, format_ts(movement.ts)))
+
+    def finish_scan_ingest(self, job, event):
+        if event[0] == "error":
+            messagebox.showerror("Error", f"No se pudo procesar el escaneo: {event[1]}")
+            return
+        if event[0] == "cancelled":
+            messagebox.showinfo("Escaneo", "Escaneo cancelado, no se modificó ningún barril")
+            return
+        summary = event[1]
+        self.sync_changes()
+        message = (
+            f"{len(summary['updated'])} barriles pasados a {job.status}\n"
+            f"{summary['scans']} lecturas en {summary['frames']} imágenes, {summary['duplicates']} duplicadas\n"
+            f"{summary['rate']:.0f} lecturas/s ({summary['frame_rate']:.0f} imágenes/s)"
+        )
+        if summary["unknown"]:
+            message += f"\nNo encontrados: {', '.join(summary['unknown'][:10])}"
+            if len(summary["unknown"]) > 10:
+                message += f" y {len(summary['unknown']) - 10} más"
+        messagebox.showinfo("Escaneo", message)
+
+    def generate_qr_labels(self):
+        if not self.local_only():
+            return
+        barrel_ids = self.barrel_tree.selection()
+        if not barrel_ids and not messagebox.askyesno("QR en Lote", "No hay barriles seleccionados. ¿Generar etiquetas para todos?"):
+            return
+        job = QrLabelJob(self.readers, barrel_ids, f"qr_labels_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.run_with_progress(job, "Etiquetas QR", "Generando etiquetas QR...", self.finish_qr_labels)
+
+    def finish_qr_labels(self, job, event):
+        if event[0] == "error":
+            messagebox.showerror("Error", f"No se pudieron generar las etiquetas: {event[1]}")
+            return
+        if event[0] == "cancelled":
+            messagebox.showinfo("Etiquetas QR", "Generación cancelada")
+            return
+        if event[0] == "empty":
+            messagebox.showinfo("Etiquetas QR", "No hay barriles para generar etiquetas")
+            return
+        summary = event[1]
+        rate = f"{summary['per_thousand']:.2f} s por cada 1000 etiquetas nuevas\n" if summary["rendered"] else ""
+        messagebox.showinfo(
+            "Éxito",
+            f"{summary['labels']} etiquetas ({summary['rendered']} nuevas, {summary['cached']} en caché)\n"
+            f"{rate}Hoja: {job.sheet_file}\nImágenes: {job.zip_file}"
+        )
+        os.startfile(job.sheet_file)
+
     def setup_clients_tab(self):
         tab = self.tab_view.tab("Clientes")
         input_frame = ctk.CTkFrame(tab, fg_color=self.bg_color)
@@ -370,6 +1581,7 @@ class BreweryApp:
         
         ctk.CTkButton(input_frame, text="Agregar Cliente", command=self.add_client, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=3, column=0, columnspan=2, pady=15)
         ctk.CTkButton(input_frame, text="Eliminar Cliente", command=self.delete_client, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=3, column=2, columnspan=2, pady=15)
+        ctk.CTkButton(input_frame, text="Barriles del Trimestre", command=self.show_client_quarter, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=4, column=0, columnspan=2, pady=10)
         
         search_frame = ctk.CTkFrame(tab, fg_color=self.bg_color)
         search_frame.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
@@ -378,6 +1590,7 @@ class BreweryApp:
         self.client_search_entry.grid(row=0, column=1, padx=10, pady=5)
         self.client_search_entry.bind("<KeyRelease>", self.search_clients)
         ctk.CTkButton(search_frame, text="Exportar a CSV", command=self.export_clients, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Importar", command=lambda: self.import_table("clients", self.update_client_table), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
         
         self.client_tree = ttk.Treeview(
             tab, columns=("ID", "Name", "Contact", "Address"), show="headings", style="Treeview", height=15
@@ -394,18 +1607,17 @@ class BreweryApp:
         tab.grid_rowconfigure(2, weight=1)
         tab.grid_columnconfigure(0, weight=1)
         
-        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", command=self.client_tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         v_scrollbar.grid(row=2, column=1, sticky="ns")
-        self.client_tree.configure(yscrollcommand=v_scrollbar.set)
         h_scrollbar = ctk.CTkScrollbar(tab, orientation="horizontal", command=self.client_tree.xview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         h_scrollbar.grid(row=3, column=0, sticky="ew")
         self.client_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.client_tree.bind("<MouseWheel>", lambda event: self.smooth_scroll(self.client_tree, event))
+        self.client_view = VirtualTreeview(self.client_tree, v_scrollbar, self.clients)
         self.client_tree.bind("<Shift-MouseWheel>", lambda event: self.smooth_scroll(self.client_tree, event, horizontal=True))
         self.client_tree.bind("<<TreeviewSelect>>", self.select_client)
         
-        self.update_client_table()
+        self.load_view(self.client_view)
 
     def add_client(self):
         client_id = self.client_id_entry.get().strip()
@@ -417,18 +1629,17 @@ class BreweryApp:
             messagebox.showerror("Error", "ID y Nombre son obligatorios")
             return
             
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO clients (id, name, contact, address) VALUES (?, ?, ?, ?)",
-                (client_id, name, contact, address)
-            )
-            self.conn.commit()
-            self.update_client_table()
-            messagebox.showinfo("Éxito", "Cliente agregado correctamente")
-            self.clear_client_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID del cliente ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID del cliente ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Cliente agregado correctamente")
+                self.clear_client_entries()
+
+        self.write([self.clients.insert_statement(Client(client_id, name, contact, address))], done)
 
     def delete_client(self):
         client_id = self.client_id_entry.get().strip()
@@ -436,17 +1647,19 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del cliente para eliminar")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM clients WHERE id=?", (client_id,))
-        if not cursor.fetchone():
+        if not self.clients.exists(client_id):
             messagebox.showerror("Error", "El ID del cliente no existe")
             return
-            
-        cursor.execute("DELETE FROM clients WHERE id=?", (client_id,))
-        self.conn.commit()
-        self.update_client_table()
-        messagebox.showinfo("Éxito", "Cliente eliminado correctamente")
-        self.clear_client_entries()
+
+        def done(error):
+            if error:
+                messagebox.showerror("Error", str(error))
+                return
+            self.sync_changes()
+            messagebox.showinfo("Éxito", "Cliente eliminado correctamente")
+            self.clear_client_entries()
+
+        self.write([self.clients.delete_statement(client_id)], done)
 
     def select_client(self, event):
         selected = self.client_tree.selection()
@@ -464,42 +1677,24 @@ class BreweryApp:
         self.client_address_entry.insert(0, values[3])
 
     def search_clients(self, event=None):
-        search_term = self.client_search_entry.get().lower()
-        for item in self.client_tree.get_children():
-            self.client_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, contact, address FROM clients")
-        for row in cursor.fetchall():
-            if search_term in str(row[0]).lower() or search_term in str(row[1]).lower():
-                self.client_tree.insert("", "end", values=row)
+        where, params = self.search_filter("clients", self.client_search_entry.get())
+        self.search_worker.submit(self.client_view, where, params)
 
     def export_clients(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, name, contact, address FROM clients")
-            clients = cursor.fetchall()
-            df = pd.DataFrame(clients, columns=["ID", "Nombre", "Contacto", "Dirección"])
-            filename = f"clients_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Éxito", f"Datos exportados a {filename}")
-            os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
+        self.export_table("clients", ("id", "name", "contact", "address"), ["ID", "Nombre", "Contacto", "Dirección"], "clients")
 
     def update_client_table(self):
-        for item in self.client_tree.get_children():
-            self.client_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, contact, address FROM clients")
-        for row in cursor.fetchall():
-            self.client_tree.insert("", "end", values=row)
+        self.search_worker.cancel(self.client_view)
+        self.client_view.set_filter()
 
     def clear_client_entries(self):
         self.client_id_entry.delete(0, "end")
         self.client_name_entry.delete(0, "end")
         self.client_contact_entry.delete(0, "end")
         self.client_address_entry.delete(0, "end")
-        self.client_search_entry.delete(0, "end")
+        if self.client_search_entry.get():
+            self.client_search_entry.delete(0, "end")
+            self.update_client_table()
 
     def setup_invoices_tab(self):
         tab = self.tab_view.tab("Facturas")
@@ -551,9 +1746,11 @@ class BreweryApp:
         self.invoice_search_entry.grid(row=0, column=1, padx=10, pady=5)
         self.invoice_search_entry.bind("<KeyRelease>", self.search_invoices)
         ctk.CTkButton(search_frame, text="Exportar a CSV", command=self.export_invoices, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Importar", command=lambda: self.import_table("invoices", self.update_invoice_table), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Antigüedad de Saldos", command=self.show_aging_report, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=4, padx=10, pady=5)
         
         self.invoice_tree = ttk.Treeview(
-            tab, columns=("ID", "Client ID", "Amount", "Status", "Issue Date"), show="headings", 
+            tab, columns=("ID", "Client ID", "Amount", "Status", "Issue Date", "Paid", "Balance"), show="headings", 
             style="Treeview", height=15
         )
         self.invoice_tree.heading("ID", text="ID de Factura")
@@ -561,34 +1758,37 @@ class BreweryApp:
         self.invoice_tree.heading("Amount", text="Monto")
         self.invoice_tree.heading("Status", text="Estado")
         self.invoice_tree.heading("Issue Date", text="Fecha de Emisión")
+        self.invoice_tree.heading("Paid", text="Pagado")
+        self.invoice_tree.heading("Balance", text="Saldo")
         self.invoice_tree.column("ID", width=150)
         self.invoice_tree.column("Client ID", width=150)
         self.invoice_tree.column("Amount", width=150)
         self.invoice_tree.column("Status", width=150)
         self.invoice_tree.column("Issue Date", width=150)
+        self.invoice_tree.column("Paid", width=120)
+        self.invoice_tree.column("Balance", width=120)
         self.invoice_tree.grid(row=3, column=0, padx=10, pady=10, sticky="nsew")
         tab.grid_rowconfigure(3, weight=1)
         tab.grid_columnconfigure(0, weight=1)
         
-        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", command=self.invoice_tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         v_scrollbar.grid(row=3, column=1, sticky="ns")
-        self.invoice_tree.configure(yscrollcommand=v_scrollbar.set)
         h_scrollbar = ctk.CTkScrollbar(tab, orientation="horizontal", command=self.invoice_tree.xview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         h_scrollbar.grid(row=4, column=0, sticky="ew")
         self.invoice_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.invoice_tree.bind("<MouseWheel>", lambda event: self.smooth_scroll(self.invoice_tree, event))
+        self.invoice_view = VirtualTreeview(self.invoice_tree, v_scrollbar, self.invoices)
         self.invoice_tree.bind("<Shift-MouseWheel>", lambda event: self.smooth_scroll(self.invoice_tree, event, horizontal=True))
         self.invoice_tree.bind("<<TreeviewSelect>>", self.select_invoice)
         
-        self.update_invoice_table()
+        self.load_view(self.invoice_view)
 
     def add_invoice(self):
         invoice_id = self.invoice_id_entry.get().strip()
         client_id = self.invoice_client_id_entry.get().strip()
         amount = self.invoice_amount_entry.get().strip()
         status = self.invoice_status_var.get()
-        issue_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        issue_date = int(time.time())
         
         if not invoice_id or not client_id or not amount:
             messagebox.showerror("Error", "ID, Cliente y Monto son obligatorios")
@@ -602,29 +1802,27 @@ class BreweryApp:
             messagebox.showerror("Error", "El monto debe ser un número positivo")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM clients WHERE id=?", (client_id,))
-        if not cursor.fetchone():
+        if not self.clients.exists(client_id):
             messagebox.showerror("Error", "El ID del cliente no existe")
             return
             
-        try:
-            cursor.execute(
-                "INSERT INTO invoices (id, client_id, amount, status, issue_date) VALUES (?, ?, ?, ?, ?)",
-                (invoice_id, client_id, amount, status, issue_date)
-            )
-            self.conn.commit()
-            self.update_invoice_table()
-            messagebox.showinfo("Éxito", "Factura agregada correctamente")
-            self.clear_invoice_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID de la factura ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID de la factura ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Factura agregada correctamente")
+                self.clear_invoice_entries()
+
+        self.write([self.invoices.insert_statement(Invoice(invoice_id, client_id, amount, status, issue_date))], done)
 
     def add_payment(self):
         payment_id = self.payment_id_entry.get().strip()
         invoice_id = self.invoice_id_entry.get().strip()
         amount = self.payment_amount_entry.get().strip()
-        payment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        payment_date = int(time.time())
         
         if not payment_id or not invoice_id or not amount:
             messagebox.showerror("Error", "ID de Pago, Factura y Monto son obligatorios")
@@ -638,28 +1836,21 @@ class BreweryApp:
             messagebox.showerror("Error", "El monto debe ser un número positivo")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, amount FROM invoices WHERE id=?", (invoice_id,))
-        invoice = cursor.fetchone()
-        if not invoice:
+        if not self.invoices.exists(invoice_id):
             messagebox.showerror("Error", "La factura no existe")
             return
             
-        try:
-            cursor.execute(
-                "INSERT INTO payments (id, invoice_id, amount, payment_date) VALUES (?, ?, ?, ?)",
-                (payment_id, invoice_id, amount, payment_date)
-            )
-            cursor.execute(
-                "UPDATE invoices SET status = ? WHERE id = ?",
-                ("Pagada" if amount >= invoice[1] else "Pendiente", invoice_id)
-            )
-            self.conn.commit()
-            self.update_invoice_table()
-            messagebox.showinfo("Éxito", "Pago registrado correctamente")
-            self.clear_payment_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID del pago ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID del pago ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Pago registrado correctamente")
+                self.clear_payment_entries()
+
+        self.write([self.payments.insert_statement(Payment(payment_id, invoice_id, amount, payment_date))], done)
 
     def select_invoice(self, event):
         selected = self.invoice_tree.selection()
@@ -676,42 +1867,78 @@ class BreweryApp:
         self.invoice_status_combobox.set(values[3])
 
     def search_invoices(self, event=None):
-        search_term = self.invoice_search_entry.get().lower()
-        for item in self.invoice_tree.get_children():
-            self.invoice_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, client_id, amount, status, issue_date FROM invoices")
-        for row in cursor.fetchall():
-            if search_term in str(row[0]).lower() or search_term in str(row[1]).lower():
-                self.invoice_tree.insert("", "end", values=row)
+        where, params = self.search_filter("invoices", self.invoice_search_entry.get())
+        self.search_worker.submit(self.invoice_view, where, params)
 
     def export_invoices(self):
+        self.export_table("invoices", ("id", "client_id", "amount", "status", "issue_date", "paid_total", "balance"), ["ID", "ID del Cliente", "Monto", "Estado", "Fecha de Emisión", "Pagado", "Saldo"], "invoices")
+
+    def show_aging_report(self):
+        if not self.local_only():
+            return
+        from reports import AgingCache, AgingJob, aging_key
+        if self.aging_cache is None:
+            self.aging_cache = AgingCache()
+        frame = self.aging_cache.get(aging_key(self.conn))
+        if frame is not None:
+            self.open_aging_report(frame, None)
+            return
+        job = AgingJob(self.readers, self.aging_cache)
+        self.run_with_progress(job, "Antigüedad de Saldos", "Calculando antigüedad de saldos...", self.finish_aging_report)
+
+    def finish_aging_report(self, job, event):
+        if event[0] == "error":
+            messagebox.showerror("Error", f"No se pudo calcular la antigüedad de saldos: {event[1]}")
+        elif event[0] == "done":
+            self.open_aging_report(event[1]["frame"], event[1]["elapsed"])
+
+    def open_aging_report(self, frame, elapsed):
+        from reports import AGING_BUCKETS
+        dialog = ctk.CTkToplevel(self.root, fg_color=self.bg_color)
+        dialog.title("Antigüedad de Saldos")
+        dialog.transient(self.root)
+        totals = "   ".join(f"{bucket} días: {frame[bucket].sum():,.2f}" for bucket in AGING_BUCKETS)
+        source = "desde caché" if elapsed is None else f"calculado en {elapsed * 1000:.0f} ms"
+        ctk.CTkLabel(
+            dialog, text=f"{totals}   Total: {frame['total'].sum():,.2f}\n{len(frame)} clientes con saldo ({source})",
+            justify="left", text_color=self.text_color
+        ).grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        columns = ("Client ID", "Name", *AGING_BUCKETS, "Total", "Open")
+        tree = ttk.Treeview(dialog, columns=columns, show="headings", style="Treeview", height=20)
+        for column, text in zip(columns, ("ID del Cliente", "Nombre", *(f"{bucket} días" for bucket in AGING_BUCKETS), "Total", "Facturas Abiertas")):
+            tree.heading(column, text=text)
+            tree.column(column, width=110)
+        for row in frame.head(AGING_REPORT_ROWS).itertuples(index=False):
+            tree.insert("", "end", values=(row[0], row[1], *(f"{value:,.2f}" for value in row[2:-1]), row[-1]))
+        tree.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
+        scrollbar = ctk.CTkScrollbar(dialog, orientation="vertical", command=tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+        ctk.CTkButton(dialog, text="Exportar a CSV", command=lambda: self.export_aging_report(frame), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=2, column=0, pady=10)
+        dialog.grid_rowconfigure(1, weight=1)
+        dialog.grid_columnconfigure(0, weight=1)
+
+    def export_aging_report(self, frame):
+        from reports import export_aging
+        filename = f"aging_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, client_id, amount, status, issue_date FROM invoices")
-            invoices = cursor.fetchall()
-            df = pd.DataFrame(invoices, columns=["ID", "ID del Cliente", "Monto", "Estado", "Fecha de Emisión"])
-            filename = f"invoices_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Éxito", f"Datos exportados a {filename}")
-            os.startfile(filename)
+            export_aging(frame, filename)
+            messagebox.showinfo("Éxito", f"Antigüedad de saldos exportada a {filename}")
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
 
     def update_invoice_table(self):
-        for item in self.invoice_tree.get_children():
-            self.invoice_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, client_id, amount, status, issue_date FROM invoices")
-        for row in cursor.fetchall():
-            self.invoice_tree.insert("", "end", values=row)
+        self.search_worker.cancel(self.invoice_view)
+        self.invoice_view.set_filter()
 
     def clear_invoice_entries(self):
         self.invoice_id_entry.delete(0, "end")
         self.invoice_client_id_entry.delete(0, "end")
         self.invoice_amount_entry.delete(0, "end")
         self.invoice_status_combobox.set("Pendiente")
-        self.invoice_search_entry.delete(0, "end")
+        if self.invoice_search_entry.get():
+            self.invoice_search_entry.delete(0, "end")
+            self.update_invoice_table()
 
     def clear_payment_entries(self):
         self.payment_id_entry.delete(0, "end")
@@ -756,6 +1983,7 @@ class BreweryApp:
         self.batch_search_entry.grid(row=0, column=1, padx=10, pady=5)
         self.batch_search_entry.bind("<KeyRelease>", self.search_batches)
         ctk.CTkButton(search_frame, text="Exportar a CSV", command=self.export_batches, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Importar", command=lambda: self.import_table("batches", self.update_batch_table), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
         
         self.batch_tree = ttk.Treeview(
             tab, columns=("ID", "Product Name", "Volume", "Status", "Start Date"), show="headings", 
@@ -775,25 +2003,24 @@ class BreweryApp:
         tab.grid_rowconfigure(2, weight=1)
         tab.grid_columnconfigure(0, weight=1)
         
-        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", command=self.batch_tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         v_scrollbar.grid(row=2, column=1, sticky="ns")
-        self.batch_tree.configure(yscrollcommand=v_scrollbar.set)
         h_scrollbar = ctk.CTkScrollbar(tab, orientation="horizontal", command=self.batch_tree.xview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         h_scrollbar.grid(row=3, column=0, sticky="ew")
         self.batch_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.batch_tree.bind("<MouseWheel>", lambda event: self.smooth_scroll(self.batch_tree, event))
+        self.batch_view = VirtualTreeview(self.batch_tree, v_scrollbar, self.batches)
         self.batch_tree.bind("<Shift-MouseWheel>", lambda event: self.smooth_scroll(self.batch_tree, event, horizontal=True))
         self.batch_tree.bind("<<TreeviewSelect>>", self.select_batch)
         
-        self.update_batch_table()
+        self.load_view(self.batch_view)
 
     def add_batch(self):
         batch_id = self.batch_id_entry.get().strip()
         product_name = self.batch_name_entry.get().strip()
         volume = self.batch_volume_entry.get().strip()
         status = self.batch_status_var.get()
-        start_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        start_date = int(time.time())
         
         if not batch_id or not product_name or not volume:
             messagebox.showerror("Error", "ID, Nombre y Volumen son obligatorios")
@@ -807,18 +2034,17 @@ class BreweryApp:
             messagebox.showerror("Error", "El volumen debe ser un número positivo")
             return
             
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO batches (id, product_name, volume, status, start_date) VALUES (?, ?, ?, ?, ?)",
-                (batch_id, product_name, volume, status, start_date)
-            )
-            self.conn.commit()
-            self.update_batch_table()
-            messagebox.showinfo("Éxito", "Lote agregado correctamente")
-            self.clear_batch_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID del lote ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID del lote ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Lote agregado correctamente")
+                self.clear_batch_entries()
+
+        self.write([self.batches.insert_statement(Batch(batch_id, product_name, volume, status, start_date))], done)
 
     def delete_batch(self):
         batch_id = self.batch_id_entry.get().strip()
@@ -826,17 +2052,19 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del lote para eliminar")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM batches WHERE id=?", (batch_id,))
-        if not cursor.fetchone():
+        if not self.batches.exists(batch_id):
             messagebox.showerror("Error", "El ID del lote no existe")
             return
-            
-        cursor.execute("DELETE FROM batches WHERE id=?", (batch_id,))
-        self.conn.commit()
-        self.update_batch_table()
-        messagebox.showinfo("Éxito", "Lote eliminado correctamente")
-        self.clear_batch_entries()
+
+        def done(error):
+            if error:
+                messagebox.showerror("Error", str(error))
+                return
+            self.sync_changes()
+            messagebox.showinfo("Éxito", "Lote eliminado correctamente")
+            self.clear_batch_entries()
+
+        self.write([self.batches.delete_statement(batch_id)], done)
 
     def select_batch(self, event):
         selected = self.batch_tree.selection()
@@ -853,42 +2081,24 @@ class BreweryApp:
         self.batch_status_combobox.set(values[3])
 
     def search_batches(self, event=None):
-        search_term = self.batch_search_entry.get().lower()
-        for item in self.batch_tree.get_children():
-            self.batch_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, product_name, volume, status, start_date FROM batches")
-        for row in cursor.fetchall():
-            if search_term in str(row[0]).lower() or search_term in str(row[1]).lower():
-                self.batch_tree.insert("", "end", values=row)
+        where, params = self.search_filter("batches", self.batch_search_entry.get())
+        self.search_worker.submit(self.batch_view, where, params)
 
     def export_batches(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, product_name, volume, status, start_date FROM batches")
-            batches = cursor.fetchall()
-            df = pd.DataFrame(batches, columns=["ID", "Nombre del Producto", "Volumen (L)", "Estado", "Fecha de Inicio"])
-            filename = f"batches_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Éxito", f"Datos exportados a {filename}")
-            os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
+        self.export_table("batches", ("id", "product_name", "volume", "status", "start_date"), ["ID", "Nombre del Producto", "Volumen (L)", "Estado", "Fecha de Inicio"], "batches")
 
     def update_batch_table(self):
-        for item in self.batch_tree.get_children():
-            self.batch_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, product_name, volume, status, start_date FROM batches")
-        for row in cursor.fetchall():
-            self.batch_tree.insert("", "end", values=row)
+        self.search_worker.cancel(self.batch_view)
+        self.batch_view.set_filter()
 
     def clear_batch_entries(self):
         self.batch_id_entry.delete(0, "end")
         self.batch_name_entry.delete(0, "end")
         self.batch_volume_entry.delete(0, "end")
         self.batch_status_combobox.set("En curso")
-        self.batch_search_entry.delete(0, "end")
+        if self.batch_search_entry.get():
+            self.batch_search_entry.delete(0, "end")
+            self.update_batch_table()
 
     def setup_fermenters_tab(self):
         tab = self.tab_view.tab("Fermentadores")
@@ -929,6 +2139,7 @@ class BreweryApp:
         self.fermenter_search_entry.grid(row=0, column=1, padx=10, pady=5)
         self.fermenter_search_entry.bind("<KeyRelease>", self.search_fermenters)
         ctk.CTkButton(search_frame, text="Exportar a CSV", command=self.export_fermenters, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5)
+        ctk.CTkButton(search_frame, text="Planificar Lotes", command=self.open_fermenter_planner, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
         
         self.fermenter_tree = ttk.Treeview(
             tab, columns=("ID", "Capacity", "Status", "Batch ID", "Start Date"), show="headings", 
@@ -948,25 +2159,125 @@ class BreweryApp:
         tab.grid_rowconfigure(2, weight=1)
         tab.grid_columnconfigure(0, weight=1)
         
-        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", command=self.fermenter_tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         v_scrollbar.grid(row=2, column=1, sticky="ns")
-        self.fermenter_tree.configure(yscrollcommand=v_scrollbar.set)
         h_scrollbar = ctk.CTkScrollbar(tab, orientation="horizontal", command=self.fermenter_tree.xview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
         h_scrollbar.grid(row=3, column=0, sticky="ew")
         self.fermenter_tree.configure(xscrollcommand=h_scrollbar.set)
         
-        self.fermenter_tree.bind("<MouseWheel>", lambda event: self.smooth_scroll(self.fermenter_tree, event))
+        self.fermenter_view = VirtualTreeview(self.fermenter_tree, v_scrollbar, self.fermenters)
         self.fermenter_tree.bind("<Shift-MouseWheel>", lambda event: self.smooth_scroll(self.fermenter_tree, event, horizontal=True))
         self.fermenter_tree.bind("<<TreeviewSelect>>", self.select_fermenter)
         
-        self.update_fermenter_table()
+        self.load_view(self.fermenter_view)
+
+    def open_fermenter_planner(self):
+        if not self.local_only():
+            return
+        from planner import CLEAN_DAYS, FERMENT_DAYS
+        dialog = ctk.CTkToplevel(self.root, fg_color=self.bg_color)
+        dialog.title("Planificación de Fermentadores")
+        dialog.transient(self.root)
+        options = ctk.CTkFrame(dialog, fg_color=self.bg_color)
+        options.grid(row=0, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+        entries = {}
+        for column, (name, text, value) in enumerate((
+            ("ferment_days", "Días de fermentación:", FERMENT_DAYS), ("clean_days", "Días de limpieza:", CLEAN_DAYS),
+            ("extra", "Fermentadores extra (L):", ""), ("exclude", "Fuera de servicio (IDs):", ""),
+        )):
+            ctk.CTkLabel(options, text=text, text_color=self.text_color).grid(row=column // 2, column=column % 2 * 2, padx=10, pady=5, sticky="e")
+            entries[name] = ctk.CTkEntry(options, width=200, fg_color="#2B2B2B", text_color=self.text_color)
+            entries[name].insert(0, str(value))
+            entries[name].grid(row=column // 2, column=column % 2 * 2 + 1, padx=10, pady=5)
+        label = ctk.CTkLabel(dialog, text="", justify="left", text_color=self.text_color)
+        label.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        columns = ("Batch ID", "Fermenter ID", "Volume", "Capacity", "Start", "End")
+        tree = ttk.Treeview(dialog, columns=columns, show="headings", style="Treeview", height=20)
+        for column, text in zip(columns, ("ID de Lote", "ID del Fermentador", "Volumen (L)", "Capacidad (L)", "Inicio", "Fin")):
+            tree.heading(column, text=text)
+            tree.column(column, width=130)
+        tree.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
+        scrollbar = ctk.CTkScrollbar(dialog, orientation="vertical", command=tree.yview, fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        scrollbar.grid(row=2, column=1, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+        buttons = ctk.CTkFrame(dialog, fg_color=self.bg_color)
+        buttons.grid(row=3, column=0, columnspan=2, pady=10)
+        apply_button = ctk.CTkButton(buttons, text="Aplicar Inicios de Hoy", command=lambda: self.apply_fermenter_plan(dialog), fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color)
+        simulate = lambda: self.simulate_fermenter_plan(entries, label, tree, apply_button)
+        ctk.CTkButton(buttons, text="Simular", command=simulate, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=0, padx=10)
+        apply_button.grid(row=0, column=1, padx=10)
+        dialog.grid_rowconfigure(2, weight=1)
+        dialog.grid_columnconfigure(0, weight=1)
+        simulate()
+
+    def simulate_fermenter_plan(self, entries, label, tree, apply_button):
+        from planner import plan_fermenters
+        try:
+            ferment_days = float(entries["ferment_days"].get())
+            clean_days = float(entries["clean_days"].get())
+            extra = [float(value) for value in entries["extra"].get().replace(";", ",").split(",") if value.strip()]
+            if ferment_days <= 0 or clean_days < 0 or any(capacity <= 0 for capacity in extra):
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Los días y las capacidades extra deben ser números positivos")
+            return
+        exclude = {value.strip() for value in entries["exclude"].get().replace(";", ",").split(",") if value.strip()}
+        started = time.perf_counter()
+        with self.readers.connection() as conn:
+            plan = plan_fermenters(conn, None, ferment_days, clean_days, extra, exclude)
+        elapsed = time.perf_counter() - started
+        tree.delete(*tree.get_children())
+        for assignment in plan.assignments[:PLAN_ROWS]:
+            tree.insert("", "end", values=(
+                assignment.batch_id, assignment.fermenter_id, f"{assignment.volume:,.0f}", f"{assignment.capacity:,.0f}",
+                format_ts(assignment.start), format_ts(assignment.end),
+            ))
+        lines = [
+            f"{len(plan.assignments)} lotes planificados, {len(plan.starting())} pueden iniciar hoy, "
+            f"llenado {plan.fill():.0%}, horizonte {plan.makespan() / 86400:.1f} días ({elapsed * 1000:.0f} ms)"
+        ]
+        if plan.unplaced:
+            lines.append(f"{len(plan.unplaced)} lotes sin asignar: " + ", ".join(
+                f"{batch_id} ({reason})" for batch_id, _, reason in plan.unplaced[:5]
+            ) + ("..." if len(plan.unplaced) > 5 else ""))
+        if plan.what_if:
+            lines.append("Simulación: no se puede aplicar, restablece los valores por defecto para aplicar el plan")
+        label.configure(text="\n".join(lines))
+        apply_button.configure(state="disabled" if plan.what_if or not plan.starting() else "normal")
+
+    def apply_fermenter_plan(self, dialog):
+        from planner import apply_statements, plan_fermenters
+        with self.readers.connection() as conn:
+            plan = plan_fermenters(conn)
+        statements = apply_statements(plan, self.fermenters, self.batches)
+        if not statements:
+            messagebox.showinfo("Planificación", "No hay lotes que puedan iniciar hoy")
+            return
+        if not messagebox.askyesno("Confirmar", f"¿Iniciar {len(statements) // 2} lotes en sus fermentadores asignados?"):
+            return
+
+        def done(error):
+            if isinstance(error, WriteConflict):
+                self.sync_changes()
+                messagebox.showerror(
+                    "Conflicto", f"No se inició ningún lote: {error}. Otro usuario cambió los fermentadores, vuelve a planificar."
+                )
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                if dialog.winfo_exists():
+                    dialog.destroy()
+                messagebox.showinfo("Éxito", f"{len(statements) // 2} lotes iniciados")
+
+        self.write(statements, done)
 
     def add_fermenter(self):
         fermenter_id = self.fermenter_id_entry.get().strip()
         capacity = self.fermenter_capacity_entry.get().strip()
         status = self.fermenter_status_var.get()
         batch_id = self.fermenter_batch_id_entry.get().strip() or None
-        start_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if status == "Ocupado" else None
+        start_date = int(time.time()) if status == "Ocupado" else None
         
         if not fermenter_id or not capacity:
             messagebox.showerror("Error", "ID y Capacidad son obligatorios")
@@ -980,24 +2291,21 @@ class BreweryApp:
             return
             
         if batch_id:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id FROM batches WHERE id=?", (batch_id,))
-            if not cursor.fetchone():
+            if not self.batches.exists(batch_id):
                 messagebox.showerror("Error", "El ID de lote no existe")
                 return
                 
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(
-                "INSERT INTO fermenters (id, capacity, status, batch_id, start_date) VALUES (?, ?, ?, ?, ?)",
-                (fermenter_id, capacity, status, batch_id, start_date)
-            )
-            self.conn.commit()
-            self.update_fermenter_table()
-            messagebox.showinfo("Éxito", "Fermentador agregado correctamente")
-            self.clear_fermenter_entries()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El ID del fermentador ya existe")
+        def done(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El ID del fermentador ya existe")
+            elif error:
+                messagebox.showerror("Error", str(error))
+            else:
+                self.sync_changes()
+                messagebox.showinfo("Éxito", "Fermentador agregado correctamente")
+                self.clear_fermenter_entries()
+
+        self.write([self.fermenters.insert_statement(Fermenter(fermenter_id, capacity, status, batch_id, start_date))], done)
 
     def delete_fermenter(self):
         fermenter_id = self.fermenter_id_entry.get().strip()
@@ -1005,17 +2313,19 @@ class BreweryApp:
             messagebox.showerror("Error", "Ingresa el ID del fermentador para eliminar")
             return
             
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM fermenters WHERE id=?", (fermenter_id,))
-        if not cursor.fetchone():
+        if not self.fermenters.exists(fermenter_id):
             messagebox.showerror("Error", "El ID del fermentador no existe")
             return
-            
-        cursor.execute("DELETE FROM fermenters WHERE id=?", (fermenter_id,))
-        self.conn.commit()
-        self.update_fermenter_table()
-        messagebox.showinfo("Éxito", "Fermentador eliminado correctamente")
-        self.clear_fermenter_entries()
+
+        def done(error):
+            if error:
+                messagebox.showerror("Error", str(error))
+                return
+            self.sync_changes()
+            messagebox.showinfo("Éxito", "Fermentador eliminado correctamente")
+            self.clear_fermenter_entries()
+
+        self.write([self.fermenters.delete_statement(fermenter_id)], done)
 
     def select_fermenter(self, event):
         selected = self.fermenter_tree.selection()
@@ -1032,43 +2342,152 @@ class BreweryApp:
         self.fermenter_batch_id_entry.insert(0, values[3] or "")
 
     def search_fermenters(self, event=None):
-        search_term = self.fermenter_search_entry.get().lower()
-        for item in self.fermenter_tree.get_children():
-            self.fermenter_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, capacity, status, batch_id, start_date FROM fermenters")
-        for row in cursor.fetchall():
-            if search_term in str(row[0]).lower() or search_term in str(row[2]).lower() or \
-               search_term in str(row[3]).lower():
-                self.fermenter_tree.insert("", "end", values=row)
+        where, params = self.search_filter("fermenters", self.fermenter_search_entry.get())
+        self.search_worker.submit(self.fermenter_view, where, params)
 
     def export_fermenters(self):
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT id, capacity, status, batch_id, start_date FROM fermenters")
-            fermenters = cursor.fetchall()
-            df = pd.DataFrame(fermenters, columns=["ID", "Capacidad (L)", "Estado", "ID de Lote", "Fecha de Inicio"])
-            filename = f"fermenters_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            df.to_csv(filename, index=False)
-            messagebox.showinfo("Éxito", f"Datos exportados a {filename}")
-            os.startfile(filename)
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
+        self.export_table("fermenters", ("id", "capacity", "status", "batch_id", "start_date"), ["ID", "Capacidad (L)", "Estado", "ID de Lote", "Fecha de Inicio"], "fermenters")
 
     def update_fermenter_table(self):
-        for item in self.fermenter_tree.get_children():
-            self.fermenter_tree.delete(item)
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, capacity, status, batch_id, start_date FROM fermenters")
-        for row in cursor.fetchall():
-            self.fermenter_tree.insert("", "end", values=row)
+        self.search_worker.cancel(self.fermenter_view)
+        self.fermenter_view.set_filter()
 
     def clear_fermenter_entries(self):
         self.fermenter_id_entry.delete(0, "end")
         self.fermenter_capacity_entry.delete(0, "end")
         self.fermenter_status_combobox.set("Libre")
         self.fermenter_batch_id_entry.delete(0, "end")
-        self.fermenter_search_entry.delete(0, "end")
+        if self.fermenter_search_entry.get():
+            self.fermenter_search_entry.delete(0, "end")
+            self.update_fermenter_table()
+
+    def setup_dashboard_tab(self):
+        tab = self.tab_view.tab("Panel")
+        summary_frame = ctk.CTkFrame(tab, fg_color=self.bg_color)
+        summary_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+        
+        ctk.CTkLabel(summary_frame, text="Barriles", font=("Arial", 16, "bold"), text_color=self.text_color).grid(row=0, column=0, padx=10, pady=5, sticky="w")
+        ctk.CTkLabel(summary_frame, text="Fermentadores", font=("Arial", 16, "bold"), text_color=self.text_color).grid(row=0, column=1, padx=10, pady=5, sticky="w")
+        ctk.CTkLabel(summary_frame, text="Cuentas por Cobrar", font=("Arial", 16, "bold"), text_color=self.text_color).grid(row=0, column=2, padx=10, pady=5, sticky="w")
+        self.dashboard_barrel_label = ctk.CTkLabel(summary_frame, text="", justify="left", text_color=self.text_color)
+        self.dashboard_barrel_label.grid(row=1, column=0, padx=10, pady=5, sticky="nw")
+        self.dashboard_fermenter_label = ctk.CTkLabel(summary_frame, text="", justify="left", text_color=self.text_color)
+        self.dashboard_fermenter_label.grid(row=1, column=1, padx=10, pady=5, sticky="nw")
+        self.dashboard_receivables_label = ctk.CTkLabel(summary_frame, text="", justify="left", text_color=self.text_color)
+        self.dashboard_receivables_label.grid(row=1, column=2, padx=10, pady=5, sticky="nw")
+        ctk.CTkButton(summary_frame, text="Actualizar", command=self.refresh_dashboard, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=2, column=0, pady=10)
+        ctk.CTkButton(summary_frame, text="Instantánea Parquet", command=self.snapshot_tables, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=2, column=1, pady=10)
+        for column in range(3):
+            summary_frame.grid_columnconfigure(column, weight=1)
+        
+        self.dashboard_tree = ttk.Treeview(
+            tab, columns=("Client ID", "Name", "Open", "Outstanding"), show="headings",
+            style="Treeview", height=DASHBOARD_TOP_CLIENTS
+        )
+        self.dashboard_tree.heading("Client ID", text="ID del Cliente")
+        self.dashboard_tree.heading("Name", text="Nombre")
+        self.dashboard_tree.heading("Open", text="Facturas Abiertas")
+        self.dashboard_tree.heading("Outstanding", text="Saldo Pendiente")
+        for column in ("Client ID", "Name", "Open", "Outstanding"):
+            self.dashboard_tree.column(column, width=150)
+        self.dashboard_tree.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+        tab.grid_rowconfigure(1, weight=1)
+        tab.grid_columnconfigure(0, weight=1)
+        
+        overdue_frame = ctk.CTkFrame(tab, fg_color=self.bg_color)
+        overdue_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+        ctk.CTkLabel(overdue_frame, text="Barriles con más de", text_color=self.text_color).grid(row=0, column=0, padx=5, pady=5)
+        self.overdue_days_entry = ctk.CTkEntry(overdue_frame, width=60, fg_color="#2B2B2B", text_color=self.text_color)
+        self.overdue_days_entry.insert(0, str(OVERDUE_DAYS))
+        self.overdue_days_entry.grid(row=0, column=1, padx=5, pady=5)
+        ctk.CTkLabel(overdue_frame, text="días en clientes", text_color=self.text_color).grid(row=0, column=2, padx=5, pady=5)
+        ctk.CTkButton(overdue_frame, text="Buscar Vencidos", command=self.refresh_overdue, fg_color=self.accent_color, hover_color="#A68A64", text_color=self.text_color).grid(row=0, column=3, padx=10, pady=5)
+        self.overdue_label = ctk.CTkLabel(overdue_frame, text="", text_color=self.text_color)
+        self.overdue_label.grid(row=0, column=4, padx=10, pady=5, sticky="w")
+        self.overdue_days_entry.bind("<Return>", lambda event: self.refresh_overdue())
+        
+        self.overdue_tree = ttk.Treeview(
+            tab, columns=("ID", "Capacity", "Status", "Client ID", "Start Date"), show="headings",
+            style="Treeview", height=10
+        )
+        self.overdue_tree.heading("ID", text="ID del Barril")
+        self.overdue_tree.heading("Capacity", text="Capacidad (L)")
+        self.overdue_tree.heading("Status", text="Estado")
+        self.overdue_tree.heading("Client ID", text="ID del Cliente")
+        self.overdue_tree.heading("Start Date", text="Fecha de Inicio")
+        for column in ("ID", "Capacity", "Status", "Client ID", "Start Date"):
+            self.overdue_tree.column(column, width=150)
+        self.overdue_tree.grid(row=3, column=0, padx=10, pady=10, sticky="nsew")
+        tab.grid_rowconfigure(3, weight=1)
+        v_scrollbar = ctk.CTkScrollbar(tab, orientation="vertical", fg_color="#2B2B2B", button_color="#8B6F47", button_hover_color="#A68A64")
+        v_scrollbar.grid(row=3, column=1, sticky="ns")
+        self.overdue_view = VirtualTreeview(self.overdue_tree, v_scrollbar, self.barrels)
+        self.overdue_view.orders["start_date"] = self.barrels.held_order
+        self.overdue_view.sort = "start_date"
+        self.overdue_tree.heading("Start Date", text="Fecha de Inicio ▲")
+        self.watch(self.overdue_view)
+        
+        self.refresh_dashboard()
+
+    def snapshot_tables(self):
+        if not self.local_only():
+            return
+        from snapshot import SNAPSHOT_DIR, SnapshotJob
+        job = SnapshotJob(self.readers, SNAPSHOT_DIR)
+        self.run_with_progress(job, "Instantánea", f"Escribiendo instantánea en {SNAPSHOT_DIR}...", self.finish_snapshot)
+
+    def finish_snapshot(self, job, event):
+        if event[0] == "error":
+            messagebox.showerror("Error", f"No se pudo escribir la instantánea: {event[1]}")
+            return
+        if event[0] == "cancelled":
+            messagebox.showinfo("Instantánea", "Instantánea cancelada, los archivos de la tabla en curso se descartaron")
+            return
+        summary = event[1]
+        lines = [f"{table}: {rows} filas escritas, {summary['deleted'][table]} borradas" for table, rows in summary["rows"].items()]
+        lines.append(f"{summary['files']} archivos, {summary['bytes'] / 1e6:.1f} MB en {job.directory} ({summary['rate']:.0f} filas/s)")
+        messagebox.showinfo("Instantánea", "\n".join(lines))
+
+    def refresh_dashboard(self):
+        self.refresh_dashboard_counters()
+        self.refresh_overdue()
+
+    def refresh_dashboard_counters(self):
+        started = time.perf_counter()
+        barrels = self.dashboard.counters("barrels")
+        fermenters = self.dashboard.counters("fermenters")
+        open_invoices, outstanding = self.dashboard.counters("receivables_total").get("", (0, 0))
+        top = self.dashboard.top("receivables", DASHBOARD_TOP_CLIENTS)
+        
+        statuses = list(EQUIPMENT_STATUSES) + sorted(set(barrels) - set(EQUIPMENT_STATUSES))
+        lines = [f"{status or 'Sin estado'}: {barrels.get(status, (0, 0))[0]} ({barrels.get(status, (0, 0))[1]:,.0f} L)" for status in statuses]
+        lines.append(f"Litros en clientes: {barrels.get('Ocupado', (0, 0))[1]:,.0f} L")
+        self.dashboard_barrel_label.configure(text="\n".join(lines))
+        
+        statuses = list(EQUIPMENT_STATUSES) + sorted(set(fermenters) - set(EQUIPMENT_STATUSES))
+        lines = [f"{status or 'Sin estado'}: {fermenters.get(status, (0, 0))[0]}" for status in statuses]
+        in_use = fermenters.get("Ocupado", (0, 0))[1]
+        capacity = sum(amount for _, amount in fermenters.values())
+        lines.append(f"Utilización: {in_use / capacity:.0%} ({in_use:,.0f} de {capacity:,.0f} L)" if capacity else "Utilización: -")
+        self.dashboard_fermenter_label.configure(text="\n".join(lines))
+        
+        self.dashboard_receivables_label.configure(text=f"Total pendiente: ${outstanding:,.2f}\nFacturas abiertas: {open_invoices}")
+        self.dashboard_tree.delete(*self.dashboard_tree.get_children())
+        for client_id, name, items, amount in top:
+            self.dashboard_tree.insert("", "end", values=(client_id, name or "", items, f"{amount:,.2f}"))
+        self.trace.record("dashboard refresh", time.perf_counter() - started)
+
+    def refresh_overdue(self):
+        try:
+            days = float(self.overdue_days_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Los días deben ser un número")
+            return
+        started = time.perf_counter()
+        self.overdue_view.set_filter(*self.barrels.held_filter(int(time.time() - days * 86400)))
+        elapsed = time.perf_counter() - started
+        self.overdue_label.configure(text=f"{self.overdue_view.total} barriles vencidos ({elapsed * 1000:.1f} ms)")
+        self.trace.record("overdue refresh", elapsed)
 
 if __name__ == "__main__":
     root = ctk.CTk()
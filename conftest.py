@@ -0,0 +1,18 @@
+import pytest
+
+from database import connect
+from schema import create_schema
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "brewery.db")
+    conn = connect(path)
+    create_schema(conn)
+    conn.close()
+    return path
+
+@pytest.fixture
+def conn(database):
+    conn = connect(database)
+    yield conn
+    conn.close()
@@ -0,0 +1,225 @@
+import contextlib
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.request import pathname2url
+
+from schema import prune_change_log
+
+DB_PATH = "brewery.db"
+READER_POOL_SIZE = 4
+STATEMENT_CACHE_SIZE = 256
+GROUP_COMMIT_SIZE = 64
+GROUP_COMMIT_DELAY = 0.02
+WRITER_SYNCHRONOUS = "FULL"
+PRUNE_EVERY_COMMITS = 1000
+
+PRAGMAS = (
+    ("busy_timeout", 5000),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -32000),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+)
+
+query_trace = None
+
+class WriteConflict(sqlite3.IntegrityError):
+    pass
+
+def trace_queries(callback):
+    global query_trace
+    query_trace = callback
+
+def configure(conn):
+    if query_trace is not None:
+        conn.set_trace_callback(query_trace)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def connect(database=DB_PATH, check_same_thread=True):
+    conn = configure(sqlite3.connect(
+        database, check_same_thread=check_same_thread, cached_statements=STATEMENT_CACHE_SIZE
+    ))
+    if database != ":memory:":
+        conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+def connect_readonly(database=DB_PATH):
+    conn = sqlite3.connect(f"file:{pathname2url(database)}?mode=ro", uri=True, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute("PRAGMA query_only = 1")
+    return configure(conn)
+
+class ReaderPool:
+    def __init__(self, database=DB_PATH, size=READER_POOL_SIZE):
+        self.database = database
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if not create:
+            return self.idle.get()
+        try:
+            return connect_readonly(self.database)
+        except sqlite3.Error:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self.idle.put(conn)
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class WriteQueue:
+    def __init__(self, database=DB_PATH, max_batch=GROUP_COMMIT_SIZE, max_delay=GROUP_COMMIT_DELAY,
+                 synchronous=WRITER_SYNCHRONOUS, prune_every=PRUNE_EVERY_COMMITS):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self.prune_every = prune_every
+        self.commits = 0
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, statements, callback=None):
+        self.requests.put((statements, callback))
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        conn = connect(self.database)
+        conn.isolation_level = None
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        try:
+            while True:
+                item = self.requests.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self.requests.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self.commit(conn, batch)
+                        return
+                    batch.append(item)
+                self.commit(conn, batch)
+        finally:
+            conn.close()
+
+    def commit(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for statements, callback in batch:
+                conn.execute("SAVEPOINT mutation")
+                try:
+                    for sql, params, *conflict in statements:
+                        if conn.execute(sql, params).rowcount == 0 and conflict:
+                            raise WriteConflict(conflict[0])
+                    conn.execute("RELEASE mutation")
+                    results.append((callback, None))
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO mutation")
+                    conn.execute("RELEASE mutation")
+                    results.append((callback, e))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(callback, e) for _, callback in batch]
+        else:
+            self.commits += 1
+            if self.prune_every and self.commits % self.prune_every == 0:
+                with contextlib.suppress(sqlite3.Error):
+                    prune_change_log(conn)
+        for callback, error in results:
+            if callback:
+                callback(error)
+
+def benchmark_group_commit(mutations=2000, database=None, synchronous=WRITER_SYNCHRONOUS):
+    directory = None
+    if database is None:
+        directory = tempfile.mkdtemp(dir=".")
+        database = os.path.join(directory, "bench.db")
+    conn = connect(database)
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute("CREATE TABLE IF NOT EXISTS bench_writes (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.commit()
+    try:
+        started = time.perf_counter()
+        for i in range(mutations):
+            conn.execute("INSERT INTO bench_writes (payload) VALUES (?)", (f"single {i}",))
+            conn.commit()
+        single = time.perf_counter() - started
+
+        done = threading.Event()
+        remaining = [mutations]
+
+        def finished(error):
+            remaining[0] -= 1
+            if not remaining[0]:
+                done.set()
+
+        writer = WriteQueue(database, synchronous=synchronous)
+        started = time.perf_counter()
+        for i in range(mutations):
+            writer.submit([("INSERT INTO bench_writes (payload) VALUES (?)", (f"grouped {i}",))], finished)
+        done.wait()
+        grouped = time.perf_counter() - started
+        writer.close()
+    finally:
+        conn.close()
+        if directory:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+    return {
+        "mutations": mutations,
+        "synchronous": synchronous,
+        "single_commits_per_second": mutations / single,
+        "grouped_mutations_per_second": mutations / grouped,
+        "speedup": single / grouped,
+    }
+
+if __name__ == "__main__":
+    for name, value in benchmark_group_commit().items():
+        print(f"{name}: {value:.1f}" if isinstance(value, float) else f"{name}: {value}")
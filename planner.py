@@ -0,0 +1,135 @@
+import argparse
+import bisect
+import heapq
+import sys
+import time
+
+from database import DB_PATH, connect_readonly
+from repositories import BatchRepository, FermenterRepository, Row
+
+FERMENT_DAYS = 14
+CLEAN_DAYS = 1
+SIMULATED_PREFIX = "SIM-"
+
+class Assignment(Row):
+    __slots__ = ("batch_id", "fermenter_id", "volume", "capacity", "start", "end")
+
+class Plan:
+    def __init__(self, assignments, unplaced, now, what_if):
+        self.assignments = assignments
+        self.unplaced = unplaced
+        self.now = now
+        self.what_if = what_if
+
+    def starting(self):
+        return [
+            assignment for assignment in self.assignments
+            if assignment.start <= self.now and not assignment.fermenter_id.startswith(SIMULATED_PREFIX)
+        ]
+
+    def makespan(self):
+        return max((assignment.end for assignment in self.assignments), default=self.now) - self.now
+
+    def fill(self):
+        capacity = sum(assignment.capacity for assignment in self.assignments)
+        return sum(assignment.volume for assignment in self.assignments) / capacity if capacity else 0
+
+def free_at(fermenter, now, ferment, clean):
+    if fermenter.status == "Libre":
+        return now
+    if fermenter.status == "En Limpieza":
+        return now + clean
+    if fermenter.status == "Ocupado":
+        return max((fermenter.start_date or now) + ferment + clean, now)
+    return None
+
+def plan_batches(fermenters, batches, now, ferment_days=FERMENT_DAYS, clean_days=CLEAN_DAYS, what_if=False):
+    ferment, clean = int(ferment_days * 86400), int(clean_days * 86400)
+    tanks = [
+        (fermenter.capacity, available, fermenter.id) for fermenter in fermenters
+        if fermenter.capacity and fermenter.capacity > 0
+        and (available := free_at(fermenter, now, ferment, clean)) is not None
+    ]
+    capacities = sorted({capacity for capacity, _, _ in tanks})
+    heaps = [[] for _ in capacities]
+    for capacity, available, fermenter_id in tanks:
+        heaps[bisect.bisect_left(capacities, capacity)].append((available, fermenter_id))
+    for heap in heaps:
+        heapq.heapify(heap)
+    assignments, unplaced = [], []
+    pending = sorted((max(batch.start_date or now, now), -(batch.volume or 0), batch.id) for batch in batches)
+    for release, volume, batch_id in pending:
+        volume = -volume
+        if volume <= 0:
+            unplaced.append((batch_id, volume, "sin volumen"))
+            continue
+        best = None
+        for index in range(bisect.bisect_left(capacities, volume), len(capacities)):
+            if heaps[index]:
+                start = max(heaps[index][0][0], release)
+                if best is None or start < best[0]:
+                    best = (start, index)
+                    if start == release:
+                        break
+        if best is None:
+            unplaced.append((batch_id, volume, "sin fermentador con capacidad suficiente"))
+            continue
+        start, index = best
+        _, fermenter_id = heapq.heappop(heaps[index])
+        end = start + ferment
+        heapq.heappush(heaps[index], (end + clean, fermenter_id))
+        assignments.append(Assignment(batch_id, fermenter_id, volume, capacities[index], start, end))
+    return Plan(assignments, unplaced, now, what_if)
+
+def plan_fermenters(conn, now=None, ferment_days=FERMENT_DAYS, clean_days=CLEAN_DAYS, extra=(), exclude=()):
+    now = int(now or time.time())
+    fermenters = [fermenter for fermenter in FermenterRepository(conn).fetch() if fermenter.id not in exclude]
+    fermenters += [
+        FermenterRepository.row_type(f"{SIMULATED_PREFIX}{number}", capacity, "Libre", None, None)
+        for number, capacity in enumerate(extra, 1)
+    ]
+    batches = BatchRepository(conn)
+    where, params = batches.pending_filter()
+    return plan_batches(
+        fermenters, batches.fetch(where, params), now, ferment_days, clean_days,
+        bool(extra or exclude or ferment_days != FERMENT_DAYS or clean_days != CLEAN_DAYS)
+    )
+
+def apply_statements(plan, fermenters, batches):
+    if plan.what_if:
+        raise ValueError("un plan simulado no se puede aplicar")
+    statements = []
+    for assignment in plan.starting():
+        statements.append(fermenters.assign_statement(assignment.fermenter_id, "Ocupado", assignment.batch_id, assignment.start))
+        statements.append(batches.start_statement(assignment.batch_id, "En curso", assignment.start))
+    return statements
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Planifica los lotes en espera sobre los fermentadores (solo lectura).")
+    parser.add_argument("--database", default=DB_PATH)
+    parser.add_argument("--ferment-days", type=float, default=FERMENT_DAYS)
+    parser.add_argument("--clean-days", type=float, default=CLEAN_DAYS)
+    parser.add_argument("--add", type=float, action="append", default=[], metavar="LITROS",
+                        help="fermentador hipotético de esta capacidad, repetible")
+    parser.add_argument("--exclude", action="append", default=[], metavar="ID", help="fermentador fuera de servicio, repetible")
+    parser.add_argument("--limit", type=int, default=20, help="asignaciones a listar")
+    args = parser.parse_args(argv)
+    conn = connect_readonly(args.database)
+    try:
+        started = time.perf_counter()
+        plan = plan_fermenters(conn, None, args.ferment_days, args.clean_days, args.add, set(args.exclude))
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    for assignment in plan.assignments[:args.limit]:
+        print(f"{assignment.batch_id:<10} {assignment.fermenter_id:<10} {assignment.volume:>8.0f} / {assignment.capacity:<8.0f} "
+              f"{time.strftime('%Y-%m-%d', time.localtime(assignment.start))} -> "
+              f"{time.strftime('%Y-%m-%d', time.localtime(assignment.end))}")
+    for batch_id, volume, reason in plan.unplaced:
+        print(f"{batch_id:<10} sin asignar ({volume:.0f} L): {reason}", file=sys.stderr)
+    print(f"{len(plan.assignments)} lotes planificados, {len(plan.starting())} inician hoy, "
+          f"{len(plan.unplaced)} sin asignar, llenado {plan.fill():.0%}, "
+          f"horizonte {plan.makespan() / 86400:.1f} días ({elapsed * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
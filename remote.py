@@ -0,0 +1,257 @@
+import contextlib
+import http.client
+import json
+import queue
+import sqlite3
+import threading
+from urllib.parse import quote, urlencode, urlsplit
+
+from repositories import ANCHOR_STRIDE, Barrel, BarrelMovement, Batch, Change, Client, Fermenter, Invoice, Payment
+from schema import DATE_COLUMNS
+
+REQUEST_TIMEOUT = 30
+
+class ApiError(sqlite3.OperationalError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ApiClient:
+    def __init__(self, url, timeout=REQUEST_TIMEOUT):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, query=None, body=None):
+        target = self.prefix + path + ("?" + urlencode(query) if query else "")
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for retry in (method == "GET", False):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, target, data, headers)
+                response = self.connection.getresponse()
+                payload = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                self.close()
+                if not retry:
+                    raise ApiError(503, f"servidor no disponible: {e}") from e
+        result = json.loads(payload) if payload else None
+        if response.status == 409:
+            raise sqlite3.IntegrityError(result["error"])
+        if response.status >= 400:
+            raise ApiError(response.status, result["error"] if result else response.reason)
+        return result
+
+    def interrupt(self):
+        pass
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class RemotePool:
+    def __init__(self, url):
+        self.url = url
+        self.idle = queue.LifoQueue()
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            client = self.idle.get_nowait()
+        except queue.Empty:
+            client = ApiClient(self.url)
+        try:
+            yield client
+        finally:
+            self.idle.put(client)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class RemoteWriter:
+    def __init__(self, url):
+        self.client = ApiClient(url)
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, statements, callback=None):
+        self.requests.put((statements, callback))
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                self.client.close()
+                return
+            statements, callback = item
+            error = None
+            try:
+                if len(statements) == 1:
+                    method, path, body = statements[0]
+                    self.client.request(method, path, body=body)
+                elif statements:
+                    self.client.request("POST", "/batch", body={"statements": [list(statement) for statement in statements]})
+            except sqlite3.Error as e:
+                error = e
+            if callback:
+                callback(error)
+
+def search_filter(table, term):
+    term = term.strip()
+    return ("search", (term,)) if term else ("", ())
+
+def path_key(key):
+    return quote(str(key), safe="")
+
+class RemoteRepository:
+    table = None
+    row_type = None
+
+    def __init_subclass__(cls):
+        cls.columns = cls.row_type.__slots__
+        cls.date_columns = DATE_COLUMNS.get(cls.table, ())
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def bind(self, conn):
+        return type(self)(conn)
+
+    def filter_query(self, where, params):
+        if where == "search":
+            return {"q": params[0]}
+        if where == "held":
+            return {"held_status": params[0], "held_before": params[1]}
+        return {}
+
+    def count(self, where="", params=()):
+        return self.conn.request("GET", f"/{self.table}/count", self.filter_query(where, params))["count"]
+
+    def order(self, column=None):
+        return (column or "rowid",)
+
+    def page(self, where="", params=(), order=("rowid",), descending=False, after=None, before=None, last=False,
+             limit=-1):
+        query = self.filter_query(where, params)
+        query.update(order=order[0], limit=limit)
+        if descending:
+            query["desc"] = 1
+        if last:
+            query["last"] = 1
+        if after is not None:
+            query["after"] = json.dumps(list(after))
+        if before is not None:
+            query["before"] = json.dumps(list(before))
+        result = self.conn.request("GET", f"/{self.table}", query)
+        return [(self.row_type(**row), tuple(key)) for row, key in zip(result["rows"], result["keys"])]
+
+    def anchors(self, where="", params=(), order=("rowid",), descending=False, stride=ANCHOR_STRIDE):
+        query = self.filter_query(where, params)
+        query.update(order=order[0], stride=stride)
+        if descending:
+            query["desc"] = 1
+        return [tuple(key) for key in self.conn.request("GET", f"/{self.table}/anchors", query)["keys"]]
+
+    def get(self, key, where="", params=()):
+        try:
+            return self.row_type(**self.conn.request("GET", f"/{self.table}/{path_key(key)}", self.filter_query(where, params)))
+        except ApiError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def insert_statement(self, row):
+        return "POST", f"/{self.table}", {name: value for name, value in zip(self.columns, row) if value is not None}
+
+    def delete_statement(self, key):
+        return "DELETE", f"/{self.table}/{path_key(key)}", None
+
+class RemoteBarrelRepository(RemoteRepository):
+    table = "barrels"
+    row_type = Barrel
+    held_order = ("held",)
+
+    def held_filter(self, cutoff, status="Ocupado"):
+        return "held", (status, cutoff)
+
+class RemoteClientRepository(RemoteRepository):
+    table = "clients"
+    row_type = Client
+
+class RemoteInvoiceRepository(RemoteRepository):
+    table = "invoices"
+    row_type = Invoice
+
+class RemotePaymentRepository(RemoteRepository):
+    table = "payments"
+    row_type = Payment
+
+class RemoteBatchRepository(RemoteRepository):
+    table = "batches"
+    row_type = Batch
+
+class RemoteFermenterRepository(RemoteRepository):
+    table = "fermenters"
+    row_type = Fermenter
+
+class RemoteDashboardRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def counters(self, metric):
+        return {key: tuple(value) for key, value in self.conn.request("GET", f"/dashboard/{metric}").items()}
+
+    def top(self, metric, limit, minimum=0.005):
+        return [
+            tuple(row) for row in
+            self.conn.request("GET", f"/dashboard/{metric}/top", {"limit": limit, "minimum": minimum})
+        ]
+
+class RemoteBarrelMovementRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def history(self, barrel_id, limit=-1):
+        rows = self.conn.request("GET", f"/barrels/{path_key(barrel_id)}/history", {"limit": limit})
+        return [BarrelMovement(**row) for row in rows]
+
+    def at(self, barrel_id, ts):
+        row = self.conn.request("GET", f"/barrels/{path_key(barrel_id)}/at", {"ts": ts})
+        return BarrelMovement(**row) if row else None
+
+    def held_by(self, client_id, start, end):
+        rows = self.conn.request("GET", f"/clients/{path_key(client_id)}/held", {"start": start, "end": end})
+        return [BarrelMovement(**row) for row in rows]
+
+class RemoteChangeLogRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def version(self):
+        return None
+
+    def last(self, tables=()):
+        return self.conn.request("GET", "/changes/last", {"tables": ",".join(tables)} if tables else None)["last"]
+
+    def since(self, seq, limit=-1, wait=0):
+        query = {"since": seq, "limit": limit, "wait": wait} if wait else {"since": seq, "limit": limit}
+        return [Change(**row) for row in self.conn.request("GET", "/changes", query)]
@@ -0,0 +1,146 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+import zoneinfo
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from database import DB_PATH, ReaderPool
+from repositories import ChangeLogRepository, DashboardRepository
+
+AGING_EDGES = (30, 60, 90)
+AGING_BUCKETS = ("0-30", "31-60", "61-90", "90+")
+AGING_TABLES = ("invoices", "payments", "clients")
+AGING_CHUNK_ROWS = 100000
+AGING_SCAN_RATIO = 4
+AGING_HEADERS = ["ID del Cliente", "Nombre", *(f"{bucket} días" for bucket in AGING_BUCKETS), "Total", "Facturas Abiertas"]
+
+def local_day(ts):
+    return (ts + time.localtime(ts).tm_gmtoff) // 86400
+
+def local_zone():
+    name = os.environ.get("TZ", "").lstrip(":") or os.path.realpath("/etc/localtime").partition("zoneinfo/")[2]
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+        import dateutil.tz
+        return dateutil.tz.tzlocal()
+
+def local_days(timestamps, zone=None):
+    local = pd.to_datetime(timestamps, unit="s", utc=True).dt.tz_convert(zone or local_zone()).dt.tz_localize(None)
+    return (local.dt.normalize() - pd.Timestamp(0)).dt.days.to_numpy(dtype=float, na_value=np.nan)
+
+def aging_key(conn, now=None):
+    return ChangeLogRepository(conn).last(AGING_TABLES), local_day(int(now or time.time()))
+
+def aging_frame(invoices, names, today, zone=None):
+    ages = today - local_days(invoices["issue_date"].astype(float), zone)
+    buckets = np.searchsorted(AGING_EDGES, ages, side="left")
+    codes, clients = pd.factorize(invoices["client_id"], use_na_sentinel=False)
+    width = len(AGING_BUCKETS)
+    totals = np.bincount(
+        codes * width + buckets, weights=invoices["balance"].to_numpy(dtype=float), minlength=len(clients) * width
+    ).reshape(-1, width)
+    frame = pd.DataFrame(totals, columns=AGING_BUCKETS)
+    frame.insert(0, "client_id", clients)
+    frame.insert(1, "name", [names.get(client, "") for client in clients])
+    frame["total"] = totals.sum(axis=1)
+    frame["invoices"] = np.bincount(codes, minlength=len(clients))
+    return frame.sort_values("total", ascending=False, ignore_index=True)
+
+class AgingCache:
+    def __init__(self):
+        self.entry = None
+
+    def get(self, key):
+        entry = self.entry
+        return entry[1] if entry is not None and entry[0] == key else None
+
+    def put(self, key, frame):
+        self.entry = (key, frame)
+
+class AgingJob:
+    def __init__(self, pool, cache, now=None, chunk_size=AGING_CHUNK_ROWS):
+        self.pool = pool
+        self.cache = cache
+        self.now = now
+        self.chunk_size = chunk_size
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def compute(self, conn, today):
+        total = DashboardRepository(conn).counters("receivables_total").get("", (0, 0))[0]
+        size = conn.execute("SELECT ifnull(MAX(rowid), 0) FROM invoices").fetchone()[0]
+        scan = "NOT INDEXED " if total * AGING_SCAN_RATIO > size else ""
+        cursor = conn.execute(f"SELECT client_id, issue_date, balance FROM invoices {scan}WHERE balance > 0")
+        chunks, rows_read = [], 0
+        while not self.cancelled.is_set():
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            chunks.append(pd.DataFrame.from_records(rows, columns=["client_id", "issue_date", "balance"]))
+            rows_read += len(rows)
+            self.events.put(("progress", rows_read, max(total, rows_read)))
+        cursor.close()
+        if self.cancelled.is_set():
+            return None
+        names = dict(conn.execute("SELECT id, name FROM clients"))
+        invoices = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=["client_id", "issue_date", "balance"])
+        return aging_frame(invoices, names, today)
+
+    def run(self):
+        try:
+            started = time.perf_counter()
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN")
+                key = aging_key(conn, self.now)
+                frame = self.cache.get(key)
+                cached = frame is not None
+                if not cached:
+                    frame = self.compute(conn, key[1])
+                    if frame is None:
+                        self.events.put(("cancelled",))
+                        return
+                    self.cache.put(key, frame)
+            self.events.put(("done", {"frame": frame, "cached": cached, "elapsed": time.perf_counter() - started}))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+
+def export_aging(frame, filename):
+    frame.to_csv(filename, index=False, header=AGING_HEADERS, float_format="%.2f", encoding="utf-8")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Antigüedad de saldos por cliente.")
+    parser.add_argument("--database", default=DB_PATH)
+    parser.add_argument("--output", default=f"aging_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    args = parser.parse_args(argv)
+    pool = ReaderPool(args.database, 1)
+    job = AgingJob(pool, AgingCache())
+    job.run()
+    pool.close()
+    event = None
+    while not job.events.empty():
+        event = job.events.get()
+    if event[0] != "done":
+        print(f"Error: {event[1]}", file=sys.stderr)
+        sys.exit(1)
+    frame = event[1]["frame"]
+    export_aging(frame, args.output)
+    for bucket in AGING_BUCKETS:
+        print(f"{bucket:>6} días {frame[bucket].sum():>16,.2f}")
+    print(f"{'Total':>11} {frame['total'].sum():>16,.2f}")
+    print(f"{len(frame)} clientes en {args.output} ({event[1]['elapsed']:.2f} s)")
+
+if __name__ == "__main__":
+    main()
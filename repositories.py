@@ -0,0 +1,318 @@
+from schema import DATE_COLUMNS
+
+LOOKUP_CHUNK = 500
+ANCHOR_STRIDE = 100
+
+class Row:
+    __slots__ = ()
+
+    def __init__(self, *values, **fields):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name in self.__slots__[len(values):]:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def factory(cls, cursor, values):
+        return cls(*values)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(repr(value) for value in self)})"
+
+class Barrel(Row):
+    __slots__ = ("id", "capacity", "status", "client_id", "start_date")
+
+class Client(Row):
+    __slots__ = ("id", "name", "contact", "address")
+
+class Invoice(Row):
+    __slots__ = ("id", "client_id", "amount", "status", "issue_date", "paid_total", "balance")
+
+class Payment(Row):
+    __slots__ = ("id", "invoice_id", "amount", "payment_date")
+
+class Batch(Row):
+    __slots__ = ("id", "product_name", "volume", "status", "start_date")
+
+class Fermenter(Row):
+    __slots__ = ("id", "capacity", "status", "batch_id", "start_date")
+
+class BarrelMovement(Row):
+    __slots__ = ("barrel_id", "ts", "status", "client_id")
+
+class Change(Row):
+    __slots__ = ("seq", "table_name", "row_id", "op")
+
+class Repository:
+    table = None
+    row_type = None
+    insert_columns = None
+
+    def __init_subclass__(cls):
+        columns = cls.row_type.__slots__
+        cls.columns = columns
+        cls.date_columns = DATE_COLUMNS.get(cls.table, ())
+        cls.insert_columns = cls.insert_columns or columns
+        cls.select_sql = f"SELECT {', '.join(columns)} FROM {cls.table}"
+        cls.insert_sql = (
+            f"INSERT INTO {cls.table} ({', '.join(cls.insert_columns)}) "
+            f"VALUES ({', '.join('?' * len(cls.insert_columns))})"
+        )
+        cls.delete_sql = f"DELETE FROM {cls.table} WHERE id = ?"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def bind(self, conn):
+        return type(self)(conn)
+
+    def count(self, where="", params=()):
+        return self.conn.execute(
+            f"SELECT COUNT(*) FROM {self.table}{' WHERE ' + where if where else ''}", params
+        ).fetchone()[0]
+
+    def fetch(self, where="", params=(), limit=-1, offset=0):
+        cursor = self.conn.cursor()
+        cursor.row_factory = self.row_type.factory
+        cursor.execute(
+            f"{self.select_sql}{' WHERE ' + where if where else ''} ORDER BY rowid LIMIT ? OFFSET ?",
+            tuple(params) + (limit, offset)
+        )
+        return cursor.fetchall()
+
+    def order(self, column=None):
+        if column is None:
+            return ("rowid",)
+        if column == "id":
+            return ("id",)
+        return (f"ifnull({column}, '')", "id")
+
+    def page(self, where="", params=(), order=("rowid",), descending=False, after=None, before=None, last=False,
+             limit=-1):
+        backward = before is not None or last
+        direction = " DESC" if descending != backward else ""
+        comparison = "<" if direction else ">"
+        bound = before if before is not None else after
+        filters = [f"({where})"] if where else []
+        params = tuple(params)
+        if bound is not None:
+            if len(order) > 1:
+                filters.append(f"{order[0]} {comparison}= ?")
+                params += (bound[0],)
+            filters.append(f"({', '.join(order)}) {comparison} ({', '.join('?' * len(order))})")
+            params += tuple(bound)
+        sql = (
+            f"SELECT {', '.join(self.columns)}, {', '.join(order)} FROM {self.table}"
+            f"{' WHERE ' + ' AND '.join(filters) if filters else ''} "
+            f"ORDER BY {', '.join(expression + direction for expression in order)} LIMIT ?"
+        )
+        width = len(self.columns)
+        row_type = self.row_type
+        cursor = self.conn.cursor()
+        cursor.row_factory = lambda cursor, values: (row_type(*values[:width]), values[width:])
+        cursor.execute(sql, params + (limit,))
+        rows = cursor.fetchall()
+        if backward:
+            rows.reverse()
+        return rows
+
+    def anchors(self, where="", params=(), order=("rowid",), descending=False, stride=ANCHOR_STRIDE):
+        direction = " DESC" if descending else ""
+        keys = ", ".join(f"{expression} AS key{index}" for index, expression in enumerate(order))
+        return [tuple(row) for row in self.conn.execute(f"""
+            SELECT {', '.join(f'key{index}' for index in range(len(order)))} FROM (
+                SELECT {keys}, row_number() OVER (ORDER BY {', '.join(expression + direction for expression in order)}) AS n
+                FROM {self.table}{' WHERE ' + where if where else ''}
+            ) WHERE n % ? = 0 ORDER BY n
+        """, tuple(params) + (stride,))]
+
+    def get(self, key, where="", params=()):
+        cursor = self.conn.cursor()
+        cursor.row_factory = self.row_type.factory
+        cursor.execute(
+            f"{self.select_sql} WHERE id = ?{' AND (' + where + ')' if where else ''}",
+            (key,) + tuple(params)
+        )
+        return cursor.fetchone()
+
+    def exists(self, key):
+        return self.conn.execute(f"SELECT 1 FROM {self.table} WHERE id = ?", (key,)).fetchone() is not None
+
+    def existing(self, keys, chunk_size=LOOKUP_CHUNK):
+        keys = list(keys)
+        found = set()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            cursor = self.conn.execute(f"SELECT id FROM {self.table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            found.update(row[0] for row in cursor)
+        return found
+
+    def ids(self):
+        return [row[0] for row in self.conn.execute(f"SELECT id FROM {self.table} ORDER BY rowid")]
+
+    def insert_statement(self, row):
+        return self.insert_sql, tuple(row)[:len(self.insert_columns)]
+
+    def delete_statement(self, key):
+        return self.delete_sql, (key,)
+
+    def insert(self, row):
+        self.conn.execute(*self.insert_statement(row))
+
+    def insert_many(self, rows):
+        width = len(self.insert_columns)
+        self.conn.executemany(self.insert_sql, (tuple(row)[:width] for row in rows))
+
+    def delete(self, key):
+        self.conn.execute(self.delete_sql, (key,))
+
+    def delete_many(self, keys):
+        self.conn.executemany(self.delete_sql, ((key,) for key in keys))
+
+class BarrelRepository(Repository):
+    table = "barrels"
+    row_type = Barrel
+    held_order = ("start_date", "id")
+
+    assign_sql = "UPDATE barrels SET status = ?, client_id = ?, start_date = ? WHERE id = ?"
+
+    def assign_statement(self, key, status, client_id, start_date):
+        return self.assign_sql, (status, client_id, start_date, key)
+
+    def assign_many(self, keys, status, client_id, start_date):
+        self.conn.executemany(self.assign_sql, ((status, client_id, start_date, key) for key in keys))
+
+    def held_filter(self, cutoff, status="Ocupado"):
+        return "status = ? AND start_date <= ?", (status, cutoff)
+
+class ClientRepository(Repository):
+    table = "clients"
+    row_type = Client
+
+class InvoiceRepository(Repository):
+    table = "invoices"
+    row_type = Invoice
+    insert_columns = ("id", "client_id", "amount", "status", "issue_date")
+
+class PaymentRepository(Repository):
+    table = "payments"
+    row_type = Payment
+
+class BatchRepository(Repository):
+    table = "batches"
+    row_type = Batch
+    start_sql = "UPDATE batches SET status = ?, start_date = ? WHERE id = ? AND status = 'En espera'"
+
+    def start_statement(self, key, status, start_date):
+        return self.start_sql, (status, start_date, key), f"el lote {key} ya no está en espera"
+
+    def pending_filter(self, status="En espera"):
+        return "status = ? AND id NOT IN (SELECT batch_id FROM fermenters WHERE batch_id IS NOT NULL)", (status,)
+
+class FermenterRepository(Repository):
+    table = "fermenters"
+    row_type = Fermenter
+    assign_sql = (
+        "UPDATE fermenters SET status = ?, batch_id = ?, start_date = ? "
+        "WHERE id = ? AND status = 'Libre' AND batch_id IS NULL"
+    )
+
+    def assign_statement(self, key, status, batch_id, start_date):
+        return self.assign_sql, (status, batch_id, start_date, key), f"el fermentador {key} ya no está libre"
+
+class DashboardRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def counters(self, metric):
+        cursor = self.conn.execute(
+            "SELECT key, items, amount FROM dashboard_counters WHERE metric = ? AND items != 0", (metric,)
+        )
+        return {key: (items, amount) for key, items, amount in cursor}
+
+    def top(self, metric, limit, minimum=0.005):
+        return self.conn.execute("""
+            SELECT d.key, c.name, d.items, d.amount FROM dashboard_counters AS d
+            LEFT JOIN clients AS c ON c.id = d.key
+            WHERE d.metric = ? AND d.amount > ? ORDER BY d.amount DESC LIMIT ?
+        """, (metric, minimum, limit)).fetchall()
+
+class BarrelMovementRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def query(self, sql, params):
+        cursor = self.conn.cursor()
+        cursor.row_factory = BarrelMovement.factory
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def history(self, barrel_id, limit=-1):
+        return self.query("""
+            SELECT barrel_id, ts, status, client_id FROM barrel_movements
+            WHERE barrel_id = ? ORDER BY ts DESC, seq DESC LIMIT ?
+        """, (barrel_id, limit))
+
+    def at(self, barrel_id, ts):
+        rows = self.query("""
+            SELECT barrel_id, ts, status, client_id FROM barrel_movements
+            WHERE barrel_id = ? AND ts <= ? ORDER BY ts DESC, seq DESC LIMIT 1
+        """, (barrel_id, ts))
+        return rows[0] if rows else None
+
+    def held_by(self, client_id, start, end):
+        return self.query("""
+            WITH RECURSIVE fleet (barrel_id) AS (
+                SELECT MIN(barrel_id) FROM barrel_movements
+                UNION ALL
+                SELECT (SELECT MIN(barrel_id) FROM barrel_movements WHERE barrel_id > fleet.barrel_id)
+                FROM fleet WHERE barrel_id IS NOT NULL
+            )
+            SELECT barrel_id, ts, status, client_id FROM (
+                SELECT m.barrel_id, m.ts, m.seq, m.status, m.client_id FROM fleet
+                JOIN barrel_movements AS m ON m.barrel_id = fleet.barrel_id AND (m.ts, m.seq) = (
+                    SELECT ts, seq FROM barrel_movements WHERE barrel_id = fleet.barrel_id AND ts < :start
+                    ORDER BY ts DESC, seq DESC LIMIT 1
+                )
+                WHERE m.client_id = :client_id AND m.status = 'Ocupado'
+                UNION ALL
+                SELECT barrel_id, ts, seq, status, client_id FROM barrel_movements
+                WHERE client_id = :client_id AND ts >= :start AND ts < :end AND status = 'Ocupado'
+            )
+            ORDER BY barrel_id, ts, seq
+        """, {"client_id": client_id, "start": start, "end": end})
+
+class ChangeLogRepository:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def last(self, tables=()):
+        if not tables:
+            return self.conn.execute("SELECT ifnull(MAX(seq), 0) FROM change_log").fetchone()[0]
+        return max(
+            self.conn.execute("SELECT ifnull(MAX(seq), 0) FROM change_log WHERE table_name = ?", (table,)).fetchone()[0]
+            for table in tables
+        )
+
+    def since(self, seq, limit=-1):
+        cursor = self.conn.cursor()
+        cursor.row_factory = Change.factory
+        cursor.execute("SELECT seq, table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit))
+        return cursor.fetchall()
+
+REPOSITORIES = {
+    repository.table: repository
+    for repository in (
+        BarrelRepository, ClientRepository, InvoiceRepository,
+        PaymentRepository, BatchRepository, FermenterRepository,
+    )
+}
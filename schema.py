@@ -0,0 +1,451 @@
+import sqlite3
+
+SCHEMA_VERSION = 4
+CHANGE_LOG_KEEP = 100000
+
+TABLES = {
+    "barrels": """
+        id TEXT PRIMARY KEY,
+        capacity REAL,
+        status TEXT,
+        client_id TEXT,
+        start_date INTEGER,
+        FOREIGN KEY (client_id) REFERENCES clients(id)
+    """,
+    "clients": """
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        contact TEXT,
+        address TEXT
+    """,
+    "invoices": """
+        id TEXT PRIMARY KEY,
+        client_id TEXT,
+        amount REAL,
+        status TEXT,
+        issue_date INTEGER,
+        paid_total REAL NOT NULL DEFAULT 0,
+        balance REAL,
+        FOREIGN KEY (client_id) REFERENCES clients(id)
+    """,
+    "payments": """
+        id TEXT PRIMARY KEY,
+        invoice_id TEXT,
+        amount REAL,
+        payment_date INTEGER,
+        FOREIGN KEY (invoice_id) REFERENCES invoices(id)
+    """,
+    "batches": """
+        id TEXT PRIMARY KEY,
+        product_name TEXT,
+        volume REAL,
+        start_date INTEGER,
+        status TEXT
+    """,
+    "fermenters": """
+        id TEXT PRIMARY KEY,
+        capacity REAL,
+        status TEXT,
+        batch_id TEXT,
+        start_date INTEGER,
+        FOREIGN KEY (batch_id) REFERENCES batches(id)
+    """,
+}
+
+DATE_COLUMNS = {
+    "barrels": ("start_date",),
+    "invoices": ("issue_date",),
+    "payments": ("payment_date",),
+    "batches": ("start_date",),
+    "fermenters": ("start_date",),
+}
+
+RECORD_SPECS = {
+    "barrels": {
+        "required": ("id", "capacity"),
+        "numeric": ("capacity",),
+        "statuses": ("Ocupado", "Libre", "En Limpieza"),
+        "default_status": "Libre",
+        "references": {"client_id": "clients"},
+        "date": ("start_date", "Ocupado"),
+    },
+    "clients": {
+        "required": ("id", "name"),
+    },
+    "invoices": {
+        "required": ("id", "client_id", "amount"),
+        "numeric": ("amount",),
+        "statuses": ("Pendiente", "Pagada", "Vencida"),
+        "default_status": "Pendiente",
+        "reserved_statuses": {"Pagada": "una factura nueva no tiene pagos, no puede estar Pagada"},
+        "references": {"client_id": "clients"},
+        "date": ("issue_date", None),
+    },
+    "payments": {
+        "required": ("id", "invoice_id", "amount"),
+        "numeric": ("amount",),
+        "references": {"invoice_id": "invoices"},
+        "date": ("payment_date", None),
+    },
+    "batches": {
+        "required": ("id", "product_name", "volume"),
+        "numeric": ("volume",),
+        "statuses": ("En curso", "Finalizado", "En espera"),
+        "default_status": "En curso",
+        "date": ("start_date", None),
+    },
+    "fermenters": {
+        "required": ("id", "capacity"),
+        "numeric": ("capacity",),
+        "statuses": ("Ocupado", "Libre", "En Limpieza"),
+        "default_status": "Libre",
+        "references": {"batch_id": "batches"},
+        "date": ("start_date", "Ocupado"),
+    },
+}
+
+INDEXES = {
+    "idx_barrels_client": "barrels (client_id, status)",
+    "idx_barrels_status": "barrels (status, client_id)",
+    "idx_barrels_held": "barrels (status, start_date, id)",
+    "idx_invoices_client": "invoices (client_id, status, amount)",
+    "idx_invoices_status": "invoices (status, client_id)",
+    "idx_invoices_outstanding": "invoices (client_id, balance) WHERE balance > 0",
+    "idx_payments_invoice": "payments (invoice_id, amount)",
+    "idx_batches_status": "batches (status, volume)",
+    "idx_fermenters_batch": "fermenters (batch_id, status)",
+    "idx_fermenters_status": "fermenters (status, capacity)",
+    "idx_dashboard_counters_amount": "dashboard_counters (metric, amount)",
+    "idx_barrel_movements_client": "barrel_movements (client_id, ts) WHERE client_id IS NOT NULL",
+    "idx_change_log_table": "change_log (table_name, seq)",
+}
+
+SORT_COLUMNS = {
+    "barrels": ("capacity", "status", "client_id", "start_date"),
+    "clients": ("name",),
+    "invoices": ("client_id", "status", "issue_date", "balance"),
+    "batches": ("volume", "status", "start_date"),
+    "fermenters": ("capacity", "status"),
+}
+
+INDEXES.update({
+    f"idx_{table}_sort_{column}": f"{table} (ifnull({column}, ''), id)"
+    for table, columns in SORT_COLUMNS.items()
+    for column in columns
+})
+
+SEARCH_COLUMNS = {
+    "barrels": ("id", "status", "client_id"),
+    "clients": ("id", "name"),
+    "invoices": ("id", "client_id"),
+    "batches": ("id", "product_name"),
+    "fermenters": ("id", "status", "batch_id"),
+}
+
+LEDGER_APPLY = """
+    UPDATE invoices SET
+        paid_total = paid_total + ({amount}),
+        balance = balance - ({amount}),
+        status = CASE
+            WHEN balance - ({amount}) < 0.005 THEN 'Pagada'
+            WHEN status = 'Pagada' THEN 'Pendiente'
+            ELSE status
+        END
+    WHERE id = {invoice_id};
+"""
+
+COUNTER_APPLY = """
+    INSERT INTO dashboard_counters (metric, key, items, amount) VALUES ('{metric}', {key}, {items}, {amount})
+    ON CONFLICT (metric, key) DO UPDATE SET items = items + excluded.items, amount = amount + excluded.amount;
+"""
+
+MOVEMENT_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+MOVEMENT_APPEND = """
+    INSERT INTO barrel_movements (barrel_id, ts, seq, status, client_id)
+    SELECT {barrel_id}, """ + MOVEMENT_NOW + """, ifnull(MAX(seq) + 1, 0), {status}, {client_id}
+    FROM barrel_movements WHERE barrel_id = {barrel_id} AND ts = """ + MOVEMENT_NOW + """;
+"""
+
+DASHBOARD_COUNTERS = {
+    "barrels": ("status, capacity", (
+        ("barrels", "ifnull({row}.status, '')", "1", "ifnull({row}.capacity, 0)"),
+    )),
+    "fermenters": ("status, capacity", (
+        ("fermenters", "ifnull({row}.status, '')", "1", "ifnull({row}.capacity, 0)"),
+    )),
+    "invoices": ("client_id, balance", (
+        ("receivables", "ifnull({row}.client_id, '')", "ifnull({row}.balance, 0) > 0", "max(ifnull({row}.balance, 0), 0)"),
+        ("receivables_total", "''", "ifnull({row}.balance, 0) > 0", "max(ifnull({row}.balance, 0), 0)"),
+    )),
+}
+
+def create_schema(conn):
+    cursor = conn.cursor()
+    for table, definition in TABLES.items():
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            metric TEXT NOT NULL,
+            key TEXT NOT NULL,
+            items INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, key)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS barrel_movements (
+            barrel_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            seq INTEGER NOT NULL DEFAULT 0,
+            status TEXT,
+            client_id TEXT,
+            PRIMARY KEY (barrel_id, ts, seq)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id TEXT NOT NULL,
+            op TEXT NOT NULL
+        )
+    """)
+    upgrade_schema(conn)
+    prune_change_log(conn)
+    for name, definition in INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    cursor.execute("PRAGMA optimize")
+    conn.commit()
+    fts_enabled = create_search_index(conn)
+    create_ledger_triggers(conn)
+    create_dashboard_triggers(conn)
+    create_movement_triggers(conn)
+    create_change_triggers(conn)
+    return fts_enabled
+
+def upgrade_schema(conn):
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    if version < 1:
+        cursor.execute("PRAGMA table_info(invoices)")
+        if "paid_total" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE invoices ADD COLUMN paid_total REAL NOT NULL DEFAULT 0")
+            cursor.execute("ALTER TABLE invoices ADD COLUMN balance REAL")
+        cursor.execute("""
+            UPDATE invoices SET paid_total = IFNULL((SELECT SUM(amount) FROM payments WHERE invoice_id = invoices.id), 0)
+        """)
+        cursor.execute("UPDATE invoices SET balance = amount - paid_total")
+        for table in SEARCH_COLUMNS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {table}_fts_update")
+    if version < 2:
+        rebuild_dashboard_counters(conn)
+    if version < 3:
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO barrel_movements (barrel_id, ts, status, client_id)
+            SELECT id, ifnull(CAST(strftime('%s', start_date, 'utc') AS INTEGER), {MOVEMENT_NOW}), status, client_id
+            FROM barrels
+        """)
+    if version < 4:
+        convert_dates(conn)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+def convert_dates(conn):
+    cursor = conn.cursor()
+    stale = []
+    for table, columns in DATE_COLUMNS.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        types = {row[1]: row[2] for row in cursor.fetchall()}
+        if any(types.get(column) != "INTEGER" for column in columns):
+            stale.append(table)
+    if not stale:
+        return
+    conn.commit()
+    cursor.execute("BEGIN")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP TRIGGER {name}")
+    for table in stale:
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+        values = [
+            f"CAST(strftime('%s', {column}, 'utc') AS INTEGER)" if column in DATE_COLUMNS[table] else column
+            for column in columns
+        ]
+        cursor.execute(f"CREATE TABLE {table}_rebuild ({TABLES[table]})")
+        cursor.execute(f"""
+            INSERT INTO {table}_rebuild (rowid, {', '.join(columns)})
+            SELECT rowid, {', '.join(values)} FROM {table}
+        """)
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    conn.commit()
+
+def create_ledger_triggers(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS invoices_balance_insert AFTER INSERT ON invoices BEGIN
+            UPDATE invoices SET balance = new.amount - new.paid_total WHERE id = new.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS invoices_balance_amount AFTER UPDATE OF amount ON invoices BEGIN
+            UPDATE invoices SET balance = new.amount - new.paid_total WHERE id = new.id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payments_ledger_insert AFTER INSERT ON payments BEGIN
+            {LEDGER_APPLY.format(amount="new.amount", invoice_id="new.invoice_id")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payments_ledger_delete AFTER DELETE ON payments BEGIN
+            {LEDGER_APPLY.format(amount="-old.amount", invoice_id="old.invoice_id")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS payments_ledger_update AFTER UPDATE OF amount, invoice_id ON payments BEGIN
+            {LEDGER_APPLY.format(amount="-old.amount", invoice_id="old.invoice_id")}
+            {LEDGER_APPLY.format(amount="new.amount", invoice_id="new.invoice_id")}
+        END
+    """)
+    conn.commit()
+
+def rebuild_dashboard_counters(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM dashboard_counters")
+    for table, (_, counters) in DASHBOARD_COUNTERS.items():
+        for metric, key, items, amount in counters:
+            key, items, amount = (expression.format(row="t") for expression in (key, items, amount))
+            cursor.execute(f"""
+                INSERT INTO dashboard_counters (metric, key, items, amount)
+                SELECT '{metric}', {key}, SUM({items}), SUM({amount}) FROM {table} AS t GROUP BY {key}
+            """)
+    conn.commit()
+
+def create_dashboard_triggers(conn):
+    cursor = conn.cursor()
+    for table, (columns, counters) in DASHBOARD_COUNTERS.items():
+        def apply(row, sign=""):
+            return "".join(
+                COUNTER_APPLY.format(
+                    metric=metric, key=key.format(row=row),
+                    items=f"{sign}({items.format(row=row)})", amount=f"{sign}({amount.format(row=row)})"
+                )
+                for metric, key, items, amount in counters
+            )
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_dashboard_insert AFTER INSERT ON {table} BEGIN
+                {apply("new")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_dashboard_delete AFTER DELETE ON {table} BEGIN
+                {apply("old", "-")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_dashboard_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                {apply("old", "-")}
+                {apply("new")}
+            END
+        """)
+    conn.commit()
+
+def create_movement_triggers(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS barrels_movement_insert AFTER INSERT ON barrels BEGIN
+            {MOVEMENT_APPEND.format(barrel_id="new.id", status="new.status", client_id="new.client_id")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS barrels_movement_update AFTER UPDATE OF status, client_id ON barrels
+        WHEN old.status IS NOT new.status OR old.client_id IS NOT new.client_id BEGIN
+            {MOVEMENT_APPEND.format(barrel_id="new.id", status="new.status", client_id="new.client_id")}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS barrels_movement_delete AFTER DELETE ON barrels BEGIN
+            {MOVEMENT_APPEND.format(barrel_id="old.id", status="'Eliminado'", client_id="NULL")}
+        END
+    """)
+    conn.commit()
+
+def create_change_triggers(conn):
+    cursor = conn.cursor()
+    for table in TABLES:
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', new.id, 'insert');
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) SELECT '{table}', old.id, 'delete' WHERE old.id IS NOT new.id;
+                INSERT INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', new.id, CASE WHEN old.id IS NOT new.id THEN 'insert' ELSE 'update' END);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', old.id, 'delete');
+            END
+        """)
+    conn.commit()
+
+def prune_change_log(conn, keep=CHANGE_LOG_KEEP):
+    conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,))
+    conn.commit()
+
+def create_search_index(conn):
+    cursor = conn.cursor()
+    for table, columns in SEARCH_COLUMNS.items():
+        fts = f"{table}_fts"
+        cursor.execute("SELECT name FROM sqlite_master WHERE name=?", (fts,))
+        exists = cursor.fetchone()
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{', '.join(columns)}, content='{table}', content_rowid='rowid', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {', '.join(columns)}) VALUES (new.rowid, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {', '.join(columns)}) VALUES ('delete', old.rowid, {old_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {', '.join(columns)}) VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO {fts} (rowid, {', '.join(columns)}) VALUES (new.rowid, {new_values});
+            END
+        """)
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+def like_filter(columns, term):
+    if not term:
+        return "", ()
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in columns), (pattern,) * len(columns)
+
+def search_filter(table, term, fts_enabled=True):
+    term = term.strip()
+    if not fts_enabled or len(term) < 3:
+        return like_filter(SEARCH_COLUMNS[table], term)
+    phrase = '"' + term.replace('"', '""') + '"'
+    return f"rowid IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)", (phrase,)
@@ -0,0 +1,590 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from database import DB_PATH, READER_POOL_SIZE, ReaderPool, WriteQueue, connect, connect_readonly
+from remote import ApiClient, ApiError
+from repositories import (
+    ANCHOR_STRIDE, REPOSITORIES, BarrelMovementRepository, BarrelRepository, ChangeLogRepository, DashboardRepository,
+)
+from schema import RECORD_SPECS, SORT_COLUMNS, create_schema, search_filter
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+PAGE_LIMIT = 500
+DEFAULT_PAGE_ROWS = 50
+CHANGE_LIMIT = 10000
+CHANGE_WAIT_LIMIT = 25
+CHANGE_WAIT_STEP = 0.2
+LOAD_CLIENTS = 8
+LOAD_DURATION = 10.0
+LOAD_WRITE_RATIO = 0.1
+LOAD_SAMPLE_ROWS = 500
+LOAD_CLEANUP_ROWS = 500
+
+TABLE = "(" + "|".join(REPOSITORIES) + ")"
+TABLE_PATH = re.compile(rf"/{TABLE}")
+ROW_PATH = re.compile(rf"/{TABLE}/([^/]+)")
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def row_object(row):
+    return dict(zip(row.__slots__, row))
+
+def query_int(query, name, default=None):
+    if name not in query:
+        if default is None:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"falta el parámetro {name}")
+        return default
+    try:
+        return int(query[name])
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} debe ser un entero") from None
+
+def query_key(query, name):
+    if name not in query:
+        return None
+    try:
+        key = json.loads(query[name])
+    except ValueError:
+        key = None
+    if not isinstance(key, list) or not key:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} debe ser una lista JSON")
+    return tuple(key)
+
+class BreweryServer:
+    def __init__(self, database=DB_PATH, readers=READER_POOL_SIZE):
+        conn = connect(database)
+        try:
+            self.fts_enabled = create_schema(conn)
+        finally:
+            conn.close()
+        self.readers = ReaderPool(database, readers)
+        self.executor = ThreadPoolExecutor(readers, thread_name_prefix="reader")
+        self.writer = WriteQueue(database)
+        self.routes = [
+            ("GET", re.compile(r"/dashboard/(\w+)"), self.dashboard_counters),
+            ("GET", re.compile(r"/dashboard/(\w+)/top"), self.dashboard_top),
+            ("GET", re.compile(r"/barrels/([^/]+)/history"), self.barrel_history),
+            ("GET", re.compile(r"/barrels/([^/]+)/at"), self.barrel_at),
+            ("GET", re.compile(r"/clients/([^/]+)/held"), self.client_held),
+            ("POST", re.compile(r"/barrels/assign"), self.assign_barrels),
+            ("POST", re.compile(r"/batch"), self.write_batch),
+            ("GET", re.compile(r"/changes"), self.changes_since),
+            ("GET", re.compile(r"/changes/last"), self.changes_last),
+            ("GET", TABLE_PATH, self.list_rows),
+            ("GET", re.compile(rf"/{TABLE}/count"), self.count_rows),
+            ("GET", re.compile(rf"/{TABLE}/anchors"), self.anchor_rows),
+            ("GET", ROW_PATH, self.get_row),
+            ("POST", TABLE_PATH, self.insert_row),
+            ("DELETE", ROW_PATH, self.delete_row),
+        ]
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.with_reader, fn, args)
+
+    def with_reader(self, fn, args):
+        with self.readers.connection() as conn:
+            return fn(conn, *args)
+
+    async def write(self, statements):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def finished(error):
+            if not future.done():
+                future.set_result(error)
+
+        self.writer.submit(statements, lambda error: loop.call_soon_threadsafe(finished, error))
+        error = await future
+        if error:
+            raise error
+
+    def close(self):
+        self.writer.close()
+        self.executor.shutdown()
+        self.readers.close()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                keep_alive = True
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                    headers = {}
+                    while True:
+                        header = await reader.readline()
+                        if header in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = header.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    length = int(headers.get("content-length") or 0)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "cuerpo demasiado grande")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError:
+                    keep_alive = False
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": "solicitud inválida"}
+                except Exception as e:
+                    traceback.print_exc()
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+                data = json.dumps(payload).encode()
+                writer.write((
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                ).encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(parts.path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            args = [unquote(group) for group in match.groups()]
+            if method == "POST":
+                try:
+                    args.append(json.loads(body))
+                except ValueError:
+                    raise HttpError(HTTPStatus.BAD_REQUEST, "el cuerpo debe ser JSON") from None
+            try:
+                return await handler(*args, query=query)
+            except sqlite3.IntegrityError as e:
+                raise HttpError(HTTPStatus.CONFLICT, str(e)) from None
+            except sqlite3.Error as e:
+                raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, str(e)) from None
+        if allowed:
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"método {method} no permitido")
+        raise HttpError(HTTPStatus.NOT_FOUND, f"ruta desconocida: {parts.path}")
+
+    def row_filter(self, table, query):
+        if "held_before" in query:
+            if table != "barrels":
+                raise HttpError(HTTPStatus.BAD_REQUEST, "held_before solo aplica a barrels")
+            return BarrelRepository(None).held_filter(query_int(query, "held_before"), query.get("held_status", "Ocupado"))
+        return search_filter(table, query.get("q", ""), self.fts_enabled)
+
+    def row_order(self, table, name):
+        repository = REPOSITORIES[table](None)
+        if name == "rowid":
+            return repository.order()
+        if name == "held" and table == "barrels":
+            return BarrelRepository.held_order
+        if name != "id" and name not in SORT_COLUMNS.get(table, ()):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"no se puede ordenar por {name}")
+        return repository.order(name)
+
+    async def list_rows(self, table, query):
+        where, params = self.row_filter(table, query)
+        order = self.row_order(table, query.get("order", "rowid"))
+        limit = query_int(query, "limit", DEFAULT_PAGE_ROWS)
+        limit = PAGE_LIMIT if limit < 0 else min(limit, PAGE_LIMIT)
+        bounds = {
+            "descending": query.get("desc") == "1",
+            "after": query_key(query, "after"),
+            "before": query_key(query, "before"),
+            "last": query.get("last") == "1",
+            "limit": limit,
+        }
+        if any(len(key) != len(order) for key in (bounds["after"], bounds["before"]) if key):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "la clave no corresponde al orden")
+        rows = await self.read(lambda conn: REPOSITORIES[table](conn).page(where, params, order, **bounds))
+        return HTTPStatus.OK, {"rows": [row_object(row) for row, _ in rows], "keys": [key for _, key in rows]}
+
+    async def anchor_rows(self, table, query):
+        where, params = self.row_filter(table, query)
+        order = self.row_order(table, query.get("order", "rowid"))
+        stride = query_int(query, "stride", ANCHOR_STRIDE)
+        if stride < 1:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "stride debe ser positivo")
+        keys = await self.read(lambda conn: REPOSITORIES[table](conn).anchors(
+            where, params, order, query.get("desc") == "1", stride
+        ))
+        return HTTPStatus.OK, {"keys": keys}
+
+    async def count_rows(self, table, query):
+        where, params = self.row_filter(table, query)
+        count = await self.read(lambda conn: REPOSITORIES[table](conn).count(where, params))
+        return HTTPStatus.OK, {"count": count}
+
+    async def get_row(self, table, key, query):
+        where, params = self.row_filter(table, query)
+        row = await self.read(lambda conn: REPOSITORIES[table](conn).get(key, where, params))
+        if row is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"{key} no existe")
+        return HTTPStatus.OK, row_object(row)
+
+    def validate(self, conn, table, fields, pending=()):
+        if not isinstance(fields, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "se esperaba un objeto JSON")
+        spec = RECORD_SPECS[table]
+        repository = REPOSITORIES[table]
+        unknown = set(fields) - set(repository.insert_columns)
+        if unknown:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"campos desconocidos: {', '.join(sorted(unknown))}")
+        record = {}
+        for column in repository.insert_columns:
+            value = fields.get(column)
+            if isinstance(value, str):
+                value = value.strip() or None
+            record[column] = value
+        for column in spec["required"]:
+            if record[column] is None:
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"{column} es obligatorio")
+        for column in spec.get("numeric", ()):
+            try:
+                record[column] = float(record[column])
+            except (TypeError, ValueError):
+                record[column] = math.nan
+            if not record[column] > 0 or math.isinf(record[column]):
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"{column} debe ser un número positivo")
+        if "statuses" in spec:
+            if record["status"] is None:
+                record["status"] = spec["default_status"]
+            if record["status"] not in spec["statuses"]:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "estado inválido")
+            if record["status"] in spec.get("reserved_statuses", {}):
+                raise HttpError(HTTPStatus.BAD_REQUEST, spec["reserved_statuses"][record["status"]])
+        for column, target in spec.get("references", {}).items():
+            if (record[column] is not None and (target, record[column]) not in pending
+                    and not REPOSITORIES[target](conn).exists(record[column])):
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"{column} no existe")
+        if "date" in spec:
+            column, status = spec["date"]
+            if record[column] is None:
+                if status is None or record["status"] == status:
+                    record[column] = int(time.time())
+            elif not isinstance(record[column], int) or isinstance(record[column], bool):
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"{column} debe ser un timestamp entero")
+        return repository.row_type(**record)
+
+    async def insert_row(self, table, fields, query):
+        row = await self.read(self.validate, table, fields)
+        await self.write([REPOSITORIES[table](None).insert_statement(row)])
+        return HTTPStatus.CREATED, row_object(row)
+
+    async def delete_row(self, table, key, query):
+        if not await self.read(lambda conn: REPOSITORIES[table](conn).exists(key)):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"{key} no existe")
+        await self.write([REPOSITORIES[table](None).delete_statement(key)])
+        return HTTPStatus.OK, {"deleted": key}
+
+    def resolve_batch(self, conn, entries):
+        statements, pending = [], set()
+        for entry in entries:
+            if not isinstance(entry, list) or len(entry) != 3 or not all(isinstance(part, str) for part in entry[:2]):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "cada sentencia debe ser [método, ruta, cuerpo]")
+            method, path, body = entry
+            insert = TABLE_PATH.fullmatch(path) if method == "POST" else None
+            delete = ROW_PATH.fullmatch(path) if method == "DELETE" else None
+            if insert:
+                table = insert.group(1)
+                row = self.validate(conn, table, body, pending)
+                pending.add((table, row.id))
+                statements.append(REPOSITORIES[table](None).insert_statement(row))
+            elif delete:
+                table, key = delete.group(1), unquote(delete.group(2))
+                if (table, key) not in pending and not REPOSITORIES[table](conn).exists(key):
+                    raise HttpError(HTTPStatus.NOT_FOUND, f"{key} no existe")
+                pending.discard((table, key))
+                statements.append(REPOSITORIES[table](None).delete_statement(key))
+            else:
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"sentencia no admitida en un lote: {method} {path}")
+        return statements
+
+    async def write_batch(self, fields, query):
+        if not isinstance(fields, dict) or not isinstance(fields.get("statements"), list) or not fields["statements"]:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "se esperaba {\"statements\": [[método, ruta, cuerpo], ...]}")
+        statements = await self.read(self.resolve_batch, fields["statements"])
+        await self.write(statements)
+        return HTTPStatus.OK, {"applied": len(statements)}
+
+    async def assign_barrels(self, fields, query):
+        if not isinstance(fields, dict) or not isinstance(fields.get("ids"), list):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "se esperaba {\"ids\": [...], \"status\": ...}")
+        status = fields.get("status")
+        if not status:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "status es obligatorio")
+        client_id = fields.get("client_id") if status == "Ocupado" else None
+        ids = list(dict.fromkeys(str(key) for key in fields["ids"]))
+
+        def resolve(conn):
+            if client_id is not None and not REPOSITORIES["clients"](conn).exists(client_id):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "client_id no existe")
+            return BarrelRepository(conn).existing(ids)
+
+        found = await self.read(resolve)
+        known = [key for key in ids if key in found]
+        start_date = int(time.time()) if status == "Ocupado" else None
+        if known:
+            barrels = BarrelRepository(None)
+            await self.write([barrels.assign_statement(key, status, client_id, start_date) for key in known])
+        return HTTPStatus.OK, {"updated": known, "unknown": [key for key in ids if key not in found]}
+
+    async def dashboard_counters(self, metric, query):
+        counters = await self.read(lambda conn: DashboardRepository(conn).counters(metric))
+        return HTTPStatus.OK, counters
+
+    async def dashboard_top(self, metric, query):
+        limit = min(query_int(query, "limit", 20), PAGE_LIMIT)
+        try:
+            minimum = float(query.get("minimum", 0.005))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "minimum debe ser un número") from None
+        rows = await self.read(lambda conn: DashboardRepository(conn).top(metric, limit, minimum))
+        return HTTPStatus.OK, rows
+
+    async def barrel_history(self, barrel_id, query):
+        limit = query_int(query, "limit", -1)
+        rows = await self.read(lambda conn: BarrelMovementRepository(conn).history(barrel_id, limit))
+        return HTTPStatus.OK, [row_object(row) for row in rows]
+
+    async def barrel_at(self, barrel_id, query):
+        ts = query_int(query, "ts")
+        row = await self.read(lambda conn: BarrelMovementRepository(conn).at(barrel_id, ts))
+        return HTTPStatus.OK, row_object(row) if row else None
+
+    async def client_held(self, client_id, query):
+        start, end = query_int(query, "start"), query_int(query, "end")
+        rows = await self.read(lambda conn: BarrelMovementRepository(conn).held_by(client_id, start, end))
+        return HTTPStatus.OK, [row_object(row) for row in rows]
+
+    async def changes_since(self, query):
+        seq = query_int(query, "since")
+        limit = query_int(query, "limit", -1)
+        limit = CHANGE_LIMIT if limit < 0 else min(limit, CHANGE_LIMIT)
+        deadline = time.monotonic() + min(max(0, query_int(query, "wait", 0)), CHANGE_WAIT_LIMIT)
+        while True:
+            rows = await self.read(lambda conn: ChangeLogRepository(conn).since(seq, limit))
+            if rows or time.monotonic() >= deadline:
+                return HTTPStatus.OK, [row_object(row) for row in rows]
+            await asyncio.sleep(CHANGE_WAIT_STEP)
+
+    async def changes_last(self, query):
+        tables = [table for table in query.get("tables", "").split(",") if table]
+        return HTTPStatus.OK, {"last": await self.read(lambda conn: ChangeLogRepository(conn).last(tables))}
+
+def run_server(database, host, port):
+    server = BreweryServer(database)
+    print(f"Sirviendo {database} en http://{host}:{port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+def load_client(url, duration, write_ratio, seed, barrel_ids, invoice_ids):
+    rng = random.Random(seed)
+    client = ApiClient(url)
+    tag = f"LOAD-{os.getpid()}-{seed}"
+    latencies = {}
+    errors = 0
+    created = []
+    operations = (
+        ("list_barrels", lambda: client.request("GET", "/barrels", {
+            "limit": 30, "order": "id", "after": json.dumps([rng.choice(barrel_ids)]),
+        })),
+        ("get_barrel", lambda: client.request("GET", f"/barrels/{rng.choice(barrel_ids)}")),
+        ("search_clients", lambda: client.request("GET", "/clients/count", {"q": rng.choice(("Ana", "Rojas", "C00"))})),
+        ("dashboard", lambda: client.request("GET", "/dashboard/barrels")),
+    )
+    counter = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        key = None
+        if rng.random() < write_ratio:
+            counter += 1
+            name, key = "add_payment", f"{tag}-{counter}"
+            operation = lambda: client.request("POST", "/payments", body={
+                "id": key, "invoice_id": rng.choice(invoice_ids), "amount": 0.01,
+            })
+        else:
+            name, operation = rng.choice(operations)
+        started = time.perf_counter()
+        try:
+            operation()
+        except ApiError:
+            errors += 1
+            continue
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if key:
+            created.append(key)
+    client.close()
+    return latencies, errors, created
+
+def delete_rows(url, table, keys, chunk_size=LOAD_CLEANUP_ROWS):
+    client = ApiClient(url)
+    for start in range(0, len(keys), chunk_size):
+        client.request("POST", "/batch", body={"statements": [
+            ["DELETE", f"/{table}/{quote(key, safe='')}", None] for key in keys[start:start + chunk_size]
+        ]})
+    client.close()
+
+def copy_database(source, target):
+    src = connect_readonly(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(samples, elapsed):
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+    }
+
+def load_test(url, clients=LOAD_CLIENTS, duration=LOAD_DURATION, write_ratio=LOAD_WRITE_RATIO, seed=0, cleanup=True):
+    client = ApiClient(url)
+    barrel_ids = [row["id"] for row in client.request("GET", "/barrels", {"limit": LOAD_SAMPLE_ROWS})["rows"]]
+    invoice_ids = [row["id"] for row in client.request("GET", "/invoices", {"limit": LOAD_SAMPLE_ROWS})["rows"]]
+    client.close()
+    if not barrel_ids or not invoice_ids:
+        raise RuntimeError("la base de datos necesita barriles y facturas; genera datos con benchmark.py")
+    started = time.perf_counter()
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(load_client, [
+            (url, duration, write_ratio, seed + n, barrel_ids, invoice_ids) for n in range(clients)
+        ])
+    elapsed = time.perf_counter() - started
+    if cleanup:
+        delete_rows(url, "payments", [key for _, _, created in results for key in created])
+    merged = {}
+    for latencies, _, _ in results:
+        for name, samples in latencies.items():
+            merged.setdefault(name, []).extend(samples)
+    report = {
+        "clients": clients,
+        "duration_s": elapsed,
+        "errors": sum(errors for _, errors, _ in results),
+        "total": summarize([sample for samples in merged.values() for sample in samples], elapsed),
+    }
+    report.update({name: summarize(samples, elapsed) for name, samples in sorted(merged.items())})
+    return report
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+def wait_for(url, process, timeout=60):
+    client = ApiClient(url, timeout=1)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("el servidor terminó antes de aceptar conexiones")
+        try:
+            client.request("GET", "/dashboard/barrels")
+            client.close()
+            return
+        except ApiError:
+            time.sleep(0.1)
+    raise RuntimeError("el servidor no respondió a tiempo")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON local para la base de datos de la cervecería.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="atiende solicitudes de varias estaciones")
+    serve.add_argument("--database", default=DB_PATH)
+    serve.add_argument("--host", default=SERVER_HOST)
+    serve.add_argument("--port", type=int, default=SERVER_PORT)
+    load = commands.add_parser("loadtest", help="mide solicitudes por segundo y latencia p99")
+    load.add_argument("--url", help="servidor ya en ejecución; sus pagos de prueba se borran al terminar")
+    load.add_argument("--database", default=DB_PATH, help="si no se da --url, se prueba sobre una copia temporal")
+    load.add_argument("--clients", type=int, default=LOAD_CLIENTS)
+    load.add_argument("--duration", type=float, default=LOAD_DURATION)
+    load.add_argument("--write-ratio", type=float, default=LOAD_WRITE_RATIO)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--output", help="guarda el informe como JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        run_server(args.database, args.host, args.port)
+        return
+    process = None
+    url = args.url
+    with tempfile.TemporaryDirectory() as scratch:
+        if not url:
+            if not os.path.exists(args.database):
+                parser.error(f"no existe la base de datos {args.database}")
+            database = os.path.join(scratch, "loadtest.db")
+            copy_database(args.database, database)
+            port = free_port(SERVER_HOST)
+            url = f"http://{SERVER_HOST}:{port}"
+            process = subprocess.Popen([
+                sys.executable, os.path.abspath(__file__), "serve", "--database", database, "--port", str(port)
+            ])
+        try:
+            if process:
+                wait_for(url, process)
+            report = load_test(url, args.clients, args.duration, args.write_ratio, args.seed, cleanup=bool(args.url))
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+    for name, stats in report.items():
+        if isinstance(stats, dict):
+            print(f"{name:<16} {stats['requests']:>8} req  {stats['rps']:>9.1f} req/s  "
+                  f"p50 {stats['p50_ms']:>7.2f} ms  p99 {stats['p99_ms']:>7.2f} ms")
+    print(f"{report['clients']} clientes, {report['duration_s']:.1f} s, {report['errors']} errores")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+if __name__ == "__main__":
+    main()
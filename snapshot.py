@@ -0,0 +1,216 @@
+import argparse
+import contextlib
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from database import DB_PATH, ReaderPool
+from repositories import REPOSITORIES
+from schema import DATE_COLUMNS
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_CHUNK_ROWS = 50000
+SNAPSHOT_COMPRESSION = "zstd"
+SNAPSHOT_PARTITIONS = {
+    "barrels": "start_date",
+    "invoices": "issue_date",
+    "payments": "payment_date",
+    "batches": "start_date",
+    "fermenters": "start_date",
+}
+MANIFEST = "manifest.json"
+OP_COLUMN = "_op"
+RUN_COLUMN = "_run"
+ARROW_TYPES = {"TEXT": pa.string(), "REAL": pa.float64(), "INTEGER": pa.int64()}
+
+def arrow_schema(conn, table):
+    declared = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+    dates = DATE_COLUMNS.get(table, ())
+    return pa.schema([
+        (column, pa.timestamp("s", tz="UTC") if column in dates else ARROW_TYPES.get(declared[column], pa.string()))
+        for column in REPOSITORIES[table].columns
+    ])
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        if os.path.isdir(directory) and os.listdir(directory):
+            raise ValueError(f"{directory} no está vacío y no tiene {MANIFEST}, no es un directorio de instantáneas") from None
+        return {"runs": 0, "tables": {}}
+
+def write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def read_snapshot(table, directory=SNAPSHOT_DIR, months=None):
+    snapshot = ds.dataset(
+        os.path.join(directory, table), format="parquet",
+        partitioning="hive" if table in SNAPSHOT_PARTITIONS else None
+    ).to_table()
+    latest = snapshot.group_by("id").aggregate([(RUN_COLUMN, "max")])
+    snapshot = snapshot.join(latest, ["id", RUN_COLUMN], right_keys=["id", f"{RUN_COLUMN}_max"], join_type="inner")
+    snapshot = snapshot.filter(ds.field(OP_COLUMN) == "upsert")
+    if months is not None:
+        snapshot = snapshot.filter(ds.field("month").isin(list(months)))
+    return snapshot.drop_columns([OP_COLUMN, RUN_COLUMN])
+
+class SnapshotJob:
+    def __init__(self, pool, directory=SNAPSHOT_DIR, full=False, chunk_size=SNAPSHOT_CHUNK_ROWS):
+        self.pool = pool
+        self.directory = directory
+        self.full = full
+        self.chunk_size = chunk_size
+        self.cancelled = threading.Event()
+        self.events = queue.Queue()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def batches(self, cursor, schema, run, counter):
+        fields = [field for field in schema if field.name != RUN_COLUMN]
+        while not self.cancelled.is_set():
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            columns = list(zip(*rows))
+            counter["rows"] += len(rows)
+            counter["deleted"] += columns[0].count("delete")
+            self.events.put(("progress", counter["done"] + counter["rows"], counter["total"]))
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, fields)]
+            arrays.insert(schema.get_field_index(RUN_COLUMN), pa.array([run] * len(rows), type=pa.int64()))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def changed_ids(self, table, state, upto):
+        return "SELECT DISTINCT row_id FROM change_log WHERE table_name = ? AND seq > ? AND seq <= ?", (table, state["seq"], upto)
+
+    def snapshot_table(self, conn, table, state, upto, run, counter):
+        schema = arrow_schema(conn, table)
+        partition = SNAPSHOT_PARTITIONS.get(table)
+        month = f", strftime('%Y-%m', t.{partition}, 'unixepoch', 'localtime')" if partition else ""
+        columns = "".join(f", t.{column}" for column in schema.names[1:])
+        if state is None:
+            cursor = conn.execute(f"SELECT 'upsert', t.id{columns}{month} FROM {table} t ORDER BY t.rowid")
+        else:
+            changed, params = self.changed_ids(table, state, upto)
+            cursor = conn.execute(
+                f"SELECT CASE WHEN t.id IS NULL THEN 'delete' ELSE 'upsert' END, c.row_id{columns}{month} "
+                f"FROM ({changed}) c LEFT JOIN {table} t ON t.id = c.row_id", params
+            )
+        written = []
+        counter.update(rows=0, deleted=0)
+        schema = pa.schema(
+            [pa.field(OP_COLUMN, pa.string())] + list(schema) + [pa.field(RUN_COLUMN, pa.int64())]
+            + ([pa.field("month", pa.string())] if partition else [])
+        )
+        ds.write_dataset(
+            ds.Scanner.from_batches(self.batches(cursor, schema, run, counter), schema=schema),
+            os.path.join(self.directory, table),
+            format="parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=SNAPSHOT_COMPRESSION),
+            partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive") if partition else None,
+            basename_template=f"part-{run:06d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda file: written.append((file.path, file.size)),
+        )
+        cursor.close()
+        if self.cancelled.is_set():
+            for path, _ in written:
+                os.remove(path)
+            return None
+        return counter["rows"], counter["deleted"], written
+
+    def reset(self):
+        for table in REPOSITORIES:
+            shutil.rmtree(os.path.join(self.directory, table), ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(self.directory, MANIFEST))
+
+    def run(self):
+        try:
+            started = time.perf_counter()
+            manifest = read_manifest(self.directory)
+            if self.full:
+                self.reset()
+                manifest = {"runs": manifest["runs"], "tables": {}}
+            os.makedirs(self.directory, exist_ok=True)
+            run = manifest["runs"] + 1
+            summary = {"rows": {}, "deleted": {}, "files": 0, "bytes": 0}
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN")
+                first, upto = conn.execute("SELECT MIN(seq), ifnull(MAX(seq), 0) FROM change_log").fetchone()
+                states = {}
+                for table in REPOSITORIES:
+                    state = manifest["tables"].get(table)
+                    if state is None or "seq" not in state or state["seq"] > upto or (first or 1) > state["seq"] + 1:
+                        state = None
+                    states[table] = state
+                counter = {"done": 0, "total": 0}
+                for table, state in states.items():
+                    if state is None:
+                        counter["total"] += conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    else:
+                        changed, params = self.changed_ids(table, state, upto)
+                        counter["total"] += conn.execute(f"SELECT COUNT(*) FROM ({changed})", params).fetchone()[0]
+                for table, state in states.items():
+                    if state is None:
+                        if manifest["tables"].pop(table, None) is not None:
+                            write_manifest(self.directory, manifest)
+                        shutil.rmtree(os.path.join(self.directory, table), ignore_errors=True)
+                    result = self.snapshot_table(conn, table, state, upto, run, counter)
+                    if result is None:
+                        break
+                    rows, deleted, written = result
+                    counter["done"] += rows
+                    summary["rows"][table] = rows - deleted
+                    summary["deleted"][table] = deleted
+                    summary["files"] += len(written)
+                    summary["bytes"] += sum(size for _, size in written)
+                    manifest["tables"][table] = {"seq": upto, "rows": (state or {"rows": 0})["rows"] + rows}
+                    manifest["runs"] = run
+                    write_manifest(self.directory, manifest)
+            elapsed = time.perf_counter() - started
+            summary["elapsed"] = elapsed
+            summary["rate"] = counter["done"] / elapsed if elapsed else 0
+            self.events.put(("cancelled", counter["done"]) if self.cancelled.is_set() else ("done", summary))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Instantáneas Parquet de la base de datos de la cervecería.")
+    parser.add_argument("--database", default=DB_PATH)
+    parser.add_argument("--output", default=SNAPSHOT_DIR)
+    parser.add_argument("--full", action="store_true",
+                        help="descarta las instantáneas previas de este directorio y escribe todo de nuevo")
+    args = parser.parse_args(argv)
+    pool = ReaderPool(args.database, 1)
+    job = SnapshotJob(pool, args.output, args.full)
+    job.run()
+    pool.close()
+    event = None
+    while not job.events.empty():
+        event = job.events.get()
+    if event[0] != "done":
+        print(f"Error: {event[1]}", file=sys.stderr)
+        sys.exit(1)
+    summary = event[1]
+    for table, rows in summary["rows"].items():
+        print(f"{table:<12} {rows:>10} filas escritas {summary['deleted'][table]:>10} borradas")
+    print(f"{summary['files']} archivos, {summary['bytes'] / 1e6:.1f} MB, "
+          f"{summary['elapsed']:.1f} s ({summary['rate']:.0f} filas/s)")
+
+if __name__ == "__main__":
+    main()
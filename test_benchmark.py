@@ -0,0 +1,43 @@
+import io
+
+from benchmark import DEFAULT_SIZES, compare, generate, run, scaled_sizes
+from database import connect
+from schema import create_schema
+
+SIZES = {"clients": 20, "barrels": 50, "invoices": 40, "payments": 30, "batches": 10, "fermenters": 5}
+
+def generated(path, seed):
+    conn = connect(str(path))
+    create_schema(conn)
+    generate(conn, SIZES, seed)
+    return conn
+
+def dump(conn, table):
+    return conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+
+def test_generator_is_deterministic_and_keeps_the_ledger(tmp_path):
+    first, second = generated(tmp_path / "a.db", 3), generated(tmp_path / "b.db", 3)
+    for table in SIZES:
+        assert dump(first, table) == dump(second, table)
+        assert len(dump(first, table)) == SIZES[table]
+    assert first.execute("""
+        SELECT COUNT(*) FROM invoices i
+        WHERE abs(i.paid_total - (SELECT ifnull(SUM(amount), 0) FROM payments WHERE invoice_id = i.id)) > 0.005
+           OR abs(i.balance - (i.amount - i.paid_total)) > 0.005
+    """).fetchone()[0] == 0
+    first.close()
+    second.close()
+
+def test_scaled_sizes_apply_overrides():
+    sizes = scaled_sizes(0.5, {"clients": 7, "barrels": None})
+    assert sizes["clients"] == 7
+    assert sizes["barrels"] == DEFAULT_SIZES["barrels"] // 2
+
+def test_small_run_reports_every_section(tmp_path):
+    report = run(str(tmp_path / "bench.db"), SIZES, 2, exports=False, group_commit=False)
+    assert report["sizes"] == SIZES
+    assert {f"insert_{table}" for table in SIZES} <= set(report["results"])
+    assert all(stats["median_ms"] >= 0 for stats in report["results"].values())
+    out = io.StringIO()
+    compare(report, report, out)
+    assert "1.00" in out.getvalue()
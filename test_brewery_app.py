@@ -0,0 +1,508 @@
+import csv
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+import zipfile
+
+import pytest
+
+import brewery_app
+from brewery_app import (
+    BreweryApp, CHANGE_BATCH_ROWS, ChangeWatcher, ExportJob, ImportJob, QrLabelJob, ScanIngestJob, SearchWorker, StartupTrace, VirtualTreeview, build_label_sheet,
+    read_import_file, render_qr, validate_import,
+)
+from database import ReaderPool, connect, connect_readonly
+from repositories import ANCHOR_STRIDE, Barrel, BarrelRepository, ChangeLogRepository, Client, ClientRepository
+from schema import INDEXES, SORT_COLUMNS
+
+class FakeTree:
+    def __init__(self, columns, height=10):
+        self.columns = columns
+        self.height = height
+        self.items = {}
+        self.order = []
+        self.headings = {}
+        self.commands = {}
+
+    def __getitem__(self, name):
+        return self.columns
+
+    def bind(self, *args):
+        pass
+
+    def heading(self, name, option=None, **options):
+        if option:
+            return self.headings.get(name, "")
+        if "text" in options:
+            self.headings[name] = options["text"]
+        if "command" in options:
+            self.commands[name] = options["command"]
+
+    def cget(self, name):
+        return self.height
+
+    def winfo_height(self):
+        return 1
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def delete(self, *items):
+        for item in items:
+            self.order.remove(item)
+            del self.items[item]
+
+    def exists(self, key):
+        return key in self.items
+
+    def item(self, key, values=None):
+        self.items[key] = values
+
+    def move(self, key, parent, index):
+        self.order.remove(key)
+        self.order.insert(index, key)
+
+    def insert(self, parent, index, iid, values):
+        self.order.insert(index, iid)
+        self.items[iid] = values
+
+    def yview_moveto(self, fraction):
+        pass
+
+class FakeScrollbar:
+    def configure(self, **options):
+        pass
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+class FakeStyle:
+    lookups = 0
+
+    def lookup(self, style, option):
+        FakeStyle.lookups += 1
+        return 20
+
+@pytest.fixture
+def barrels(conn):
+    repository = BarrelRepository(conn)
+    repository.insert_many(Barrel(f"B{i:03d}", float(i % 7 + 1), "Libre", None, None) for i in range(100))
+    conn.commit()
+    return repository
+
+@pytest.fixture
+def view(barrels, monkeypatch):
+    monkeypatch.setattr(brewery_app.ttk, "Style", FakeStyle)
+    view = VirtualTreeview(FakeTree(("ID", "Capacity", "Status", "Client ID", "Start Date")), FakeScrollbar(), barrels)
+    view.refresh()
+    return view
+
+def test_view_renders_only_the_visible_window(view):
+    assert view.total == 100
+    assert view.tree.order == [f"B{i:03d}" for i in range(20)]
+
+def test_view_scrolls_and_jumps_by_keyset(view):
+    view.scroll(5)
+    assert view.tree.order[0] == "B005"
+    view.jump(95)
+    assert view.offset == 90
+    assert view.tree.order[-1] == "B099"
+    view.jump(0)
+    assert view.tree.order[0] == "B000"
+
+def test_row_height_is_looked_up_once(view):
+    FakeStyle.lookups = 0
+    for _ in range(10):
+        view.scroll(1)
+    assert FakeStyle.lookups == 0
+    view.row_height = None
+    view.page_size()
+    view.page_size()
+    assert FakeStyle.lookups == 1
+
+def test_sortable_columns_have_sort_indexes(view):
+    assert set(view.tree.commands) == {"ID", "Capacity", "Status", "Client ID", "Start Date"}
+    assert {f"idx_barrels_sort_{column}" for column in SORT_COLUMNS["barrels"]} <= set(INDEXES)
+    view.tree.commands["Status"]()
+    assert view.tree.headings["Status"].endswith("▲")
+    assert [key for key in view.tree.order[:3]] == ["B000", "B001", "B002"]
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_view_jumps_deep_through_anchors(conn, view, descending):
+    BarrelRepository(conn).insert_many(
+        Barrel(f"X{i:04d}", float(i * 7919 % 13), "Libre", None, None) for i in range(1000)
+    )
+    conn.commit()
+    view.refresh()
+    view.tree.commands["Capacity"]()
+    if descending:
+        view.tree.commands["Capacity"]()
+    ordered = [row.id for row in sorted(BarrelRepository(conn).fetch(), key=lambda row: (row.capacity, row.id), reverse=descending)]
+    for target in (637, 250, 1000, 90):
+        view.jump(target)
+        assert view.offset == target
+        assert view.tree.order == ordered[target:target + 20]
+    assert len(view.anchors) == 1100 // ANCHOR_STRIDE
+    view.jump(5)
+    assert view.tree.order == ordered[5:25]
+
+def count_pages(view, monkeypatch):
+    calls = []
+    page = view.page
+    monkeypatch.setattr(view, "page", lambda *args, **kwargs: calls.append(kwargs) or page(*args, **kwargs))
+    return calls
+
+def test_updates_to_visible_rows_are_patched_in_place(conn, barrels, view, monkeypatch):
+    pages = count_pages(view, monkeypatch)
+    conn.execute("UPDATE barrels SET capacity = 99 WHERE id = 'B003'")
+    conn.commit()
+    view.changed({"B003": "update"})
+    assert view.tree.items["B003"][1] == 99.0
+    assert pages == []
+
+def test_inserts_past_the_window_rerender_once_without_counting(barrels, view, monkeypatch):
+    pages = count_pages(view, monkeypatch)
+    monkeypatch.setattr(barrels, "count", lambda *args: pytest.fail("counted the table"))
+    barrels.insert(Barrel("B100", 10.0, "Libre", None, None))
+    view.changed({"B100": "insert"})
+    assert view.total == 101
+    assert len(pages) == 1
+    assert not view.tree.exists("B100")
+
+def test_deleting_a_visible_row_rerenders_the_window(barrels, view):
+    barrels.delete("B002")
+    view.changed({"B002": "delete"})
+    assert view.total == 99
+    assert view.tree.order[:3] == ["B000", "B001", "B003"]
+
+def test_filtered_view_recounts_when_a_hidden_row_starts_matching(conn, barrels, view):
+    view.set_filter("status = ?", ("Ocupado",))
+    assert view.total == 0
+    conn.execute("UPDATE barrels SET status = 'Ocupado' WHERE id = 'B050'")
+    conn.commit()
+    view.changed({"B050": "update"})
+    assert view.total == 1
+    assert view.tree.order == ["B050"]
+
+def test_filtered_view_recounts_when_a_hidden_row_is_deleted(conn, barrels, view):
+    conn.execute("UPDATE barrels SET status = 'Ocupado' WHERE id IN ('B010', 'B020', 'B030')")
+    view.set_filter("status = ?", ("Ocupado",))
+    view.tree.height = 1
+    view.buffer = 0
+    view.render()
+    assert view.tree.order == ["B010"]
+    barrels.delete("B030")
+    barrels.delete("B050")
+    view.changed({"B030": "delete", "B050": "delete"})
+    assert view.total == 2
+
+def app_with_views(views):
+    app = object.__new__(BreweryApp)
+    app.views = views
+    app.built_tabs = set()
+    return app
+
+def test_overflowed_changes_refresh_views_whose_filter_moved_on(conn, barrels, view):
+    view.set_filter("status = ?", ("Ocupado",))
+    conn.execute("UPDATE barrels SET status = 'Ocupado' WHERE id = 'B010'")
+    conn.commit()
+    app_with_views({"barrels": [view]}).apply_changes(None, {view: ("", (), 100)})
+    assert view.total == 1
+    assert view.tree.order == ["B010"]
+
+class FakeRoot:
+    def after(self, delay, callback, *args):
+        pass
+
+@pytest.fixture
+def watcher(database, view):
+    pool = ReaderPool(database, 1)
+    changes = ChangeLogRepository(connect_readonly(database))
+    watcher = ChangeWatcher(FakeRoot(), changes, pool, {"barrels": [view]}, None, interval=10)
+    yield watcher
+    pool.close()
+
+@pytest.mark.parametrize("previous, op, result", [
+    (None, "insert", "insert"), ("insert", "update", "insert"), ("insert", "delete", None),
+    ("update", "delete", "delete"), ("delete", "insert", "update"), ("update", "update", "update"),
+])
+def test_collapse_change(previous, op, result):
+    assert brewery_app.collapse_change(previous, op) == result
+
+def test_watcher_collapses_changes_off_the_ui_thread(conn, barrels, watcher):
+    barrels.insert(Barrel("N1", 10.0, "Libre", None, None))
+    barrels.insert(Barrel("N2", 10.0, "Libre", None, None))
+    barrels.delete("N2")
+    barrels.delete("B001")
+    conn.commit()
+    tables, counts = watcher.results.get(timeout=5)
+    assert tables == {"barrels": {"N1": "insert", "B001": "delete"}}
+    assert counts == {}
+
+def test_watcher_recounts_views_when_the_log_overflows(conn, barrels, view, watcher):
+    barrels.insert_many(Barrel(f"X{i:04d}", 10.0, "Libre", None, None) for i in range(CHANGE_BATCH_ROWS + 1))
+    conn.commit()
+    tables, counts = watcher.results.get(timeout=5)
+    assert tables is None
+    assert counts == {view: ("", (), 100 + CHANGE_BATCH_ROWS + 1)}
+    view.changed({}, counts[view][2])
+    assert view.total == 100 + CHANGE_BATCH_ROWS + 1
+
+def test_watcher_recounts_filtered_views_on_deletes(conn, barrels, view, watcher):
+    view.set_filter("capacity > ?", (6,))
+    barrels.delete("B006")
+    conn.commit()
+    tables, counts = watcher.results.get(timeout=5)
+    assert counts == {view: ("capacity > ?", (6,), 13)}
+
+class ScheduledRoot:
+    def __init__(self):
+        self.jobs = {}
+        self.next = 0
+
+    def after(self, delay, callback, *args):
+        self.next += 1
+        self.jobs[self.next] = (delay, callback, args)
+        return self.next
+
+    def after_cancel(self, job):
+        del self.jobs[job]
+
+    def fire(self, delays):
+        for job, (delay, callback, args) in list(self.jobs.items()):
+            if delay in delays:
+                del self.jobs[job]
+                callback(*args)
+
+class SearchView:
+    def __init__(self):
+        self.applied = []
+        self.loads = []
+
+    def window_size(self):
+        return 10
+
+    def load(self, conn, where, params, limit):
+        self.loads.append(params)
+        return conn.execute(f"SELECT COUNT(*) FROM barrels WHERE {where}", params).fetchone()[0], []
+
+    def apply(self, where, params, total, rows):
+        self.applied.append((params, total))
+
+def settle(worker, root, view, loads):
+    deadline = time.monotonic() + 5
+    while (len(view.loads) < loads or worker.results.empty()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    root.fire({50})
+
+def test_search_is_debounced_to_the_last_keystroke(database, barrels):
+    root, view, pool = ScheduledRoot(), SearchView(), ReaderPool(database, 1)
+    worker = SearchWorker(root, pool, delay=250)
+    for term in ("B0", "B00", "B001"):
+        worker.submit(view, "id LIKE ?", (term + "%",))
+    assert sorted(delay for delay, _, _ in root.jobs.values()) == [50, 250]
+    root.fire({250})
+    settle(worker, root, view, 1)
+    assert view.loads == [("B001%",)]
+    assert view.applied == [(("B001%",), 1)]
+    pool.close()
+
+def test_stale_search_results_are_dropped(database, barrels):
+    root, view, pool = ScheduledRoot(), SearchView(), ReaderPool(database, 1)
+    worker = SearchWorker(root, pool)
+    worker.submit(view, "id LIKE ?", ("B0%",), delay=0)
+    root.fire({0})
+    deadline = time.monotonic() + 5
+    while worker.results.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker.submit(view, "id LIKE ?", ("B09%",), delay=0)
+    root.fire({50})
+    assert view.applied == []
+    root.fire({0})
+    settle(worker, root, view, 2)
+    assert view.applied == [(("B09%",), 10)]
+    pool.close()
+
+def import_file(tmp_path, text, name="import.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_validate_import_rejects_non_finite_and_non_positive_numbers(conn, tmp_path):
+    frame = read_import_file(import_file(tmp_path, "ID,Capacidad (L)\nB1,50\nB2,inf\nB3,-1\nB4,nan\nB5,x\n"))
+    accepted, rejected = validate_import(conn, "barrels", frame)
+    assert list(accepted["id"]) == ["B1"]
+    assert set(rejected["motivo"]) == {"capacity debe ser un número positivo"}
+
+def test_validate_import_rejects_paid_invoices_without_payments(conn, tmp_path):
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    conn.commit()
+    frame = read_import_file(import_file(
+        tmp_path, "ID,ID del Cliente,Monto,Estado\nF1,C1,10,Pagada\nF2,C1,10,Vencida\nF3,C1,10,\nF4,C9,10,\n"
+    ))
+    accepted, rejected = validate_import(conn, "invoices", frame)
+    assert list(accepted["id"]) == ["F2", "F3"]
+    assert list(accepted["status"]) == ["Vencida", "Pendiente"]
+    assert dict(zip(rejected["id"], rejected["motivo"])) == {
+        "F1": "una factura nueva no tiene pagos, no puede estar Pagada",
+        "F4": "client_id no existe",
+    }
+
+def run_job(job):
+    job.run()
+    events = []
+    while not job.events.empty():
+        events.append(job.events.get())
+    return events[-1]
+
+def test_import_is_all_or_nothing(database, tmp_path, monkeypatch):
+    calls = []
+    original = ClientRepository.insert_many
+
+    def failing(self, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("disk I/O error")
+        original(self, rows)
+
+    monkeypatch.setattr(ClientRepository, "insert_many", failing)
+    lines = "".join(f"C{i},Cliente {i}\n" for i in range(5))
+    event = run_job(ImportJob(database, "clients", import_file(tmp_path, "ID,Nombre\n" + lines), batch_size=2))
+    assert event[0] == "error"
+    assert calls == [2, 2]
+    check = connect(database)
+    assert check.execute("SELECT COUNT(*) FROM clients").fetchone()[0] == 0
+    check.close()
+
+def test_import_commits_every_batch_once_finished(database, tmp_path):
+    lines = "".join(f"C{i},Cliente {i}\n" for i in range(5))
+    event = run_job(ImportJob(database, "clients", import_file(tmp_path, "ID,Nombre\n" + lines), batch_size=2))
+    assert event[0] == "done"
+    assert event[1]["inserted"] == 5
+    check = connect(database)
+    assert check.execute("SELECT COUNT(*) FROM clients").fetchone()[0] == 5
+    check.close()
+
+def test_label_job_reports_an_empty_selection(database, tmp_path):
+    pool = ReaderPool(database, 1)
+    job = QrLabelJob(pool, [], str(tmp_path / "labels"), str(tmp_path / "cache"))
+    assert run_job(job) == ("empty",)
+    pool.close()
+    with pytest.raises(ValueError):
+        build_label_sheet([], str(tmp_path / "empty.pdf"))
+
+def test_label_rate_counts_only_rendered_labels(database, tmp_path):
+    cache = str(tmp_path / "cache")
+    render_qr("B1", cache)
+    render_qr("B2", cache)
+    pool = ReaderPool(database, 1)
+    job = QrLabelJob(pool, ["B1", "B2", "B3"], str(tmp_path / "labels"), cache)
+    event = run_job(job)
+    assert event[0] == "done"
+    summary = event[1]
+    assert (summary["labels"], summary["rendered"], summary["cached"]) == (3, 1, 2)
+    assert summary["per_thousand"] > 0
+    assert os.path.getsize(job.sheet_file) > 0
+    with zipfile.ZipFile(job.zip_file) as archive:
+        assert sorted(archive.namelist()) == ["barrel_qr_B1.png", "barrel_qr_B2.png", "barrel_qr_B3.png"]
+    assert run_job(QrLabelJob(pool, ["B1"], str(tmp_path / "again"), cache))[1]["per_thousand"] == 0
+    pool.close()
+
+def test_export_streams_every_row_in_chunks(database, barrels, tmp_path):
+    pool = ReaderPool(database, 1)
+    filename = str(tmp_path / "barriles.csv")
+    job = ExportJob(pool, "barrels", barrels.columns, ["ID", "Capacidad", "Estado", "Cliente", "Inicio"], filename, chunk_size=30)
+    job.run()
+    events = []
+    while not job.events.empty():
+        events.append(job.events.get())
+    assert events == [("progress", 30, 100), ("progress", 60, 100), ("progress", 90, 100), ("progress", 100, 100), ("done", 100)]
+    with open(filename, newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["ID", "Capacidad", "Estado", "Cliente", "Inicio"]
+    assert rows[1] == ["B000", "1.0", "Libre", "", ""]
+    assert len(rows) == 101
+    job = ExportJob(pool, "barrels", barrels.columns, ["ID"], filename)
+    job.cancel()
+    assert run_job(job) == ("cancelled", 0)
+    assert not os.path.exists(filename)
+    pool.close()
+
+def test_scan_ingest_assigns_each_known_barrel_once(conn, database, barrels, tmp_path):
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    conn.commit()
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    for index, barrel_id in enumerate(["B001", "B002", "B001", "X999"]):
+        shutil.copy(render_qr(barrel_id, str(tmp_path / "cache")), scans / f"frame{index}.png")
+    (scans / "notas.txt").write_text("no es una imagen")
+    job = ScanIngestJob(database, str(scans), "Ocupado", "C1")
+    event = run_job(job)
+    assert event[0] == "done", event
+    summary = event[1]
+    assert (summary["frames"], summary["scans"], summary["duplicates"]) == (4, 4, 1)
+    assert (summary["updated"], summary["unknown"]) == (["B001", "B002"], ["X999"])
+    rows = conn.execute("SELECT id, status, client_id FROM barrels WHERE status = 'Ocupado' ORDER BY id").fetchall()
+    assert rows == [("B001", "Ocupado", "C1"), ("B002", "Ocupado", "C1")]
+
+class FakeTabs:
+    def __init__(self, current):
+        self.current = current
+
+    def get(self):
+        return self.current
+
+def test_tabs_are_built_on_first_visit_only():
+    app = object.__new__(BreweryApp)
+    built, refreshed = [], []
+    app.trace = StartupTrace(False)
+    app.tab_view = FakeTabs("Barriles")
+    app.tab_builders = {name: lambda name=name: built.append(name) for name in ("Barriles", "Panel")}
+    app.built_tabs = set()
+    app.refresh_dashboard = lambda: refreshed.append(True)
+    app.on_tab_change()
+    app.on_tab_change()
+    assert built == ["Barriles"]
+    app.tab_view.current = "Panel"
+    app.on_tab_change()
+    app.on_tab_change()
+    assert built == ["Barriles", "Panel"]
+    assert refreshed == [True]
+
+def test_initial_view_load_is_deferred_to_the_search_worker(view):
+    app = object.__new__(BreweryApp)
+    submitted = []
+    app.views = {}
+    app.trace = StartupTrace(False)
+    app.search_worker = type("Worker", (), {"submit": lambda self, *args, **kwargs: submitted.append((args, kwargs))})()
+    app.load_view(view)
+    assert app.views == {"barrels": [view]}
+    (args, kwargs), = submitted
+    assert args[:3] == (view, "", ())
+    assert kwargs["delay"] == 0
+
+def test_heavy_modules_load_on_first_use():
+    code = "import sys, brewery_app; print(sorted(set(sys.modules) & {'pandas', 'numpy', 'qrcode', 'cv2', 'pyarrow'}))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(brewery_app.__file__))).stdout
+    assert output.strip() == "[]"
+
+def test_startup_trace_reports_phases_against_the_budget(capsys):
+    trace = StartupTrace(True, budget_ms=1e9)
+    with trace.phase("setup_ui"):
+        pass
+    trace.record("first paint", 0.25)
+    trace.report()
+    trace.record("first load barrels", 0.5)
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[0].startswith("[startup] setup_ui: ")
+    assert lines[1] == "[startup] first paint: 250.0 ms"
+    assert lines[2].startswith("[startup] total: ") and lines[2].endswith("OK)")
+    assert lines[3] == "[startup] first load barrels: 500.0 ms"
+    quiet = StartupTrace(False)
+    quiet.record("imports", 1)
+    quiet.report()
+    assert quiet.phases == [] and capsys.readouterr().err == ""
@@ -0,0 +1,169 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database as database_module
+import schema
+
+from benchmark import run
+from brewery_app import QueryPlanAuditor
+from database import ReaderPool, WriteQueue, connect, trace_queries
+from repositories import BarrelMovementRepository, BarrelRepository, ChangeLogRepository
+
+@pytest.fixture
+def traced():
+    statements = []
+    trace_queries(statements.append)
+    yield statements
+    trace_queries(None)
+
+def submit(writer, statements):
+    done = threading.Event()
+    errors = []
+    writer.submit(statements, lambda error: (errors.append(error), done.set()))
+    done.wait(5)
+    return errors[0]
+
+def test_every_connection_reports_to_the_query_trace(database, traced):
+    conn = connect(database)
+    conn.execute("SELECT COUNT(*) FROM clients WHERE name = 'reader'")
+    conn.close()
+    pool = ReaderPool(database, 1)
+    with pool.connection() as reader:
+        reader.execute("SELECT COUNT(*) FROM barrels WHERE status = 'pool'")
+    pool.close()
+    writer = WriteQueue(database)
+    assert submit(writer, [("INSERT INTO clients (id, name) VALUES (?, ?)", ("C1", "queue"))]) is None
+    writer.close()
+    assert any("name = 'reader'" in statement for statement in traced)
+    assert any("status = 'pool'" in statement for statement in traced)
+    assert any(statement.startswith("INSERT INTO clients") for statement in traced)
+
+def test_trace_can_be_switched_off(database, traced):
+    trace_queries(None)
+    conn = connect(database)
+    conn.execute("SELECT 1")
+    conn.close()
+    assert traced == []
+
+def test_auditor_flags_full_scans_only(database):
+    auditor = QueryPlanAuditor(database)
+    conn = connect(database)
+    try:
+        def scans(statement):
+            return auditor.full_scans(auditor.plan(conn, statement))
+
+        assert scans("SELECT id FROM barrels WHERE client_id = 'C1'") == []
+        assert scans("SELECT id FROM invoices WHERE client_id = 'C1' AND status = 'Pendiente'") == []
+        assert scans("SELECT id FROM clients WHERE contact = 'x'")
+    finally:
+        conn.close()
+
+def test_app_queries_never_scan_large_tables(tmp_path):
+    path = str(tmp_path / "brewery.db")
+    auditor = QueryPlanAuditor(path)
+    trace_queries(auditor.record)
+    try:
+        run(path, {"clients": 1200, "barrels": 3000, "invoices": 3000, "payments": 3000, "batches": 1000,
+                   "fermenters": 20}, 1, exports=False, group_commit=False)
+        conn = connect(path)
+        movements = BarrelMovementRepository(conn)
+        movements.history("B1", 10)
+        movements.at("B1", "2024-01-01")
+        movements.held_by("C1", "2023-01-01", "2024-01-01")
+        ChangeLogRepository(conn).since(0, 10)
+        BarrelRepository(conn).existing(["B1", "B2"])
+    finally:
+        trace_queries(None)
+    try:
+        assert auditor.statements
+        assert auditor.regressions(conn) == []
+    finally:
+        conn.close()
+
+def test_write_queue_prunes_the_change_log_periodically(database, monkeypatch):
+    monkeypatch.setattr(database_module, "prune_change_log", lambda conn: schema.prune_change_log(conn, keep=1))
+    writer = WriteQueue(database, prune_every=2)
+    for i in range(4):
+        assert submit(writer, [("INSERT INTO clients (id, name) VALUES (?, ?)", (f"C{i}", "Ana"))]) is None
+    writer.close()
+    conn = connect(database)
+    assert conn.execute("SELECT row_id FROM change_log").fetchall() == [("C3",)]
+    conn.close()
+
+def test_readers_use_wal_and_cannot_write(database):
+    pool = ReaderPool(database, 1)
+    with pool.connection() as reader:
+        assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute("INSERT INTO clients (id, name) VALUES ('C1', 'Ana')")
+    pool.close()
+
+def test_readers_are_not_blocked_by_an_open_write(database):
+    writer = connect(database)
+    writer.execute("INSERT INTO clients (id, name) VALUES ('C1', 'Ana')")
+    writer.commit()
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO clients (id, name) VALUES ('C2', 'Beto')")
+    pool = ReaderPool(database, 1)
+    with pool.connection() as reader:
+        assert reader.execute("SELECT id FROM clients").fetchall() == [("C1",)]
+    writer.rollback()
+    writer.close()
+    pool.close()
+
+def test_pool_reuses_and_caps_connections(database):
+    pool = ReaderPool(database, 2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as again:
+        assert again is first
+    held = [pool.acquire(), pool.acquire()]
+    waiting = []
+    thread = threading.Thread(target=lambda: waiting.append(pool.acquire()))
+    thread.start()
+    thread.join(0.2)
+    assert waiting == [] and pool.created == 2
+    pool.release(held.pop())
+    thread.join(5)
+    assert len(waiting) == 1
+    pool.release(waiting[0])
+    pool.release(held[0])
+    pool.close()
+
+def test_failed_mutation_rolls_back_alone(database):
+    writer = WriteQueue(database, max_delay=0.2)
+    results = {}
+    done = threading.Event()
+
+    def finished(name):
+        def callback(error):
+            results[name] = error
+            if len(results) == 3:
+                done.set()
+        return callback
+
+    insert = "INSERT INTO clients (id, name) VALUES (?, ?)"
+    writer.submit([(insert, ("C1", "Ana"))], finished("first"))
+    writer.submit([(insert, ("C2", "Beto")), (insert, ("C1", "Duplicado"))], finished("failing"))
+    writer.submit([(insert, ("C3", "Carla"))], finished("last"))
+    done.wait(5)
+    writer.close()
+    assert results["first"] is None and results["last"] is None
+    assert isinstance(results["failing"], sqlite3.IntegrityError)
+    conn = connect(database)
+    assert conn.execute("SELECT id FROM clients ORDER BY id").fetchall() == [("C1",), ("C3",)]
+    conn.close()
+
+def test_write_queue_groups_mutations_into_few_commits(database):
+    writer = WriteQueue(database, max_batch=50, max_delay=0.5)
+    done = threading.Event()
+    errors = []
+    for i in range(100):
+        callback = (lambda error: (errors.append(error), done.set())) if i == 99 else errors.append
+        writer.submit([("INSERT INTO clients (id, name) VALUES (?, ?)", (f"C{i}", "Ana"))], callback)
+    done.wait(5)
+    writer.close()
+    assert errors == [None] * 100
+    assert writer.commits <= 4
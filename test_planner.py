@@ -0,0 +1,86 @@
+import random
+import threading
+
+import pytest
+
+from database import WriteConflict, WriteQueue
+from planner import apply_statements, plan_batches, plan_fermenters
+from repositories import Batch, BatchRepository, Fermenter, FermenterRepository
+
+NOW = 1700000000
+DAY = 86400
+
+def test_plan_respects_capacity_release_and_tank_turnaround():
+    generator = random.Random(7)
+    fermenters = [
+        Fermenter(f"T{i}", generator.choice([500.0, 1000.0, 2000.0]), generator.choice(["Libre", "Ocupado", "En Limpieza"]),
+                  None, NOW - generator.randrange(20) * DAY)
+        for i in range(12)
+    ]
+    batches = [
+        Batch(f"L{i}", "Lager", generator.choice([0.0, 300.0, 800.0, 1500.0, 2500.0]), "En espera",
+              NOW + generator.randrange(-5, 10) * DAY)
+        for i in range(80)
+    ]
+    plan = plan_batches(fermenters, batches, NOW, ferment_days=14, clean_days=1)
+    tanks = {fermenter.id: fermenter for fermenter in fermenters}
+    releases = {batch.id: max(batch.start_date, NOW) for batch in batches}
+    assert len(plan.assignments) + len(plan.unplaced) == len(batches)
+    assert {reason for _, _, reason in plan.unplaced} <= {"sin volumen", "sin fermentador con capacidad suficiente"}
+    used = {}
+    for assignment in plan.assignments:
+        assert assignment.volume <= tanks[assignment.fermenter_id].capacity
+        assert assignment.start >= releases[assignment.batch_id]
+        assert assignment.end == assignment.start + 14 * DAY
+        used.setdefault(assignment.fermenter_id, []).append((assignment.start, assignment.end))
+    for periods in used.values():
+        periods.sort()
+        assert all(following[0] >= previous[1] + DAY for previous, following in zip(periods, periods[1:]))
+    assert all(assignment.start == NOW for assignment in plan.starting())
+
+def seed(conn):
+    FermenterRepository(conn).insert_many([
+        Fermenter("T1", 1000.0, "Libre", None, None), Fermenter("T2", 1000.0, "Libre", None, None),
+    ])
+    BatchRepository(conn).insert_many([
+        Batch("L1", "Lager", 900.0, "En espera", None), Batch("L2", "Stout", 800.0, "En espera", None),
+    ])
+    conn.commit()
+
+def write(database, statements):
+    writer = WriteQueue(database)
+    done, errors = threading.Event(), []
+    writer.submit(statements, lambda error: (errors.append(error), done.set()))
+    done.wait(5)
+    writer.close()
+    return errors[0]
+
+def test_what_if_plans_cannot_be_applied(conn):
+    seed(conn)
+    plan = plan_fermenters(conn, NOW, extra=[2000.0])
+    assert plan.what_if
+    with pytest.raises(ValueError):
+        apply_statements(plan, FermenterRepository(None), BatchRepository(None))
+
+def test_apply_reports_conflicts_and_changes_nothing(conn, database):
+    seed(conn)
+    plan = plan_fermenters(conn, NOW)
+    statements = apply_statements(plan, FermenterRepository(None), BatchRepository(None))
+    assert len(statements) == 4
+    conn.execute("UPDATE fermenters SET status = 'En Limpieza' WHERE id = ?", (plan.starting()[-1].fermenter_id,))
+    conn.commit()
+    error = write(database, statements)
+    assert isinstance(error, WriteConflict)
+    assert "ya no está libre" in str(error)
+    assert conn.execute("SELECT COUNT(*) FROM fermenters WHERE batch_id IN ('L1', 'L2')").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM batches WHERE status = 'En espera'").fetchone()[0] == 2
+
+def test_applying_a_plan_twice_starts_each_batch_once(conn, database):
+    seed(conn)
+    plan = plan_fermenters(conn, NOW)
+    statements = apply_statements(plan, FermenterRepository(None), BatchRepository(None))
+    assert write(database, statements) is None
+    assert isinstance(write(database, statements), WriteConflict)
+    rows = conn.execute("SELECT id, status, batch_id FROM fermenters ORDER BY id").fetchall()
+    assert sorted(batch for _, _, batch in rows) == ["L1", "L2"]
+    assert conn.execute("SELECT COUNT(*) FROM batches WHERE status = 'En curso'").fetchone()[0] == 2
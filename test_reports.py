@@ -0,0 +1,69 @@
+import zoneinfo
+from datetime import date, datetime
+
+import pandas as pd
+
+from repositories import Client, ClientRepository, Invoice, InvoiceRepository
+from reports import AgingCache, AgingJob, aging_frame, aging_key
+
+MADRID = zoneinfo.ZoneInfo("Europe/Madrid")
+
+def day(value):
+    return (value - date(1970, 1, 1)).days
+
+def invoices(*rows):
+    return pd.DataFrame.from_records(rows, columns=["client_id", "issue_date", "balance"])
+
+def test_aging_buckets_per_client():
+    today = day(date(2024, 6, 30))
+    noon = lambda value: int(datetime(value.year, value.month, value.day, 12, tzinfo=MADRID).timestamp())
+    frame = aging_frame(invoices(
+        ("C1", noon(date(2024, 6, 30)), 10.0),
+        ("C1", noon(date(2024, 5, 31)), 20.0),
+        ("C1", noon(date(2024, 5, 1)), 30.0),
+        ("C2", noon(date(2024, 1, 1)), 5.0),
+        ("C2", None, 1.0),
+    ), {"C1": "Ana"}, today, MADRID)
+    assert frame.to_dict("records") == [
+        {"client_id": "C1", "name": "Ana", "0-30": 30.0, "31-60": 30.0, "61-90": 0.0, "90+": 0.0, "total": 60.0, "invoices": 3},
+        {"client_id": "C2", "name": "", "0-30": 0.0, "31-60": 0.0, "61-90": 0.0, "90+": 6.0, "total": 6.0, "invoices": 2},
+    ]
+
+def test_aging_uses_each_invoices_own_utc_offset():
+    issued = datetime(2024, 1, 31, 23, 30, tzinfo=MADRID)
+    today = day(date(2024, 1, 31)) + 61
+    frame = aging_frame(invoices(("C1", int(issued.timestamp()), 10.0)), {}, today, MADRID)
+    assert frame.loc[0, "61-90"] == 10.0
+
+def test_aging_key_changes_when_a_client_is_renamed(conn):
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    InvoiceRepository(conn).insert(Invoice("F1", "C1", 10.0, "Pendiente", 1700000000))
+    conn.commit()
+    key = aging_key(conn, 1700000000)
+    conn.execute("UPDATE clients SET name = 'Ana María' WHERE id = 'C1'")
+    conn.commit()
+    assert aging_key(conn, 1700000000) != key
+
+def test_aging_job_serves_the_cache_until_a_client_changes(database, conn):
+    from database import ReaderPool
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    InvoiceRepository(conn).insert(Invoice("F1", "C1", 10.0, "Pendiente", 1700000000))
+    conn.commit()
+    pool, cache = ReaderPool(database, 1), AgingCache()
+
+    def run():
+        job = AgingJob(pool, cache, now=1700000000)
+        job.run()
+        events = []
+        while not job.events.empty():
+            events.append(job.events.get())
+        return events[-1][1]
+
+    assert not run()["cached"]
+    assert run()["cached"]
+    conn.execute("UPDATE clients SET name = 'Ana María' WHERE id = 'C1'")
+    conn.commit()
+    result = run()
+    assert not result["cached"]
+    assert list(result["frame"]["name"]) == ["Ana María"]
+    pool.close()
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from repositories import Barrel, BarrelMovementRepository, BarrelRepository, Client, ClientRepository, Invoice, InvoiceRepository
+
+@pytest.fixture
+def barrels(conn):
+    repository = BarrelRepository(conn)
+    statuses = ["Libre", "Ocupado", None, "Libre", "En Limpieza"]
+    repository.insert_many(Barrel(f"B{i:02d}", 50.0, statuses[i % 5], None, None) for i in range(23))
+    conn.commit()
+    return repository
+
+def walk(repository, order, descending=False, size=4):
+    keys, after = [], None
+    while True:
+        rows = repository.page(order=order, descending=descending, after=after, limit=size)
+        if not rows:
+            return keys
+        keys += [row.id for row, _ in rows]
+        after = rows[-1][1]
+
+def expected(repository, column, descending=False):
+    rows = repository.fetch()
+    return [row.id for row in sorted(rows, key=lambda row: (getattr(row, column) or "", row.id), reverse=descending)]
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_cover_ties_and_nulls_once(barrels, descending):
+    assert walk(barrels, barrels.order("status"), descending) == expected(barrels, "status", descending)
+
+def test_keyset_pages_backwards(barrels):
+    order = barrels.order("status")
+    forward = walk(barrels, order)
+    rows = barrels.page(order=order, before=barrels.page(order=order, limit=13)[-1][1], limit=5)
+    assert [row.id for row, _ in rows] == forward[7:12]
+    rows = barrels.page(order=order, last=True, limit=3)
+    assert [row.id for row, _ in rows] == forward[-3:]
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_seek_the_sort_index(conn, barrels, descending):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    barrels.page(order=barrels.order("status"), descending=descending, after=("Libre", "B05"), limit=4)
+    conn.set_trace_callback(None)
+    plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + statements[-1]))
+    assert plan.startswith("SEARCH barrels USING INDEX idx_barrels_sort_status")
+    assert "OFFSET" not in statements[-1]
+
+def test_anchors_are_every_stride_keys(barrels):
+    order = barrels.order("status")
+    keys = [key for _, key in barrels.page(order=order)]
+    assert barrels.anchors(order=order, stride=5) == keys[4::5]
+    assert barrels.anchors(order=order, descending=True, stride=5) == keys[::-1][4::5]
+
+def test_single_key_order_pages_by_id(barrels):
+    assert walk(barrels, barrels.order("id"), size=5) == [f"B{i:02d}" for i in range(23)]
+
+def test_rows_are_compact_and_compare_by_value():
+    barrel = Barrel("B1", 50.0, status="Libre")
+    assert tuple(barrel) == ("B1", 50.0, "Libre", None, None)
+    assert barrel == Barrel("B1", 50.0, "Libre", None, None)
+    assert barrel != Client("B1", 50.0, "Libre", None)
+    assert repr(barrel) == "Barrel('B1', 50.0, 'Libre', None, None)"
+    with pytest.raises(AttributeError):
+        barrel.color = "rojo"
+
+def test_crud_round_trip(conn):
+    clients = ClientRepository(conn)
+    clients.insert_many(Client(f"C{i}", f"Cliente {i}", None, None) for i in range(3))
+    assert clients.count() == 3
+    assert clients.get("C1") == Client("C1", "Cliente 1", None, None)
+    assert clients.get("C1", "name = ?", ("otro",)) is None
+    assert clients.fetch("id != ?", ("C0",), limit=1) == [Client("C1", "Cliente 1", None, None)]
+    assert clients.existing(["C2", "C9", "C0"], chunk_size=2) == {"C0", "C2"}
+    clients.delete_many(["C0", "C2"])
+    assert clients.ids() == ["C1"]
+    assert not clients.exists("C0")
+
+def test_invoices_insert_only_their_own_columns(conn):
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    invoices = InvoiceRepository(conn)
+    invoices.insert(Invoice("F1", "C1", 80.0, "Pendiente", 1700000000, paid_total=999.0, balance=0.0))
+    row = invoices.get("F1")
+    assert (row.paid_total, row.balance) == (0, 80.0)
+
+def test_barrel_changes_append_movements(conn):
+    started = int(time.time())
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    barrels, movements = BarrelRepository(conn), BarrelMovementRepository(conn)
+    barrels.insert(Barrel("B1", 50.0, "Libre", None, None))
+    conn.execute("UPDATE barrels SET status = 'Ocupado', client_id = 'C1' WHERE id = 'B1'")
+    conn.execute("UPDATE barrels SET capacity = 30 WHERE id = 'B1'")
+    conn.execute("UPDATE barrels SET status = 'Libre', client_id = NULL WHERE id = 'B1'")
+    barrels.delete("B1")
+    history = movements.history("B1")
+    assert [(row.status, row.client_id) for row in history] == [
+        ("Eliminado", None), ("Libre", None), ("Ocupado", "C1"), ("Libre", None)]
+    assert movements.history("B1", limit=1) == history[:1]
+    assert movements.at("B1", history[0].ts) == history[0]
+    assert movements.at("B1", started - 1) is None
+
+def test_movement_bursts_keep_wall_clock_timestamps(conn):
+    barrels, movements = BarrelRepository(conn), BarrelMovementRepository(conn)
+    barrels.insert(Barrel("B1", 50.0, "Libre", None, None))
+    for step in range(50):
+        conn.execute("UPDATE barrels SET status = ? WHERE id = 'B1'", (("Ocupado", "Libre")[step % 2],))
+    now = int(time.time())
+    history = movements.history("B1")
+    assert len(history) == 51
+    assert max(row.ts for row in history) <= now
+    assert [row.status for row in history[:3]] == ["Libre", "Ocupado", "Libre"]
+    assert movements.at("B1", now) == history[0]
+
+def test_held_by_includes_barrels_already_out_at_start(conn):
+    conn.executemany("INSERT INTO barrel_movements (barrel_id, ts, seq, status, client_id) VALUES (?, ?, ?, ?, ?)", [
+        ("B1", 100, 0, "Ocupado", "C1"), ("B1", 300, 0, "Libre", None),
+        ("B2", 150, 0, "Ocupado", "C1"), ("B2", 180, 0, "Ocupado", "C2"),
+        ("B3", 250, 0, "Ocupado", "C1"), ("B4", 500, 0, "Ocupado", "C1"),
+        ("B5", 150, 0, "Ocupado", "C1"), ("B5", 150, 1, "Libre", None),
+        ("B6", 120, 0, "Ocupado", "C1"), ("B6", 120, 1, "Ocupado", "C1"), ("B6", 200, 0, "Eliminado", None),
+        ("B7", 200, 0, "Ocupado", "C1"),
+    ])
+    held = BarrelMovementRepository(conn).held_by("C1", 200, 400)
+    assert [(row.barrel_id, row.ts) for row in held] == [("B1", 100), ("B3", 250), ("B6", 120), ("B7", 200)]
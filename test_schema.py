@@ -0,0 +1,189 @@
+import random
+import time
+
+import pytest
+
+from database import connect
+from repositories import (
+    Barrel, BarrelRepository, Client, ClientRepository, Invoice, InvoiceRepository, Payment, PaymentRepository,
+)
+from schema import (
+    SCHEMA_VERSION, SORT_COLUMNS, create_schema, create_search_index, rebuild_dashboard_counters,
+    search_filter,
+)
+
+NOW = int(time.time())
+
+@pytest.fixture
+def ledger(conn):
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    invoices = InvoiceRepository(conn)
+    invoices.insert(Invoice("F1", "C1", 100.0, "Pendiente", NOW))
+    invoices.insert(Invoice("F2", "C1", 50.0, "Vencida", NOW - 40 * 86400))
+    conn.commit()
+    return invoices
+
+def invoice(conn, key):
+    return InvoiceRepository(conn).get(key)
+
+def test_payments_maintain_paid_total_and_balance(conn, ledger):
+    payments = PaymentRepository(conn)
+    payments.insert(Payment("P1", "F1", 30.0, NOW))
+    payments.insert(Payment("P2", "F1", 20.0, NOW))
+    row = invoice(conn, "F1")
+    assert (row.paid_total, row.balance, row.status) == (50.0, 50.0, "Pendiente")
+    conn.execute("UPDATE payments SET amount = 70 WHERE id = 'P1'")
+    row = invoice(conn, "F1")
+    assert (row.paid_total, row.balance, row.status) == (90.0, 10.0, "Pendiente")
+
+def test_full_payment_marks_invoice_paid(conn, ledger):
+    PaymentRepository(conn).insert(Payment("P1", "F1", 100.0, NOW))
+    assert invoice(conn, "F1").status == "Pagada"
+    assert invoice(conn, "F1").balance == 0
+
+def test_deleting_a_payment_reopens_a_paid_invoice(conn, ledger):
+    payments = PaymentRepository(conn)
+    payments.insert(Payment("P1", "F1", 100.0, NOW))
+    payments.insert(Payment("P2", "F2", 50.0, NOW))
+    assert invoice(conn, "F2").status == "Pagada"
+    payments.delete("P1")
+    payments.delete("P2")
+    assert invoice(conn, "F1").status == "Pendiente"
+    assert invoice(conn, "F2").status == "Pendiente"
+    assert invoice(conn, "F2").balance == 50.0
+
+def test_moving_a_payment_between_invoices(conn, ledger):
+    PaymentRepository(conn).insert(Payment("P1", "F1", 40.0, NOW))
+    conn.execute("UPDATE payments SET invoice_id = 'F2' WHERE id = 'P1'")
+    assert invoice(conn, "F1").balance == 100.0
+    assert invoice(conn, "F2").balance == 10.0
+
+def test_sort_columns_order_through_their_indexes(conn):
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {f"idx_{table}_sort_{column}" for table, columns in SORT_COLUMNS.items() for column in columns} <= names
+    for table, columns in SORT_COLUMNS.items():
+        for column in columns:
+            plan = conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT id FROM {table} ORDER BY ifnull({column}, ''), id LIMIT 30"
+            ).fetchall()
+            assert not any("TEMP B-TREE" in row[-1] for row in plan), (table, column)
+
+def matching(conn, table, term, fts_enabled=True):
+    where, params = search_filter(table, term, fts_enabled)
+    sql = f"SELECT id FROM {table}{' WHERE ' + where if where else ''} ORDER BY id"
+    return [key for (key,) in conn.execute(sql, params)]
+
+@pytest.fixture
+def searchable(conn):
+    clients = ClientRepository(conn)
+    clients.insert_many([
+        Client("C1", "García Hermanos", None, None), Client("C2", 'Bar "El 50%"', None, None),
+        Client("C3", "Taberna_Sur", None, None), Client("C4", "garcía y cía", None, None),
+    ])
+    conn.commit()
+    return clients
+
+@pytest.mark.parametrize("term", ["", "ar", "García", "garcía", "rcí", '"El', "50%", "a_S", "C3", "nada"])
+def test_fts_search_matches_the_like_fallback(conn, searchable, term):
+    assert matching(conn, "clients", term) == matching(conn, "clients", term, fts_enabled=False)
+
+def test_fts_index_follows_writes_and_rebuilds_for_existing_rows(conn, searchable):
+    searchable.delete("C1")
+    conn.execute("UPDATE clients SET name = 'Cervecería Norte' WHERE id = 'C3'")
+    searchable.insert(Client("C5", "Norteña", None, None))
+    assert matching(conn, "clients", "Norte") == ["C3", "C5"]
+    assert matching(conn, "clients", "Hermanos") == []
+    conn.execute("DROP TABLE clients_fts")
+    conn.commit()
+    assert create_search_index(conn)
+    assert matching(conn, "clients", "Norte") == ["C3", "C5"]
+
+def counters(conn):
+    return {
+        (metric, key): (items, round(amount, 6))
+        for metric, key, items, amount in conn.execute("SELECT metric, key, items, amount FROM dashboard_counters")
+        if items or abs(amount) > 1e-6
+    }
+
+def test_dashboard_counters_match_a_rebuild_after_random_writes(conn):
+    from benchmark import generate
+    generate(conn, {"clients": 10, "barrels": 60, "invoices": 40, "payments": 30, "batches": 8, "fermenters": 6}, seed=5)
+    rng = random.Random(5)
+    clients = [key for (key,) in conn.execute("SELECT id FROM clients")]
+
+    def pick(table):
+        return rng.choice(conn.execute(f"SELECT id FROM {table} ORDER BY id").fetchall())[0]
+
+    for step in range(200):
+        choice = rng.randrange(5)
+        if choice == 0:
+            conn.execute("UPDATE barrels SET status = ?, client_id = ? WHERE id = ?", (
+                rng.choice(["Ocupado", "Libre", "En Limpieza"]), rng.choice(clients + [None]), pick("barrels")
+            ))
+        elif choice == 1:
+            conn.execute("DELETE FROM barrels WHERE id = ?", (pick("barrels"),))
+        elif choice == 2:
+            PaymentRepository(conn).insert(Payment(f"X{step}", pick("invoices"), rng.uniform(1, 300), NOW))
+        elif choice == 3:
+            conn.execute("UPDATE fermenters SET status = ?, capacity = capacity + 100 WHERE id = ?",
+                         (rng.choice(["Ocupado", "Libre"]), pick("fermenters")))
+        else:
+            conn.execute("DELETE FROM payments WHERE id = ?", (pick("payments"),))
+    conn.commit()
+    maintained = counters(conn)
+    rebuild_dashboard_counters(conn)
+    assert counters(conn) == maintained
+
+LEGACY_TABLES = {
+    "barrels": "id TEXT PRIMARY KEY, capacity REAL, status TEXT, client_id TEXT, start_date TEXT",
+    "clients": "id TEXT PRIMARY KEY, name TEXT, contact TEXT, address TEXT",
+    "invoices": "id TEXT PRIMARY KEY, client_id TEXT, amount REAL, status TEXT, issue_date TEXT",
+    "payments": "id TEXT PRIMARY KEY, invoice_id TEXT, amount REAL, payment_date TEXT",
+    "batches": "id TEXT PRIMARY KEY, product_name TEXT, volume REAL, start_date TEXT, status TEXT",
+    "fermenters": "id TEXT PRIMARY KEY, capacity REAL, status TEXT, batch_id TEXT, start_date TEXT",
+}
+
+def local_stamp(text):
+    return int(time.mktime(time.strptime(text, "%Y-%m-%d")))
+
+def test_upgrade_from_text_dates(tmp_path):
+    conn = connect(str(tmp_path / "legacy.db"))
+    for table, definition in LEGACY_TABLES.items():
+        conn.execute(f"CREATE TABLE {table} ({definition})")
+    conn.execute("INSERT INTO clients VALUES ('C1', 'Ana', NULL, NULL)")
+    conn.execute("INSERT INTO barrels VALUES ('B1', 50, 'Ocupado', 'C1', '2024-03-01'), ('B2', 30, 'Libre', NULL, NULL)")
+    conn.execute("INSERT INTO invoices VALUES ('F1', 'C1', 100, 'Pendiente', '2024-01-15')")
+    conn.execute("INSERT INTO payments VALUES ('P1', 'F1', 40, '2024-02-01')")
+    conn.commit()
+    create_schema(conn)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT start_date FROM barrels ORDER BY id").fetchall() == [(local_stamp("2024-03-01"),), (None,)]
+    assert conn.execute("SELECT issue_date, paid_total, balance FROM invoices").fetchone() == (
+        local_stamp("2024-01-15"), 40, 60)
+    assert conn.execute("SELECT typeof(payment_date) FROM payments").fetchone() == ("integer",)
+    assert conn.execute("SELECT barrel_id, ts, client_id FROM barrel_movements WHERE barrel_id = 'B1'").fetchall() == [
+        ("B1", local_stamp("2024-03-01"), "C1")]
+    maintained = counters(conn)
+    rebuild_dashboard_counters(conn)
+    assert counters(conn) == maintained
+    conn.execute("UPDATE barrels SET status = 'Libre', client_id = NULL WHERE id = 'B1'")
+    assert conn.execute("SELECT COUNT(*) FROM barrel_movements WHERE barrel_id = 'B1'").fetchone() == (2,)
+    conn.close()
+
+def test_overdue_barrels_are_held_past_the_cutoff_oldest_first(conn):
+    barrels = BarrelRepository(conn)
+    ClientRepository(conn).insert(Client("C1", "Ana", None, None))
+    barrels.insert_many([
+        Barrel("B1", 50.0, "Ocupado", "C1", NOW - 40 * 86400),
+        Barrel("B2", 50.0, "Ocupado", "C1", NOW - 90 * 86400),
+        Barrel("B3", 50.0, "Ocupado", "C1", NOW - 5 * 86400),
+        Barrel("B4", 50.0, "Libre", None, NOW - 90 * 86400),
+        Barrel("B5", 50.0, "Ocupado", "C1", NOW - 40 * 86400),
+    ])
+    where, params = barrels.held_filter(NOW - 30 * 86400)
+    rows = barrels.page(where, params, order=barrels.held_order)
+    assert [row.id for row, _ in rows] == ["B2", "B1", "B5"]
+    assert barrels.count(where, params) == 3
+    sql = f"EXPLAIN QUERY PLAN SELECT * FROM barrels WHERE {where} ORDER BY start_date, id"
+    plan = " ".join(row[-1] for row in conn.execute(sql, params))
+    assert "TEMP B-TREE" not in plan
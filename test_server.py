@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import quote
+
+import pytest
+
+from benchmark import generate
+from database import connect
+from remote import ApiClient, RemoteWriter
+from server import SERVER_HOST, BreweryServer, HttpError, free_port, load_test, main, wait_for
+
+@pytest.fixture
+def server(database):
+    server = BreweryServer(database, 1)
+    yield server
+    server.close()
+
+def call(server, method, target, body=None):
+    data = json.dumps(body).encode() if body is not None else b""
+    try:
+        return asyncio.run(server.dispatch(method, target, data))
+    except HttpError as e:
+        return e.status, {"error": str(e)}
+
+def test_rows_sort_only_by_indexed_columns(server):
+    for key, name in (("C2", "Beto"), ("C1", "Zoe"), ("C3", "Ana")):
+        assert call(server, "POST", "/clients", {"id": key, "name": name})[0] == HTTPStatus.CREATED
+    status, payload = call(server, "GET", "/clients?order=name&limit=2")
+    assert status == HTTPStatus.OK
+    assert [row["id"] for row in payload["rows"]] == ["C3", "C2"]
+    after = quote(json.dumps(payload["keys"][-1]))
+    status, payload = call(server, "GET", f"/clients?order=name&after={after}")
+    assert [row["id"] for row in payload["rows"]] == ["C1"]
+    assert call(server, "GET", "/clients?order=contact")[0] == HTTPStatus.BAD_REQUEST
+
+def test_anchors_mark_every_stride_rows(server):
+    for index in range(7):
+        assert call(server, "POST", "/clients", {"id": f"C{index}", "name": f"N{6 - index}"})[0] == HTTPStatus.CREATED
+    assert call(server, "GET", "/clients/anchors?order=name&stride=3") == (
+        HTTPStatus.OK, {"keys": [("N2", "C4"), ("N5", "C1")]}
+    )
+    assert call(server, "GET", "/clients/anchors?stride=0")[0] == HTTPStatus.BAD_REQUEST
+
+def test_insert_applies_the_shared_status_rules(server):
+    assert call(server, "POST", "/clients", {"id": "C1", "name": "Ana"})[0] == HTTPStatus.CREATED
+    invoice = {"id": "F1", "client_id": "C1", "amount": 10}
+    assert call(server, "POST", "/invoices", dict(invoice, status="Bogus")) == (
+        HTTPStatus.BAD_REQUEST, {"error": "estado inválido"}
+    )
+    assert call(server, "POST", "/invoices", dict(invoice, status="Pagada"))[0] == HTTPStatus.BAD_REQUEST
+    assert call(server, "POST", "/invoices", dict(invoice, amount="inf"))[0] == HTTPStatus.BAD_REQUEST
+    status, row = call(server, "POST", "/invoices", invoice)
+    assert (status, row["status"]) == (HTTPStatus.CREATED, "Pendiente")
+    assert call(server, "POST", "/fermenters", {"id": "T1", "capacity": 100, "status": "Roto"})[0] == HTTPStatus.BAD_REQUEST
+
+def test_batch_is_applied_in_one_savepoint(server):
+    assert call(server, "POST", "/clients", {"id": "C1", "name": "Ana"})[0] == HTTPStatus.CREATED
+    status, _ = call(server, "POST", "/batch", {"statements": [
+        ["POST", "/clients", {"id": "C2", "name": "Beto"}],
+        ["POST", "/invoices", {"id": "F1", "client_id": "C2", "amount": 10}],
+        ["POST", "/clients", {"id": "C1", "name": "Duplicado"}],
+    ]})
+    assert status == HTTPStatus.CONFLICT
+    assert call(server, "GET", "/clients/count")[1] == {"count": 1}
+    assert call(server, "GET", "/invoices/count")[1] == {"count": 0}
+    status, payload = call(server, "POST", "/batch", {"statements": [
+        ["POST", "/clients", {"id": "C2", "name": "Beto"}],
+        ["POST", "/invoices", {"id": "F1", "client_id": "C2", "amount": 10}],
+        ["DELETE", "/clients/C1", None],
+    ]})
+    assert (status, payload) == (HTTPStatus.OK, {"applied": 3})
+    assert [row["id"] for row in call(server, "GET", "/clients")[1]["rows"]] == ["C2"]
+
+def test_batch_rejects_unsupported_statements(server):
+    assert call(server, "POST", "/batch", {"statements": [["GET", "/clients", None]]})[0] == HTTPStatus.BAD_REQUEST
+    assert call(server, "POST", "/batch", {"statements": [["DELETE", "/clients/C9", None]]})[0] == HTTPStatus.NOT_FOUND
+    assert call(server, "POST", "/batch", {"statements": []})[0] == HTTPStatus.BAD_REQUEST
+
+def test_remote_writer_sends_multi_statement_mutations_as_one_request(monkeypatch):
+    sent = []
+    monkeypatch.setattr(ApiClient, "request", lambda self, method, path, query=None, body=None: sent.append((method, path, body)))
+    writer = RemoteWriter("http://127.0.0.1:1")
+    done = threading.Event()
+    writer.submit([("DELETE", "/clients/C1", None)])
+    writer.submit([("POST", "/clients", {"id": "C2"}), ("DELETE", "/clients/C1", None)], lambda error: done.set())
+    done.wait(5)
+    writer.close()
+    assert sent == [
+        ("DELETE", "/clients/C1", None),
+        ("POST", "/batch", {"statements": [["POST", "/clients", {"id": "C2"}], ["DELETE", "/clients/C1", None]]}),
+    ]
+
+def test_changes_long_poll_returns_when_a_change_arrives(server):
+    started = time.monotonic()
+    assert call(server, "GET", "/changes?since=0&wait=1") == (HTTPStatus.OK, [])
+    assert time.monotonic() - started >= 1
+
+    async def poll_and_write():
+        waiting = asyncio.ensure_future(server.dispatch("GET", "/changes?since=0&wait=10", b""))
+        await asyncio.sleep(0.3)
+        await server.dispatch("POST", "/clients", json.dumps({"id": "C1", "name": "Ana"}).encode())
+        return await waiting
+
+    started = time.monotonic()
+    status, rows = asyncio.run(poll_and_write())
+    assert time.monotonic() - started < 5
+    assert [(row["table_name"], row["row_id"], row["op"]) for row in rows] == [("clients", "C1", "insert")]
+
+@pytest.fixture
+def sample(database):
+    conn = connect(database)
+    generate(conn, {"clients": 5, "barrels": 20, "invoices": 10, "payments": 5, "batches": 2, "fermenters": 2}, seed=1)
+    conn.commit()
+    conn.close()
+    return database
+
+def ledger_state(database):
+    conn = connect(database)
+    try:
+        return (
+            conn.execute("SELECT id, round(paid_total, 6), round(balance, 6), status FROM invoices ORDER BY id").fetchall(),
+            conn.execute("SELECT metric, key, items, round(amount, 6) FROM dashboard_counters ORDER BY 1, 2").fetchall(),
+            conn.execute("SELECT COUNT(*) FROM payments").fetchone(),
+        )
+    finally:
+        conn.close()
+
+def test_load_test_runs_on_a_copy_by_default(sample, capsys):
+    before = ledger_state(sample)
+    main(["loadtest", "--database", sample, "--clients", "1", "--duration", "0.5", "--write-ratio", "0.5"])
+    assert "add_payment" in capsys.readouterr().out
+    assert ledger_state(sample) == before
+
+def test_load_test_against_a_running_server_removes_its_payments(sample):
+    before = ledger_state(sample)
+    port = free_port(SERVER_HOST)
+    url = f"http://{SERVER_HOST}:{port}"
+    process = subprocess.Popen([
+        sys.executable, os.path.abspath("server.py"), "serve", "--database", sample, "--port", str(port)
+    ])
+    try:
+        wait_for(url, process)
+        report = load_test(url, clients=2, duration=0.5, write_ratio=0.5)
+    finally:
+        process.terminate()
+        process.wait()
+    assert report["add_payment"]["requests"] > 0
+    assert ledger_state(sample) == before
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from database import ReaderPool
+from repositories import Barrel, BarrelRepository, Client, ClientRepository
+from schema import prune_change_log
+from snapshot import SnapshotJob, read_manifest, read_snapshot
+
+@pytest.fixture
+def pool(database):
+    pool = ReaderPool(database, 1)
+    yield pool
+    pool.close()
+
+@pytest.fixture
+def clients(conn):
+    repository = ClientRepository(conn)
+    repository.insert_many(Client(f"C{i}", f"Cliente {i}", None, None) for i in range(1, 6))
+    conn.commit()
+    return repository
+
+def snapshot(pool, directory, full=False):
+    job = SnapshotJob(pool, str(directory), full)
+    job.run()
+    events = []
+    while not job.events.empty():
+        events.append(job.events.get())
+    assert events[-1][0] == "done", events[-1]
+    return events[-1][1]
+
+def names(directory, table="clients"):
+    rows = read_snapshot(table, str(directory)).to_pylist()
+    return {row["id"]: row["name"] for row in rows}
+
+def test_increment_follows_deletes_reinserts_and_updates(conn, clients, pool, tmp_path):
+    directory = tmp_path / "snapshots"
+    assert snapshot(pool, directory)["rows"]["clients"] == 5
+    clients.delete("C5")
+    clients.insert(Client("C6", "Nuevo", None, None))
+    assert conn.execute("SELECT rowid FROM clients WHERE id = 'C6'").fetchone()[0] == 5
+    conn.execute("UPDATE clients SET name = 'Renombrado' WHERE id = 'C1'")
+    conn.commit()
+    summary = snapshot(pool, directory)
+    assert (summary["rows"]["clients"], summary["deleted"]["clients"]) == (2, 1)
+    assert names(directory) == {
+        "C1": "Renombrado", "C2": "Cliente 2", "C3": "Cliente 3", "C4": "Cliente 4", "C6": "Nuevo",
+    }
+    assert snapshot(pool, directory)["rows"]["clients"] == 0
+
+def test_partitioned_tables_drop_rows_that_moved_or_vanished(conn, pool, tmp_path):
+    barrels = BarrelRepository(conn)
+    barrels.insert(Barrel("B1", 50.0, "Ocupado", None, 1700000000))
+    barrels.insert(Barrel("B2", 50.0, "Ocupado", None, 1700000000))
+    conn.commit()
+    directory = tmp_path / "snapshots"
+    snapshot(pool, directory)
+    conn.execute("UPDATE barrels SET start_date = 1720000000 WHERE id = 'B1'")
+    barrels.delete("B2")
+    conn.commit()
+    snapshot(pool, directory)
+    rows = read_snapshot("barrels", str(directory)).to_pylist()
+    assert [(row["id"], row["month"]) for row in rows] == [("B1", "2024-07")]
+    assert read_snapshot("barrels", str(directory), months=["2023-11"]).num_rows == 0
+
+def test_pruned_log_falls_back_to_a_full_table_copy(conn, clients, pool, tmp_path):
+    directory = tmp_path / "snapshots"
+    snapshot(pool, directory)
+    clients.delete("C2")
+    clients.insert(Client("C7", "Otro", None, None))
+    conn.commit()
+    prune_change_log(conn, keep=1)
+    assert snapshot(pool, directory)["rows"]["clients"] == 5
+    assert set(names(directory)) == {"C1", "C3", "C4", "C5", "C7"}
+
+def test_full_only_removes_what_the_job_wrote(clients, pool, tmp_path):
+    directory = tmp_path / "snapshots"
+    snapshot(pool, directory)
+    (directory / "notas.txt").write_text("no borrar")
+    summary = snapshot(pool, directory, full=True)
+    assert summary["rows"]["clients"] == 5
+    assert (directory / "notas.txt").read_text() == "no borrar"
+    assert read_manifest(str(directory))["runs"] == 2
+    assert len(os.listdir(directory / "clients")) == 1
+
+def test_refuses_a_directory_without_manifest(clients, pool, tmp_path):
+    (tmp_path / "proyecto.txt").write_text("importante")
+    for full in (False, True):
+        job = SnapshotJob(pool, str(tmp_path), full)
+        job.run()
+        event = job.events.get()
+        assert event[0] == "error"
+        assert "manifest.json" in event[1]
+    assert (tmp_path / "proyecto.txt").exists()